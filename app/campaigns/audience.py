@@ -0,0 +1,57 @@
+# app/campaigns/audience.py
+"""Single definition of "who receives a campaign", shared by every send path."""
+from typing import Any, Dict, List, Optional
+
+from app.segments.rules import compile_rules
+from app.services.engagement_service import SCORE_FIELD
+
+ALL_CONTACTS = "All Contacts"
+
+
+def audience_query(
+    segment: Optional[str],
+    min_engagement_score: Optional[float] = None,
+    segments: Optional[List[str]] = None,
+    segment_match: str = "any",
+    rules: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """Mongo filter for the recipients of a campaign.
+
+    - unsubscribed contacts are always excluded
+    - `segments` targets contacts in any (union) or all (intersection, `segment_match="all"`)
+      of the listed segments; otherwise `segment` alone is used
+    - `segment` "All Contacts" (or empty) targets every contact
+    - `min_engagement_score` drops scored contacts below the threshold; contacts that
+      were never scored (never mailed) are kept so new contacts still get mail
+    - `rules` (a dynamic segment definition, see app.segments.rules) is compiled and
+      ANDed with the above; raises ValueError if the rules are invalid
+
+    Membership is matched on the multikey `segments` index, each contact at most once.
+    """
+    query: Dict[str, Any] = {"unsubscribed": {"$ne": True}}
+    wanted = [s for s in (segments or []) if s and s != ALL_CONTACTS]
+    if wanted:
+        if len(wanted) == 1:
+            query["segments"] = wanted[0]
+        else:
+            query["segments"] = {"$all" if segment_match == "all" else "$in": wanted}
+    elif segment and segment != ALL_CONTACTS and not segments:
+        query["segments"] = segment
+    if min_engagement_score is not None:
+        query["$or"] = [
+            {SCORE_FIELD: {"$gte": min_engagement_score}},
+            {SCORE_FIELD: {"$exists": False}},
+        ]
+    if rules:
+        query["$and"] = [compile_rules(rules)]
+    return query
+
+
+def campaign_audience_query(campaign: Dict[str, Any]) -> Dict[str, Any]:
+    return audience_query(
+        campaign.get("segment"),
+        campaign.get("min_engagement_score"),
+        segments=campaign.get("segments"),
+        segment_match=campaign.get("segment_match") or "any",
+        rules=campaign.get("segment_rules"),
+    )
@@ -14,6 +14,7 @@ from app.campaigns.schemas import (
     JobStatus,
 )
 from app.campaigns import services
+from app.segments import services as segment_services
 from app.deps import get_current_user, require_role
 from app.campaigns.tasks import process_scheduled_job
 
@@ -36,6 +37,12 @@ async def create_campaign(
 ):
     data = payload.model_dump()
     data["created_by"] = str(user["_id"])
+    if data.get("dynamic_segment_id"):
+        # snapshot the rules: later edits to the segment don't change this campaign's audience
+        segment = await segment_services.get_segment(data["dynamic_segment_id"])
+        if not segment:
+            raise HTTPException(status_code=400, detail="Dynamic segment not found")
+        data["segment_rules"] = {"match": segment.get("match", "all"), "rules": segment["rules"]}
 
     doc = await services.create_campaign(data)
 
@@ -50,7 +57,12 @@ async def create_campaign(
         "subject": doc["subject"],
         "template_id": doc["template_id"],
         "segment": doc["segment"],
+        "segments": doc.get("segments"),
+        "segment_match": doc.get("segment_match") or "any",
+        "dynamic_segment_id": doc.get("dynamic_segment_id"),
         "html_content": doc.get("html_content", ""),
+        "min_engagement_score": doc.get("min_engagement_score"),
+        "send_time_optimization": doc.get("send_time_optimization", False),
         "status": doc["status"],
         "created_by": doc["created_by"],
         "created_at": doc["created_at"],
@@ -128,7 +140,12 @@ async def get_campaign(campaign_id: str, user=Depends(get_current_user)):
         "subject": doc["subject"],
         "template_id": doc["template_id"],
         "segment": doc["segment"],
+        "segments": doc.get("segments"),
+        "segment_match": doc.get("segment_match") or "any",
+        "dynamic_segment_id": doc.get("dynamic_segment_id"),
         "html_content": html_content,
+        "min_engagement_score": doc.get("min_engagement_score"),
+        "send_time_optimization": doc.get("send_time_optimization", False),
         "status": doc["status"],
         "created_by": doc["created_by"],
         "created_at": doc["created_at"],
@@ -164,6 +181,21 @@ async def preview_campaign(campaign_id: str, user=Depends(get_current_user)):
     return {"html": html_abs}
 
 
+# ------------------------------------------------
+# AUDIENCE PREVIEW (same compiled query as the send paths)
+# ------------------------------------------------
+@router.get("/{campaign_id}/audience")
+async def preview_campaign_audience(
+    campaign_id: str,
+    limit: int = Query(20, ge=0, le=100),
+    user=Depends(get_current_user),
+):
+    result = await services.audience_preview(campaign_id, limit=limit)
+    if not result:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return result
+
+
 # ------------------------------------------------
 # JOB STATUS
 # ------------------------------------------------
@@ -208,15 +240,14 @@ async def schedule_campaign_endpoint(
         print("❌ Unexpected return from schedule_campaign:", result)
         raise HTTPException(status_code=500, detail="Internal scheduling error")
 
-    campaign, job_id = result
+    campaign, jobs = result
 
 
     # 🔹 enqueue Celery task (background processing)
-    # 🔹 enqueue Celery task (background processing)
-    # Use apply_async with 'eta' so Celery holds the task until send_at
-    # 🔹 enqueue Celery task (background processing)
-    # Use apply_async with 'eta' so Celery holds the task until send_at
-    process_scheduled_job.apply_async(args=[str(job_id)], eta=payload.send_at)
+    # Use apply_async with 'eta' so Celery holds each task until its wave's run_at
+    # (a single wave at send_at unless send-time optimization split the campaign)
+    for job_id, run_at in jobs:
+        process_scheduled_job.apply_async(args=[str(job_id)], eta=run_at)
 
     return {
         "id": campaign["id"],
@@ -224,7 +255,12 @@ async def schedule_campaign_endpoint(
         "subject": campaign["subject"],
         "template_id": campaign["template_id"],
         "segment": campaign["segment"],
+        "segments": campaign.get("segments"),
+        "segment_match": campaign.get("segment_match") or "any",
+        "dynamic_segment_id": campaign.get("dynamic_segment_id"),
         "html_content": campaign.get("html_content", ""),
+        "min_engagement_score": campaign.get("min_engagement_score"),
+        "send_time_optimization": campaign.get("send_time_optimization", False),
         "status": campaign["status"],
         "created_by": campaign["created_by"],
         "created_at": campaign["created_at"],
@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 
 class CampaignCreate(BaseModel):
@@ -10,9 +10,19 @@ class CampaignCreate(BaseModel):
     subject: str
     template_id: Optional[str] = None
     segment: str
+    # target several segments: contacts in any (union) or all (intersection) of them;
+    # `segment` stays the display label
+    segments: Optional[List[str]] = None
+    segment_match: str = Field(default="any", pattern="^(any|all)$")
+    # dynamic segment: its rules are copied onto the campaign and ANDed with the above
+    dynamic_segment_id: Optional[str] = None
     html_content: Optional[str] = None
     sender_name: Optional[str] = None
     reply_to: Optional[str] = None
+    # skip contacts whose engagement_score is below this (unscored contacts are kept)
+    min_engagement_score: Optional[float] = Field(default=None, ge=0, le=100)
+    # split scheduled sends into hourly waves by each contact's preferred_send_hour
+    send_time_optimization: bool = False
     status: Optional[str] = "draft"
     send_at: Optional[datetime] = None
 
@@ -23,7 +33,12 @@ class CampaignOut(BaseModel):
     subject: str
     template_id: Optional[str] = None
     segment: str
+    segments: Optional[List[str]] = None
+    segment_match: str = "any"
+    dynamic_segment_id: Optional[str] = None
     html_content: Optional[str] = ""
+    min_engagement_score: Optional[float] = None
+    send_time_optimization: bool = False
     status: str
     created_by: str
     created_at: datetime
@@ -70,3 +85,4 @@ class JobStatus(BaseModel):
     task_id: Optional[str] = None
     result: Optional[Dict[str, Any]] = None
     created_at: datetime
+    waves: int = 1
@@ -6,6 +6,9 @@ from bson import ObjectId
 
 from app.db.client import db
 from app.utils.absolute import to_absolute_urls, BACKEND_PUBLIC_URL
+from app.utils.tracking_utils import make_unsubscribe_url
+from app.campaigns.audience import campaign_audience_query
+from app.services.send_time_service import PREFERRED_HOUR_FIELD, wave_run_at
 
 # Mongo collections
 CAMPAIGNS = db.get_collection("campaigns")
@@ -67,6 +70,7 @@ async def create_scheduled_job(
     status: str = "pending",
     task_id: Optional[str] = None,
     result: Optional[Dict[str, Any]] = None,
+    wave: int = 0,
 ) -> Dict:
     """
     Create a scheduled job document for a campaign.
@@ -78,9 +82,11 @@ async def create_scheduled_job(
       - task_id: reserved for background system id (optional)
       - payload: list of messages (one per contact)
       - result: optional summary (used later by Team 2)
+      - wave: index of this send wave when the campaign is split by preferred send hour
     """
     doc: Dict[str, Any] = {
         "campaign_id": campaign_id,
+        "wave": wave,
         "run_at": run_at,
         "status": status,
         "task_id": task_id,
@@ -114,21 +120,45 @@ async def get_job_status_for_campaign(campaign_id: str) -> Optional[Dict]:
       - task_id
       - result
       - created_at
+
+    A campaign split into send waves has one job per wave: run_at is the first
+    wave, total_recipients the sum, and status is "done" only once every wave is.
+    Payload sizes are computed in Mongo so the payloads themselves are never loaded.
     """
-    job = await JOBS.find_one({"campaign_id": campaign_id})
-    if not job:
+    cursor = JOBS.aggregate([
+        {"$match": {"campaign_id": campaign_id}},
+        {"$sort": {"run_at": 1}},
+        {"$project": {
+            "status": 1,
+            "run_at": 1,
+            "task_id": 1,
+            "result": 1,
+            "created_at": 1,
+            "recipients": {"$size": {"$ifNull": ["$payload", []]}},
+        }},
+    ])
+    jobs = await cursor.to_list(length=None)
+    if not jobs:
         return None
 
-    total_recipients = len(job.get("payload", []))
+    statuses = {job.get("status", "pending") for job in jobs}
+    if len(statuses) == 1:
+        status = statuses.pop()
+    elif "error" in statuses:
+        status = "error"
+    else:
+        status = "processing"
 
+    first = jobs[0]
     return {
-        "campaign_id": job["campaign_id"],
-        "status": job.get("status", "pending"),
-        "run_at": job["run_at"],
-        "total_recipients": total_recipients,
-        "task_id": job.get("task_id"),
-        "result": job.get("result"),
-        "created_at": job["created_at"],
+        "campaign_id": campaign_id,
+        "status": status,
+        "run_at": first["run_at"],
+        "total_recipients": sum(job["recipients"] for job in jobs),
+        "task_id": first.get("task_id"),
+        "result": first.get("result") if len(jobs) == 1 else None,
+        "created_at": first["created_at"],
+        "waves": len(jobs),
     }
 
 
@@ -143,8 +173,9 @@ async def schedule_campaign(campaign_id: str, send_at: datetime):
 
     - Updates campaign: status, send_at, scheduled_at
     - Builds payload for ALL contacts in the segment
-    - Stores payload into scheduled_jobs collection
-    - Returns (campaign_dict, job_id) for Celery
+    - Stores payload into scheduled_jobs collection; with send_time_optimization
+      the payload is split into hourly waves (one job each) by preferred_send_hour
+    - Returns (campaign_dict, [(job_id, run_at), ...]) for Celery
     """
     campaign = await get_campaign(campaign_id)
     if not campaign:
@@ -176,17 +207,19 @@ async def schedule_campaign(campaign_id: str, send_at: datetime):
     segment = campaign["segment"]
 
     # Fetch contacts for this segment (bulk-safe)
-    cursor = CONTACTS.find({"segment": segment, "unsubscribed": False})
+    cursor = CONTACTS.find(campaign_audience_query(campaign))
 
-    payload: List[Dict[str, Any]] = []
+    # run_at -> messages; everything goes at send_at unless send-time optimization is on
+    waves: Dict[datetime, List[Dict[str, Any]]] = {}
+    optimize = bool(campaign.get("send_time_optimization"))
 
     async for c in cursor:
         contact_name = c.get("name") or "Customer"
         email = c["email"]
         contact_id = str(c["_id"])
 
-        # unsubscribe link format per leader spec — make absolute
-        unsubscribe_link = f"{BACKEND_PUBLIC_URL.rstrip('/')}/unsubscribe/{contact_id}"
+        # signed unsubscribe link (contact + campaign, verified without a DB read)
+        unsubscribe_link = make_unsubscribe_url(contact_id, campaign["id"], base_url=BACKEND_PUBLIC_URL)
 
         # personalize HTML and ensure absolute image URLs
         final_html = (
@@ -196,7 +229,8 @@ async def schedule_campaign(campaign_id: str, send_at: datetime):
         )
         final_html = to_absolute_urls(final_html)
 
-        payload.append(
+        run_at = wave_run_at(send_at, c.get(PREFERRED_HOUR_FIELD)) if optimize else send_at
+        waves.setdefault(run_at, []).append(
             {
                 "email": email,              # <-- FIXED
                 "name": contact_name,
@@ -208,18 +242,20 @@ async def schedule_campaign(campaign_id: str, send_at: datetime):
         )
 
 
-    # Create job document in scheduled_jobs
-    job_doc = await create_scheduled_job(
-        campaign_id=campaign["id"],
-        run_at=send_at,
-        payload=payload,
-        status="pending",
-    )
-
-    job_id = job_doc["_id"]
+    # Create job documents in scheduled_jobs (a single one unless split into waves)
+    jobs = []
+    for wave, run_at in enumerate(sorted(waves) or [send_at]):
+        job_doc = await create_scheduled_job(
+            campaign_id=campaign["id"],
+            run_at=run_at,
+            payload=waves.get(run_at, []),
+            status="pending",
+            wave=wave,
+        )
+        jobs.append((job_doc["_id"], run_at))
 
     # Return both to the router so it can trigger Celery
-    return campaign, job_id
+    return campaign, jobs
 
 
 
@@ -249,6 +285,21 @@ async def list_due_campaigns(now: Optional[datetime] = None) -> List[Dict]:
 # Build bulk send payload (for Team 2 via API)
 # -------------------------
 
+async def audience_preview(campaign_id: str, limit: int = 20) -> Optional[Dict[str, Any]]:
+    """Recipient count and the newest `limit` recipients, from the same query the sends use."""
+    campaign = await get_campaign(campaign_id)
+    if not campaign:
+        return None
+    query = campaign_audience_query(campaign)
+    count = await CONTACTS.count_documents(query)
+    sample = await CONTACTS.find(
+        query, projection={"name": 1, "email": 1, "segments": 1}
+    ).sort([("created_at", -1), ("_id", -1)]).limit(limit).to_list(length=limit)
+    for doc in sample:
+        doc["id"] = str(doc.pop("_id"))
+    return {"campaign_id": campaign_id, "count": count, "sample": sample}
+
+
 async def build_send_payload(campaign_id: str) -> Dict:
     """
     Prepare bulk email payload for Team 2 (for /prepare-send endpoint).
@@ -278,7 +329,7 @@ async def build_send_payload(campaign_id: str) -> Dict:
     segment = campaign["segment"]
 
     # Find contacts in this segment who are not unsubscribed
-    cursor = CONTACTS.find({"segment": segment, "unsubscribed": False})
+    cursor = CONTACTS.find(campaign_audience_query(campaign))
 
     messages: List[Dict[str, Any]] = []
     async for c in cursor:
@@ -286,7 +337,7 @@ async def build_send_payload(campaign_id: str) -> Dict:
         email = c["email"]
         contact_id = str(c["_id"])
 
-        unsubscribe_link = f"{BACKEND_PUBLIC_URL.rstrip('/')}/unsubscribe/{contact_id}"
+        unsubscribe_link = make_unsubscribe_url(contact_id, campaign["id"], base_url=BACKEND_PUBLIC_URL)
 
         final_html = (
             base_html
@@ -302,6 +353,7 @@ async def build_send_payload(campaign_id: str) -> Dict:
                 "subject": subject,
                 "html": final_html,
                 "unsubscribe_link": unsubscribe_link,
+                "contact_id": contact_id,
             }
         )
 
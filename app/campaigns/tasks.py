@@ -9,6 +9,8 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from app.worker import celery_app
 from app.utils.config import settings
 from app.services.send_bulk_service import BulkEmailService
+from app.campaigns.audience import ALL_CONTACTS, campaign_audience_query
+from app.utils.tracking_utils import make_unsubscribe_url
 
 # ---------------------------------------------------------------------------
 # Task 1: Process Scheduled Jobs
@@ -154,13 +156,8 @@ async def run_send_campaign_async(campaign_id: str):
             return
 
         # 2. Fetch Contacts
-        segment = campaign.get("segment", "All Contacts")
-        query = {"unsubscribed": {"$ne": True}}
-        
-        if segment != "All Contacts":
-            query["segment"] = segment
-            
-        contact_list = await contacts.find(query).to_list(length=None)
+        segment = campaign.get("segment", ALL_CONTACTS)
+        contact_list = await contacts.find(campaign_audience_query(campaign)).to_list(length=None)
         
         if not contact_list:
             print(f"[Celery] ⚠️ No contacts found for segment: {segment}")
@@ -191,7 +188,7 @@ async def run_send_campaign_async(campaign_id: str):
             personal_html = html_content.replace("{{name}}", c.get("name", "Friend"))
             
             # Unsubscribe Link
-            unsubscribe_link = f"{backend_url}/unsubscribe/{str(c['_id'])}"
+            unsubscribe_link = make_unsubscribe_url(str(c["_id"]), campaign_id, base_url=backend_url)
             personal_html += f"<br><br><a href='{unsubscribe_link}'>Unsubscribe</a>"
 
             messages.append({
@@ -199,7 +196,8 @@ async def run_send_campaign_async(campaign_id: str):
                 "name": c.get("name"),
                 "subject": subject,
                 "html": personal_html,
-                "unsubscribe_link": unsubscribe_link
+                "unsubscribe_link": unsubscribe_link,
+                "contact_id": str(c["_id"]),
             })
 
         payload = {
@@ -18,6 +18,34 @@ class Settings(BaseSettings):
     SENDGRID_PUBLIC_KEY: str | None = None
     SENDGRID_WEBHOOK_DISABLE_VERIFY: bool = False
     SENDER_EMAIL: str
+
+    # SendGrid stats used by /analytics: cached per process, refreshed in the background
+    # while stale, and never waited on longer than the timeout (the Mongo rollup is served instead)
+    SENDGRID_STATS_CACHE_TTL_SECONDS: int = 60
+    SENDGRID_STATS_STALE_TTL_SECONDS: int = 600
+    SENDGRID_STATS_TIMEOUT_SECONDS: float = 1.5
+
+    # /dashboard/stats is cached per process for this long (counts may lag by up to the TTL)
+    DASHBOARD_STATS_CACHE_TTL_SECONDS: int = 15
+
+    # dynamic segment audience counts: served from a per-process cache, recounted in the
+    # background once older than the TTL (and at most TTL + stale TTL old)
+    SEGMENT_COUNT_CACHE_TTL_SECONDS: int = 60
+    SEGMENT_COUNT_STALE_TTL_SECONDS: int = 900
+
+    # in-memory Bloom filter over the suppression list (per process); grows past capacity on reload
+    SUPPRESSION_BLOOM_CAPACITY: int = 1_000_000
+    SUPPRESSION_BLOOM_ERROR_RATE: float = 0.001
+
+    # accept raw contact ids / uuid tracking ids from mail sent before signed tokens
+    # (unsubscribe, open and click links); turn off once those mails are old enough
+    TRACKING_ACCEPT_LEGACY_IDS: bool = True
+
+    # open/click hits are buffered per process and written in bulk every FLUSH_MS (or once
+    # BATCH_SIZE hits are waiting); beyond MAX_PENDING unwritten hits new ones are dropped
+    TRACKING_BUFFER_MAX_PENDING: int = 100_000
+    TRACKING_BUFFER_BATCH_SIZE: int = 2000
+    TRACKING_BUFFER_FLUSH_MS: int = 50
     
     # --- THE FIX IS HERE ---
     # We use os.getenv("REDIS_URL") to grab the Railway variable.
@@ -0,0 +1,180 @@
+# app/contacts/imports.py
+"""Background CSV contact imports.
+
+The upload is streamed into GridFS in 1 MiB chunks (the API and the Celery
+worker run as separate services, so they share Mongo, not a filesystem). The
+worker spools it to a local temp file, parses it incrementally with `csv` over
+a text stream, inserts in chunks, and records progress on the `import_jobs`
+document as it goes. Rejected rows are written to a CSV error report that is
+stored back in GridFS for download.
+"""
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from app.contacts.services import bulk_insert_contacts, bulk_upsert_contacts, prepare_row
+
+IMPORT_JOBS = "import_jobs"
+IMPORT_BUCKET = "contact_imports"
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+IMPORT_CHUNK_ROWS = 5000
+ERROR_REPORT_FIELDS = ["row", "email", "error"]
+
+
+def _bucket(database) -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(database, bucket_name=IMPORT_BUCKET)
+
+
+def serialize_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: (str(v) if isinstance(v, ObjectId) else v) for k, v in job.items()}
+    out["id"] = out.pop("_id")
+    out.pop("file_id", None)
+    out["has_error_report"] = bool(out.pop("error_report_file_id", None))
+    return out
+
+
+async def create_import_job(database, upload, created_by: Optional[str] = None, mode: str = "insert") -> Dict[str, Any]:
+    """Stream an UploadFile into GridFS and create a queued import job for it.
+    `mode` is "insert" (skip existing emails) or "upsert" (update them)."""
+    grid_in = _bucket(database).open_upload_stream(
+        upload.filename,
+        metadata={"content_type": upload.content_type, "created_by": created_by},
+    )
+    size = 0
+    while True:
+        chunk = await upload.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        await grid_in.write(chunk)
+        size += len(chunk)
+    await grid_in.close()
+
+    job = {
+        "filename": upload.filename,
+        "file_id": grid_in._id,
+        "size_bytes": size,
+        "status": "queued",
+        "mode": mode,
+        "created_by": created_by,
+        "created_at": datetime.utcnow(),
+        "processed_rows": 0,
+        "inserted": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "duplicates": 0,
+        "invalid": 0,
+        "progress": 0.0,
+    }
+    res = await database.get_collection(IMPORT_JOBS).insert_one(job)
+    job["_id"] = res.inserted_id
+    return job
+
+
+async def get_import_job(database, job_id: str) -> Optional[Dict[str, Any]]:
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await database.get_collection(IMPORT_JOBS).find_one({"_id": ObjectId(job_id)})
+
+
+async def open_error_report(database, job: Dict[str, Any]):
+    """GridOut stream of the job's error report CSV (None if there were no errors)."""
+    if not job.get("error_report_file_id"):
+        return None
+    return await _bucket(database).open_download_stream(job["error_report_file_id"])
+
+
+async def run_import(database, job_id: str) -> Optional[Dict[str, Any]]:
+    """Process a queued import job (called from the Celery worker)."""
+    jobs = database.get_collection(IMPORT_JOBS)
+    contacts = database.get_collection("contacts")
+    bucket = _bucket(database)
+
+    # claim the job so a redelivered task doesn't import the file twice
+    job = await jobs.find_one_and_update(
+        {"_id": ObjectId(job_id), "status": "queued"},
+        {"$set": {"status": "running", "started_at": datetime.utcnow()}},
+    )
+    if not job:
+        return None
+
+    counts = {"processed_rows": 0, "inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "invalid": 0}
+    write_rows = bulk_upsert_contacts if job.get("mode") == "upsert" else bulk_insert_contacts
+    size = job.get("size_bytes") or 0
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            src_path = os.path.join(tmp, "upload.csv")
+            report_path = os.path.join(tmp, "errors.csv")
+
+            grid_out = await bucket.open_download_stream(job["file_id"])
+            with open(src_path, "wb") as src:
+                while True:
+                    chunk = await grid_out.readchunk()
+                    if not chunk:
+                        break
+                    src.write(chunk)
+
+            with open(src_path, "rb") as raw, open(report_path, "w", newline="") as report:
+                text = io.TextIOWrapper(raw, encoding="utf-8-sig", errors="replace", newline="")
+                reader = csv.DictReader(text)
+                writer = csv.DictWriter(report, fieldnames=ERROR_REPORT_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+
+                pending: List[Dict[str, Any]] = []
+
+                async def flush():
+                    if pending:
+                        result = await write_rows(pending, collection=contacts)
+                        for key in ("inserted", "updated", "unchanged", "duplicates"):
+                            counts[key] += result.get(key, 0)
+                        for err in result["errors"]:
+                            counts["invalid"] += 1
+                            writer.writerow(err)
+                        pending.clear()
+                    # raw.tell() runs slightly ahead of the parser (read-ahead buffer)
+                    await jobs.update_one({"_id": job["_id"]}, {"$set": {
+                        **counts,
+                        "progress": round(min(raw.tell() / size, 1.0), 4) if size else 0.0,
+                        "updated_at": datetime.utcnow(),
+                    }})
+
+                for i, row in enumerate(reader, start=2):  # row numbers start at 2 (1 = header)
+                    counts["processed_rows"] += 1
+                    cleaned, error = prepare_row(i, row)
+                    if error:
+                        counts["invalid"] += 1
+                        writer.writerow(error)
+                        continue
+                    pending.append(cleaned)
+                    if len(pending) >= IMPORT_CHUNK_ROWS:
+                        await flush()
+                await flush()
+
+            report_file_id = None
+            if counts["invalid"]:
+                with open(report_path, "rb") as report:
+                    report_file_id = await bucket.upload_from_stream(
+                        f"{job['filename']}.errors.csv", report, metadata={"import_job_id": job["_id"]}
+                    )
+
+        # the uploaded source is no longer needed once imported
+        await bucket.delete(job["file_id"])
+        final = {
+            **counts,
+            "status": "done",
+            "progress": 1.0,
+            "error_report_file_id": report_file_id,
+            "finished_at": datetime.utcnow(),
+        }
+    except Exception as e:
+        final = {**counts, "status": "failed", "error": str(e), "finished_at": datetime.utcnow()}
+
+    await jobs.update_one({"_id": job["_id"]}, {"$set": final})
+    return final
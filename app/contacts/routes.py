@@ -1,13 +1,17 @@
 # app/contacts/routes.py
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response, status
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from app.contacts.schemas import ContactCreate, ContactUpdate, ContactOut
 from app.contacts import services
+from app.contacts import imports
+from app.contacts.segment_counts import memberships
+from app.db.client import db
 from app.deps import get_current_user, require_role
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
-# Get segment counts
+# Get segment counts (precomputed; a contact in several segments counts in each)
 @router.get("/segments")
 async def get_segments(user = Depends(get_current_user)):
     return await services.get_segment_counts()
@@ -25,6 +29,7 @@ async def create_contact_endpoint(payload: ContactCreate, user = Depends(require
         "name": doc["name"],
         "email": doc["email"],
         "segment": doc.get("segment"),
+        "segments": memberships(doc),
         "unsubscribed": doc.get("unsubscribed", False),
         "created_at": doc.get("created_at")
     }
@@ -40,6 +45,7 @@ async def get_contact(contact_id: str, user = Depends(get_current_user)):
         "name": doc["name"],
         "email": doc["email"],
         "segment": doc.get("segment"),
+        "segments": memberships(doc),
         "unsubscribed": doc.get("unsubscribed", False),
         "created_at": doc.get("created_at")
     }
@@ -55,6 +61,7 @@ async def update_contact(contact_id: str, payload: ContactUpdate, user = Depends
         "name": updated["name"],
         "email": updated["email"],
         "segment": updated.get("segment"),
+        "segments": memberships(updated),
         "unsubscribed": updated.get("unsubscribed", False),
         "created_at": updated.get("created_at")
     }
@@ -68,20 +75,33 @@ async def delete_contact(contact_id: str, user = Depends(require_role("marketing
     return {"ok": True, "deleted_id": contact_id}
 
 # List contacts (with filters + pagination)
+# Pass the X-Next-Cursor response header back as `cursor` to get the next page
+# (keyset pagination, constant cost per page). `skip` is kept for older clients.
+# Machine clients (syncs) may request up to 1000 rows per page.
 @router.get("/", response_model=List[ContactOut])
 async def list_contacts(
+    response: Response,
     segment: Optional[str] = Query(None),
     unsubscribed: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None),
     skip: int = Query(0, ge=0),
-    limit: int = Query(50, ge=1, le=100),
+    limit: int = Query(50, ge=1, le=1000),
     user = Depends(get_current_user)
 ):
     q = {}
     if segment:
-        q["segment"] = segment
+        q["segments"] = segment  # membership (multikey index)
     if unsubscribed is not None:
         q["unsubscribed"] = unsubscribed
-    docs = await services.list_contacts(q, skip=skip, limit=limit)
+    if skip and not cursor:
+        docs = await services.list_contacts(q, skip=skip, limit=limit)
+    else:
+        try:
+            docs, next_cursor = await services.list_contacts_page(q, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
     # convert to ContactOut list
     out = []
     for d in docs:
@@ -90,14 +110,21 @@ async def list_contacts(
             "name": d["name"],
             "email": d["email"],
             "segment": d.get("segment"),
+            "segments": memberships(d),
             "unsubscribed": d.get("unsubscribed", False),
             "created_at": d.get("created_at")
         })
     return out
 
 # CSV upload endpoint
+# mode=insert skips existing emails (counted as duplicates);
+# mode=upsert updates name/segment of existing contacts and reports inserted/updated/unchanged
 @router.post("/upload")
-async def upload_csv(file: UploadFile = File(...), user = Depends(require_role("marketing"))):
+async def upload_csv(
+    file: UploadFile = File(...),
+    mode: str = Query("insert", pattern="^(insert|upsert)$"),
+    user = Depends(require_role("marketing")),
+):
     if not file.filename.lower().endswith((".csv", ".txt")):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
     content = await file.read()
@@ -105,8 +132,61 @@ async def upload_csv(file: UploadFile = File(...), user = Depends(require_role("
     rows = parsed["rows"]
     errors = parsed["errors"]
     if not rows:
+        if mode == "upsert":
+            return {"inserted": 0, "updated": 0, "unchanged": 0, "errors": errors}
         return {"inserted": 0, "duplicates": 0, "errors": errors}
-    result = await services.bulk_insert_contacts(rows)
+    if mode == "upsert":
+        result = await services.bulk_upsert_contacts(rows)
+    else:
+        result = await services.bulk_insert_contacts(rows)
     # merge parse errors into result
     result["errors"] = result.get("errors", []) + errors
     return result
+
+
+# Background CSV import for large files: the upload is streamed to storage and a
+# worker parses/inserts it in chunks. Poll GET /contacts/imports/{job_id} for progress.
+@router.post("/imports", status_code=status.HTTP_202_ACCEPTED)
+async def create_import(
+    file: UploadFile = File(...),
+    mode: str = Query("insert", pattern="^(insert|upsert)$"),
+    user = Depends(require_role("marketing")),
+):
+    if not file.filename.lower().endswith((".csv", ".txt")):
+        raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+    job = await imports.create_import_job(db, file, created_by=str(user["_id"]), mode=mode)
+
+    from app.contacts.tasks import import_csv_task
+    import_csv_task.delay(str(job["_id"]))
+    return imports.serialize_job(job)
+
+# Import job status / progress
+@router.get("/imports/{job_id}")
+async def get_import(job_id: str, user = Depends(get_current_user)):
+    job = await imports.get_import_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return imports.serialize_job(job)
+
+# Download the rejected rows of an import as CSV
+@router.get("/imports/{job_id}/errors")
+async def get_import_errors(job_id: str, user = Depends(get_current_user)):
+    job = await imports.get_import_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    grid_out = await imports.open_error_report(db, job)
+    if grid_out is None:
+        raise HTTPException(status_code=404, detail="No error report for this import")
+
+    async def chunks():
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    return StreamingResponse(
+        chunks(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="import_{job_id}_errors.csv"'},
+    )
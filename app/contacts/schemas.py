@@ -1,17 +1,21 @@
 # app/contacts/schemas.py
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 class ContactCreate(BaseModel):
     name: str = Field(..., min_length=1)
     email: EmailStr
     segment: str = Field(..., min_length=1)
+    # extra segments/tags besides the primary `segment`
+    segments: List[str] = []
 
 class ContactUpdate(BaseModel):
     name: Optional[str] = None
     email: Optional[EmailStr] = None
     segment: Optional[str] = None
+    # replaces the whole membership list (primary `segment` first)
+    segments: Optional[List[str]] = None
     unsubscribed: Optional[bool] = None
 
 class ContactOut(BaseModel):
@@ -19,5 +23,6 @@ class ContactOut(BaseModel):
     name: str
     email: EmailStr
     segment: Optional[str] = None
+    segments: List[str] = []
     unsubscribed: bool = False
     created_at: datetime
@@ -0,0 +1,155 @@
+# app/contacts/segment_counts.py
+"""Precomputed segment membership counts.
+
+A contact belongs to every segment in its `segments` array. The
+`segment_counts` collection keeps one document per segment:
+
+    {"_id": "<segment>", "total": <contacts>, "subscribed": <not unsubscribed>}
+
+Every contact write that changes membership or subscription state applies the
+difference between the before/after state with `$inc` (see `membership_delta`),
+so reading counts never scans contacts. `rebuild_segment_counts` recounts from
+scratch (migrations, drift after manual edits) and records that the counts are
+built in `schema_meta`. Until that marker exists the deltas alone are incomplete,
+so `ensure_segment_counts` (run at startup and by every reader) first backfills
+`segments` on contacts that predate it and rebuilds.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pymongo import ReplaceOne, UpdateOne
+
+SEGMENT_COUNTS = "segment_counts"
+
+PROJECTION = {"segment": 1, "segments": 1, "unsubscribed": 1}
+
+META_COLLECTION = "schema_meta"
+META_ID = "segment_counts"
+
+# databases whose counts are known to be built (checked once per process)
+_built: Set[str] = set()
+
+
+def counts_collection(contacts_collection):
+    # same database (and client / event loop) as the contacts collection being written
+    return contacts_collection.database.get_collection(SEGMENT_COUNTS)
+
+
+def memberships(doc: Optional[Dict[str, Any]]) -> List[str]:
+    """Segments of a stored contact; pre-`segments` documents count under their `segment`."""
+    if not doc:
+        return []
+    if doc.get("segments") is not None:
+        return list(doc["segments"])
+    return [doc["segment"]] if doc.get("segment") else []
+
+
+def membership_delta(
+    before: Optional[Dict[str, Any]],
+    after: Optional[Dict[str, Any]],
+) -> Dict[str, Counter]:
+    """Per-segment {"total": n, "subscribed": n} changes between two contact states (None = absent)."""
+    delta: Dict[str, Counter] = {}
+    for doc, sign in ((before, -1), (after, 1)):
+        if not doc:
+            continue
+        subscribed = 0 if doc.get("unsubscribed") else 1
+        for segment in memberships(doc):
+            c = delta.setdefault(segment, Counter())
+            c["total"] += sign
+            c["subscribed"] += sign * subscribed
+    return {s: c for s, c in delta.items() if any(c.values())}
+
+
+def merge_deltas(deltas: Iterable[Dict[str, Counter]]) -> Dict[str, Counter]:
+    merged: Dict[str, Counter] = {}
+    for delta in deltas:
+        for segment, c in delta.items():
+            merged.setdefault(segment, Counter()).update(c)
+    return {s: c for s, c in merged.items() if any(c.values())}
+
+
+async def apply_delta(counts, delta: Dict[str, Counter]) -> None:
+    if not delta:
+        return
+    now = datetime.utcnow()
+    ops = [
+        UpdateOne(
+            {"_id": segment},
+            {"$inc": {"total": c["total"], "subscribed": c["subscribed"]}, "$set": {"updated_at": now}},
+            upsert=True,
+        )
+        for segment, c in delta.items()
+    ]
+    await counts.bulk_write(ops, ordered=False)
+
+
+async def record_change(contacts_collection, before, after) -> None:
+    await apply_delta(counts_collection(contacts_collection), membership_delta(before, after))
+
+
+async def get_counts(counts, segments: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """{segment: {"total", "subscribed"}} for the given segments (all when None)."""
+    await ensure_segment_counts(counts.database.get_collection("contacts"))
+    query = {"_id": {"$in": segments}} if segments is not None else {}
+    return {
+        doc["_id"]: {"total": doc.get("total", 0), "subscribed": doc.get("subscribed", 0)}
+        async for doc in counts.find(query)
+        if doc.get("total", 0) > 0
+    }
+
+
+async def backfill_segments(contacts_collection) -> int:
+    """Set `segments: [segment]` on contacts written before the `segments` array existed."""
+    result = await contacts_collection.update_many(
+        {"segments": {"$exists": False}},
+        [{"$set": {"segments": {"$cond": [{"$ifNull": ["$segment", False]}, ["$segment"], []]}}}],
+    )
+    return result.modified_count
+
+
+async def ensure_segment_counts(contacts_collection) -> bool:
+    """Backfill memberships and build the counts unless the built marker exists; True if it ran."""
+    database = contacts_collection.database
+    if database.name in _built:
+        return False
+    meta = database.get_collection(META_COLLECTION)
+    if not await meta.find_one({"_id": META_ID}):
+        await backfill_segments(contacts_collection)
+        await rebuild_segment_counts(contacts_collection)
+        _built.add(database.name)
+        return True
+    _built.add(database.name)
+    return False
+
+
+async def rebuild_segment_counts(contacts_collection) -> int:
+    """Recount every segment from the contacts collection, replace the stored counts
+    and mark them as built."""
+    pipeline = [
+        {"$project": {
+            "unsubscribed": 1,
+            "segments": {"$ifNull": ["$segments", {"$cond": [{"$ifNull": ["$segment", False]}, ["$segment"], []]}]},
+        }},
+        {"$unwind": "$segments"},
+        {"$group": {
+            "_id": "$segments",
+            "total": {"$sum": 1},
+            "subscribed": {"$sum": {"$cond": [{"$eq": ["$unsubscribed", True]}, 0, 1]}},
+        }},
+    ]
+    rows = await contacts_collection.aggregate(pipeline).to_list(length=None)
+    counts = counts_collection(contacts_collection)
+    now = datetime.utcnow()
+    # replaced in place, so processes rebuilding at the same time don't collide
+    if rows:
+        await counts.bulk_write(
+            [ReplaceOne({"_id": row["_id"]}, {**row, "updated_at": now}, upsert=True) for row in rows],
+            ordered=False,
+        )
+    await counts.delete_many({"_id": {"$nin": [row["_id"] for row in rows]}})
+    await contacts_collection.database.get_collection(META_COLLECTION).update_one(
+        {"_id": META_ID}, {"$set": {"built_at": now, "segments": len(rows)}}, upsert=True
+    )
+    return len(rows)
@@ -1,22 +1,38 @@
 # app/contacts/services.py
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from app.db.client import db
 from bson import ObjectId
 from datetime import datetime
-from pymongo.errors import DuplicateKeyError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from motor.motor_asyncio import AsyncIOMotorCollection
+from app.contacts.utils import contact_segments, email_domain, normalize_email, split_segments
+from app.contacts import segment_counts
+from app.services.suppression_service import REASON_UNSUBSCRIBE, SUPPRESSIONS_COLLECTION, suppress, unsuppress
+from app.utils.pagination import KEYSET_SORT, keyset_filter, next_cursor
 
 COL: AsyncIOMotorCollection = db.get_collection("contacts")
 
+# fields returned by the list endpoint
+CONTACT_LIST_FIELDS = {"name": 1, "email": 1, "segment": 1, "segments": 1, "unsubscribed": 1, "created_at": 1}
+
+# A contact belongs to every segment in `segments` (multikey index); `segment` is kept
+# as its primary segment (= segments[0]) for display and older clients.
 async def create_contact(data: Dict) -> Dict:
+    segments = contact_segments(data.get("segment"), data.get("segments"))
+    email = normalize_email(data["email"])
     doc = {
         "name": data["name"],
-        "email": data["email"],
-        "segment": data.get("segment"),
+        # stored normalized: the unique index on email only catches exact matches
+        "email": email,
+        "email_domain": email_domain(email),
+        "segment": segments[0] if segments else None,
+        "segments": segments,
         "unsubscribed": False,
         "created_at": datetime.utcnow()
     }
     res = await COL.insert_one(doc)
+    await segment_counts.record_change(COL, None, doc)
     doc["_id"] = str(res.inserted_id)
     return doc
 
@@ -28,7 +44,7 @@ async def get_contact_by_id(contact_id: str) -> Optional[Dict]:
     return doc
 
 async def get_contact_by_email(email: str) -> Optional[Dict]:
-    doc = await COL.find_one({"email": email})
+    doc = await COL.find_one({"email": normalize_email(email)})
     if not doc:
         return None
     doc["id"] = str(doc["_id"])
@@ -36,17 +52,48 @@ async def get_contact_by_email(email: str) -> Optional[Dict]:
 
 async def update_contact(contact_id: str, data: Dict) -> Optional[Dict]:
     update = {"$set": {}}
-    for k in ("name", "email", "segment", "unsubscribed"):
+    for k in ("name", "email", "unsubscribed"):
         if k in data and data[k] is not None:
-            update["$set"][k] = data[k]
-    if not update["$set"]:
+            update["$set"][k] = normalize_email(data[k]) if k == "email" else data[k]
+    if "email" in update["$set"]:
+        update["$set"]["email_domain"] = email_domain(update["$set"]["email"])
+    membership_changes = data.get("segment") is not None or data.get("segments") is not None
+    if not update["$set"] and not membership_changes:
         return await get_contact_by_id(contact_id)
+
+    before = await COL.find_one({"_id": ObjectId(contact_id)}, projection={"email": 1, **segment_counts.PROJECTION})
+    if not before:
+        return None
+    if membership_changes:
+        # `segments` replaces the membership list; `segment` alone swaps the primary segment
+        current = segment_counts.memberships(before)
+        primary = data.get("segment") or (current[0] if current else None)
+        extra = data["segments"] if data.get("segments") is not None else current[1:]
+        segments = contact_segments(primary, extra)
+        update["$set"]["segment"] = segments[0] if segments else None
+        update["$set"]["segments"] = segments
     await COL.update_one({"_id": ObjectId(contact_id)}, update)
+    await segment_counts.record_change(COL, before, {**before, **update["$set"]})
+    await _sync_suppression(before, update["$set"])
     return await get_contact_by_id(contact_id)
 
+# The suppression list (checked at send time) follows manual (un)subscribes; a
+# resubscribe withdraws only the unsubscribe reason, bounces/spam reports stay.
+async def _sync_suppression(before: Dict, changes: Dict) -> None:
+    if "unsubscribed" not in changes or bool(changes["unsubscribed"]) == bool(before.get("unsubscribed")):
+        return
+    suppressions = COL.database.get_collection(SUPPRESSIONS_COLLECTION)
+    if changes["unsubscribed"]:
+        await suppress(suppressions, changes.get("email") or before["email"], REASON_UNSUBSCRIBE)
+    else:
+        await unsuppress(suppressions, before["email"], REASON_UNSUBSCRIBE)
+
 async def delete_contact(contact_id: str) -> bool:
-    res = await COL.delete_one({"_id": ObjectId(contact_id)})
-    return res.deleted_count == 1
+    doc = await COL.find_one_and_delete({"_id": ObjectId(contact_id)}, projection=segment_counts.PROJECTION)
+    if not doc:
+        return False
+    await segment_counts.record_change(COL, doc, None)
+    return True
 
 async def list_contacts(filter_query: Dict = None, skip: int = 0, limit: int = 50) -> List[Dict]:
     filter_query = filter_query or {}
@@ -57,62 +104,191 @@ async def list_contacts(filter_query: Dict = None, skip: int = 0, limit: int = 5
         results.append(doc)
     return results
 
+# Keyset pagination on (created_at, _id): every page costs the same, whatever its depth.
+# Backed by the (segments, unsubscribed, created_at, _id) family of indexes.
+async def list_contacts_page(
+    filter_query: Dict = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict], Optional[str]]:
+    query = dict(filter_query or {})
+    if cursor:
+        query.update(keyset_filter(cursor))  # raises ValueError on a bad cursor
+    docs = await COL.find(query, projection=CONTACT_LIST_FIELDS).sort(KEYSET_SORT).limit(limit).to_list(length=limit)
+    for doc in docs:
+        doc["id"] = str(doc["_id"])
+    return docs, next_cursor(docs, limit)
+
+# Read from the incrementally maintained segment_counts collection (no contacts scan;
+# built on first use after upgrading). A contact in several segments is counted in each of them.
 async def get_segment_counts() -> List[Dict]:
-    pipeline = [
-        {"$group": {"_id": "$segment", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
+    counts = await segment_counts.get_counts(segment_counts.counts_collection(COL))
+    results = [
+        {"segment": name, "count": c["total"], "subscribed": c["subscribed"]}
+        for name, c in counts.items()
     ]
-    cursor = COL.aggregate(pipeline)
-    results = []
-    async for doc in cursor:
-        # Handle None/null segments if any exist from before
-        segment_name = doc["_id"] if doc["_id"] else "Unsegmented"
-        results.append({"segment": segment_name, "count": doc["count"]})
+    results.sort(key=lambda r: r["count"], reverse=True)
     return results
 
 # Bulk insert rows (assumes rows already validated and normalized)
-async def bulk_insert_contacts(rows):
+# Relies on the unique index on contacts.email: rows are written in unordered
+# insert_many chunks and duplicate-key errors (code 11000) are counted as duplicates.
+INSERT_CHUNK_SIZE = 1000
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def bulk_insert_contacts(rows, chunk_size: int = INSERT_CHUNK_SIZE, collection: Optional[AsyncIOMotorCollection] = None):
+    # background workers pass their own collection (their own event loop / client)
+    col = collection if collection is not None else COL
     inserted = 0
     duplicates = 0
     errors = []
     now = datetime.utcnow()
 
-    for r in rows:
-        # Check duplicate in DB
-        exists = await COL.find_one({"email": r["email"]})
-        if exists:
-            duplicates += 1
-            continue
-        
-        doc = {
-            "name": r["name"],
-            "email": r["email"],
-            "segment": r.get("segment"),
-            "unsubscribed": False,
-            "created_at": now
-        }
-
+    for start in range(0, len(rows), chunk_size):
+        docs = []
+        for r in rows[start:start + chunk_size]:
+            segments = contact_segments(r.get("segment"), r.get("segments"))
+            docs.append({
+                "name": r["name"],
+                "email": r["email"],
+                "email_domain": email_domain(r["email"]),
+                "segment": segments[0] if segments else None,
+                "segments": segments,
+                "unsubscribed": False,
+                "created_at": now
+            })
+        failed = set()
         try:
-            await COL.insert_one(doc)
-            inserted += 1
-        except DuplicateKeyError:
-            duplicates += 1
-        except Exception as ex:
-            errors.append({"email": r["email"], "error": str(ex)})
+            res = await col.insert_many(docs, ordered=False)
+            inserted += len(res.inserted_ids)
+        except BulkWriteError as bwe:
+            details = bwe.details or {}
+            inserted += details.get("nInserted", 0)
+            for err in details.get("writeErrors", []):
+                failed.add(err["index"])
+                if err.get("code") == DUPLICATE_KEY_ERROR:
+                    duplicates += 1
+                else:
+                    errors.append({"email": docs[err["index"]]["email"], "error": err.get("errmsg")})
+        await segment_counts.apply_delta(
+            segment_counts.counts_collection(col),
+            segment_counts.merge_deltas(
+                segment_counts.membership_delta(None, d) for i, d in enumerate(docs) if i not in failed
+            ),
+        )
 
     return {"inserted": inserted, "duplicates": duplicates, "errors": errors}
 
 
+# Upsert rows keyed on email: new emails are inserted, existing contacts get their
+# name/segments refreshed. unsubscribed and created_at of existing contacts are kept.
+# The current state of each chunk is read first (one $in query on the email index)
+# so the segment counts can be adjusted.
+async def bulk_upsert_contacts(rows, chunk_size: int = INSERT_CHUNK_SIZE, collection: Optional[AsyncIOMotorCollection] = None):
+    col = collection if collection is not None else COL
+    inserted = 0
+    updated = 0
+    unchanged = 0
+    errors = []
+    now = datetime.utcnow()
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        existing = {
+            d["email"]: d
+            async for d in col.find(
+                {"email": {"$in": [r["email"] for r in chunk]}},
+                projection={"email": 1, **segment_counts.PROJECTION},
+            )
+        }
+        ops = []
+        changes = []
+        for r in chunk:
+            segments = contact_segments(r.get("segment"), r.get("segments"))
+            fields = {
+                "name": r["name"],
+                "email_domain": email_domain(r["email"]),
+                "segment": segments[0] if segments else None,
+                "segments": segments,
+            }
+            ops.append(UpdateOne(
+                {"email": r["email"]},
+                {"$set": fields, "$setOnInsert": {"unsubscribed": False, "created_at": now}},
+                upsert=True,
+            ))
+            before = existing.get(r["email"])
+            changes.append((before, {**(before or {"unsubscribed": False}), **fields}))
+        failed = set()
+        try:
+            res = await col.bulk_write(ops, ordered=False)
+            counts = {"nUpserted": res.upserted_count, "nMatched": res.matched_count, "nModified": res.modified_count}
+        except BulkWriteError as bwe:
+            counts = bwe.details or {}
+            # concurrent upserts of the same new email can lose the race on the unique index
+            for err in counts.get("writeErrors", []):
+                failed.add(err["index"])
+                errors.append({"email": chunk[err["index"]]["email"], "error": err.get("errmsg")})
+        await segment_counts.apply_delta(
+            segment_counts.counts_collection(col),
+            segment_counts.merge_deltas(
+                segment_counts.membership_delta(before, after)
+                for i, (before, after) in enumerate(changes) if i not in failed
+            ),
+        )
+        inserted += counts.get("nUpserted", 0)
+        updated += counts.get("nModified", 0)
+        unchanged += counts.get("nMatched", 0) - counts.get("nModified", 0)
+
+    return {"inserted": inserted, "updated": updated, "unchanged": unchanged, "errors": errors}
+
+
 # ------------------------------- CSV PARSER (UPDATED EMAIL VALIDATION) -------------------------------
 
 import csv
 import io
-from app.contacts.utils import normalize_email
-from pydantic import BaseModel, EmailStr, ValidationError
+import logging
+from app.contacts.validation import is_valid_email, validate_emails_async
+
+logger = logging.getLogger(__name__)
+
+
+def _clean_row(i: int, row: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Normalize one CSV row (no email validation yet) -> (cleaned_row, None) or (None, error)."""
+    raw_name = (row.get("name") or "").strip()
+    raw_email = row.get("email", "")
+
+    cleaned_email = normalize_email(raw_email)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Row %s email %r -> %r", i, raw_email, cleaned_email)
+
+    raw_segment = (row.get("segment") or "general").strip()
+    # optional extra segments/tags column: "vip; newsletter"
+    extra_segments = split_segments(row.get("segments") or row.get("tags"))
+
+    # Skip empty rows
+    if not cleaned_email:
+        return None, {"row": i, "error": "Email missing"}
+
+    # Clean name (title case optional)
+    cleaned_name = " ".join(raw_name.split()).title()
 
-# FIX → Pydantic v2 requires validation through a model
-class EmailCheck(BaseModel):
-    email: EmailStr
+    return {
+        "name": cleaned_name,
+        "email": cleaned_email,
+        "segment": raw_segment,
+        "segments": contact_segments(raw_segment, extra_segments),
+    }, None
+
+
+def prepare_row(i: int, row: Dict) -> Tuple[Optional[Dict], Optional[Dict]]:
+    """Normalize and validate one CSV row -> (cleaned_row, None) or (None, error)."""
+    cleaned, error = _clean_row(i, row)
+    if error:
+        return None, error
+    if not is_valid_email(cleaned["email"]):
+        return None, {"row": i, "error": "Invalid email", "email": cleaned["email"]}
+    return cleaned, None
 
 
 async def parse_csv_and_prepare(upload_bytes: bytes):
@@ -122,43 +298,29 @@ async def parse_csv_and_prepare(upload_bytes: bytes):
     cleaned_rows = []
     errors = []
     seen_in_file = set()
-    
-    for i, row in enumerate(reader, start=2):  # row numbers start at 2 (1 = header)
-        raw_name = (row.get("name") or "").strip()
-        raw_email = row.get("email", "")
 
-        print("RAW EMAIL BYTES:", repr(raw_email))  # DEBUG
-        raw_email = normalize_email(raw_email)
-        print("CLEANED EMAIL:", repr(raw_email))    # DEBUG
+    candidates = []
+    for i, row in enumerate(reader, start=2):  # row numbers start at 2 (1 = header)
+        cleaned, error = _clean_row(i, row)
+        if error:
+            errors.append(error)
+            continue
+        candidates.append((i, cleaned))
 
-        raw_segment = (row.get("segment") or "general").strip()
+    # validate all addresses in one batch (spread over a process pool for big files)
+    valid = await validate_emails_async([c["email"] for _, c in candidates])
 
-        # Skip empty rows
-        if not raw_email:
-            errors.append({"row": i, "error": "Email missing"})
+    for (i, cleaned), ok in zip(candidates, valid):
+        if not ok:
+            errors.append({"row": i, "error": "Invalid email", "email": cleaned["email"]})
             continue
 
         # In-file duplicate check
-        if raw_email in seen_in_file:
-            errors.append({"row": i, "error": "Duplicate email in CSV", "email": raw_email})
+        if cleaned["email"] in seen_in_file:
+            errors.append({"row": i, "error": "Duplicate email in CSV", "email": cleaned["email"]})
             continue
-        seen_in_file.add(raw_email)
-
-        # ---------------- EMAIL VALIDATION FIX ----------------
-        try:
-            EmailCheck(email=raw_email)
-        except ValidationError:
-            errors.append({"row": i, "error": "Invalid email", "email": raw_email})
-            continue
-        # ------------------------------------------------------
-
-        # Clean name (title case optional)
-        cleaned_name = " ".join(raw_name.split()).title()
+        seen_in_file.add(cleaned["email"])
 
-        cleaned_rows.append({
-            "name": cleaned_name,
-            "email": raw_email,
-            "segment": raw_segment,
-        })
+        cleaned_rows.append(cleaned)
     
     return {"rows": cleaned_rows, "errors": errors}
@@ -0,0 +1,102 @@
+# app/contacts/tasks.py
+
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.worker import celery_app
+from app.utils.config import settings
+from app.services.engagement_service import EngagementScorer
+from app.services.send_time_service import SendTimeOptimizer
+from app.contacts.imports import run_import
+
+# ---------------------------------------------------------------------------
+# Task: Recompute contact engagement scores
+# ---------------------------------------------------------------------------
+
+@celery_app.task(name="contacts.score_engagement")
+def score_engagement_task():
+    """
+    Celery entrypoint (sync) -> recompute engagement_score for every mailed contact.
+    """
+    print("[Celery] Started engagement scoring")
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(run_score_engagement_async())
+    finally:
+        loop.close()
+
+
+async def run_score_engagement_async():
+    # Database Connection (Specific to this event loop)
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        result = await EngagementScorer(db).run()
+        print(f"[Celery] ✅ Engagement scoring done: {result}")
+        return result
+    finally:
+        client.close()
+
+
+# ---------------------------------------------------------------------------
+# Task: Recompute preferred send hours
+# ---------------------------------------------------------------------------
+
+@celery_app.task(name="contacts.compute_send_times")
+def compute_send_times_task():
+    """
+    Celery entrypoint (sync) -> recompute preferred_send_hour from open history.
+    """
+    print("[Celery] Started send-time optimization")
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(run_compute_send_times_async())
+    finally:
+        loop.close()
+
+
+async def run_compute_send_times_async():
+    # Database Connection (Specific to this event loop)
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        result = await SendTimeOptimizer(db).run()
+        print(f"[Celery] ✅ Preferred send hours updated: {result}")
+        return result
+    finally:
+        client.close()
+
+
+# ---------------------------------------------------------------------------
+# Task: Background CSV import
+# ---------------------------------------------------------------------------
+
+@celery_app.task(name="contacts.import_csv")
+def import_csv_task(job_id: str):
+    """
+    Celery entrypoint (sync) -> process an uploaded contacts CSV (see app.contacts.imports).
+    """
+    print(f"[Celery] Started contacts import job: {job_id}")
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(run_import_csv_async(job_id))
+    finally:
+        loop.close()
+
+
+async def run_import_csv_async(job_id: str):
+    # Database Connection (Specific to this event loop)
+    client = AsyncIOMotorClient(settings.MONGO_URI)
+    db = client.get_default_database()
+    try:
+        result = await run_import(db, job_id)
+        print(f"[Celery] ✅ Contacts import job {job_id} finished: {result}")
+        return result
+    finally:
+        client.close()
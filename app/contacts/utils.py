@@ -1,5 +1,5 @@
 # app/contacts/utils.py
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional
 from app.contacts.schemas import ContactCreate
 from pydantic import ValidationError
 
@@ -31,3 +31,27 @@ def validate_row(row: Dict) -> ContactCreate:
         "segment": row.get("segment", None)
     }
     return ContactCreate.model_validate(data)  # pydantic v2
+
+
+def contact_segments(segment: Optional[str], segments: Optional[Iterable[str]] = None) -> List[str]:
+    # primary segment first, then extra segments/tags; trimmed, de-duplicated, order kept
+    out: List[str] = []
+    for s in [segment, *(segments or [])]:
+        s = (s or "").strip()
+        if s and s not in out:
+            out.append(s)
+    return out
+
+
+def split_segments(raw: Optional[str]) -> List[str]:
+    # CSV cell with several segments: "vip; newsletter" or "vip|newsletter"
+    if not raw:
+        return []
+    return [s.strip() for s in raw.replace("|", ";").split(";") if s.strip()]
+
+
+def email_domain(email: str) -> Optional[str]:
+    # stored on contacts so segment rules can filter by domain on an index
+    if not email or "@" not in email:
+        return None
+    return email.rsplit("@", 1)[1].lower()
@@ -0,0 +1,94 @@
+# app/contacts/validation.py
+"""Email validation for bulk contact imports.
+
+- fast path: one precompiled regex for the common plain-ASCII `local@domain.tld`
+  shape, plus a per-domain check cached with lru_cache (a list has far fewer
+  distinct domains than addresses)
+- anything the regex can't decide (non-ASCII, quoted local parts, odd
+  characters) falls back to the full `email-validator` check
+- large batches are split into chunks and validated in a process pool
+
+Deliverability (DNS) is not checked, same as pydantic's EmailStr.
+"""
+import asyncio
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence
+
+from email_validator import EmailNotValidError, validate_email
+
+MAX_EMAIL_LENGTH = 254
+PARALLEL_THRESHOLD = 50000
+CHUNK_SIZE = 25000
+
+# dot-atom local part (no leading/trailing/double dots) @ lower-case ASCII domain
+_FAST_RE = re.compile(
+    r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*"
+    r"@((?:[a-z0-9](?:[a-z0-9-]{0,61}[a-z0-9])?\.)+[a-z]{2,63})"
+)
+# characters that can never appear in an address, even quoted
+_REJECT_RE = re.compile(r"[\s<>()\[\]\\,;:]|^[^@]*$")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+@lru_cache(maxsize=65536)
+def _domain_ok(domain: str) -> bool:
+    """Full domain validation (length limits, special-use/reserved names), once per domain."""
+    try:
+        validate_email(f"x@{domain}", check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+def _full_check(email: str) -> bool:
+    try:
+        validate_email(email, check_deliverability=False)
+        return True
+    except EmailNotValidError:
+        return False
+
+
+def is_valid_email(email: str) -> bool:
+    """Validate one (already normalized, lower-cased) address."""
+    if not email or len(email) > MAX_EMAIL_LENGTH:
+        return False
+    match = _FAST_RE.fullmatch(email)
+    if match and match.start(1) <= 65:  # local part within the usual 64 chars
+        return _domain_ok(match.group(1))
+    if email.isascii() and _REJECT_RE.search(email):
+        return False
+    # ambiguous: let email-validator decide
+    return _full_check(email)
+
+
+def validate_emails(emails: Sequence[str]) -> List[bool]:
+    return [is_valid_email(e) for e in emails]
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) - 1))
+    return _pool
+
+
+async def validate_emails_async(emails: Sequence[str]) -> List[bool]:
+    """Validate a batch; batches above PARALLEL_THRESHOLD are spread over a process pool by chunk."""
+    if len(emails) < PARALLEL_THRESHOLD:
+        return validate_emails(emails)
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    chunks = [emails[i:i + CHUNK_SIZE] for i in range(0, len(emails), CHUNK_SIZE)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, validate_emails, c) for c in chunks))
+    return [ok for chunk in results for ok in chunk]
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
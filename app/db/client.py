@@ -9,4 +9,5 @@ campaigns = db["campaigns"]
 contacts = db["contacts"]
 templates = db["templates"]
 email_logs = db["email_logs"]
-scheduled_jobs = db["scheduled_jobs"]
\ No newline at end of file
+scheduled_jobs = db["scheduled_jobs"]
+campaign_stats = db["campaign_stats"]
@@ -0,0 +1,184 @@
+# app/db/indexes.py
+"""Declarative index registry for every MailMate collection.
+
+`INDEXES` is the single source of truth: each entry backs a hot query path.
+`ensure_indexes` applies it idempotently at API and worker startup; the applied
+`INDEX_VERSION` is recorded in `schema_meta`, so startups after the first one
+skip the createIndexes round trips. Bump INDEX_VERSION whenever INDEXES changes;
+when an existing index's options change, also list it in `REDEFINED` so the old
+definition is dropped and recreated instead of being reported as a conflict.
+
+`index_report` compares the registry with what exists in the database and uses
+`$indexStats` to flag indexes that have not been used since the server started.
+Indexes that exist but are not registered are reported, never dropped.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Set
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 8
+META_COLLECTION = "schema_meta"
+META_ID = "indexes"
+
+_KEYSET = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "contacts": [
+        # lookups/imports/upserts by normalized email; duplicate-key errors drive import counts
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+        # listing (keyset) with optional segment/unsubscribed filters, and audience queries;
+        # `segments` is an array, so these are multikey (one entry per membership)
+        IndexModel(_KEYSET, name="created_at_-1__id_-1"),
+        IndexModel([("segments", ASCENDING)] + _KEYSET, name="segments_1_created_at_-1__id_-1"),
+        IndexModel([("unsubscribed", ASCENDING)] + _KEYSET, name="unsubscribed_1_created_at_-1__id_-1"),
+        IndexModel(
+            [("segments", ASCENDING), ("unsubscribed", ASCENDING)] + _KEYSET,
+            name="segments_1_unsubscribed_1_created_at_-1__id_-1",
+        ),
+        # dynamic segment rules (app/segments/rules.py)
+        IndexModel([("email_domain", ASCENDING)], name="email_domain_1"),
+        IndexModel([("engagement_score", ASCENDING)], name="engagement_score_1"),
+        # dashboard: exact count of unsubscribed contacts only
+        IndexModel(
+            [("unsubscribed", ASCENDING)],
+            name="unsubscribed_true",
+            partialFilterExpression={"unsubscribed": True},
+        ),
+    ],
+    "email_logs": [
+        # webhook: log lookup per event
+        IndexModel([("campaign_id", ASCENDING), ("email", ASCENDING)], name="campaign_id_1_email_1"),
+        # signed open/click tokens: one targeted write per hit
+        IndexModel([("campaign_id", ASCENDING), ("contact_id", ASCENDING)], name="campaign_id_1_contact_id_1"),
+        # /analytics/logs keyset pages and exports
+        IndexModel([("campaign_id", ASCENDING)] + _KEYSET, name="campaign_id_1_created_at_-1__id_-1"),
+        # legacy open pixel ids; only older logs carry one, so the index is sparse
+        # (a plain unique index treats every log without one as a duplicate null)
+        IndexModel([("tracking_id", ASCENDING)], name="tracking_id_1", unique=True, sparse=True),
+    ],
+    "tracking_links": [
+        # clicks resolve by _id; per-campaign link report
+        IndexModel([("campaign_id", ASCENDING)], name="campaign_id_1"),
+    ],
+    "scheduled_jobs": [
+        # job status per campaign (one job per send wave)
+        IndexModel([("campaign_id", ASCENDING), ("run_at", ASCENDING)], name="campaign_id_1_run_at_1"),
+    ],
+    "campaigns": [
+        IndexModel([("created_at", DESCENDING)], name="created_at_-1"),
+        # due campaigns
+        IndexModel([("status", ASCENDING), ("send_at", ASCENDING)], name="status_1_send_at_1"),
+    ],
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_1", unique=True),
+    ],
+    "email_events": [
+        # open bucket per campaign+hour is looked up on every event
+        IndexModel(
+            [("campaign_id", ASCENDING), ("hour", ASCENDING), ("count", ASCENDING)],
+            name="campaign_id_1_hour_1_count_1",
+        ),
+    ],
+    "unique_sketches": [
+        IndexModel(
+            [("campaign_id", ASCENDING), ("metric", ASCENDING), ("granularity", ASCENDING), ("bucket", ASCENDING)],
+            name="campaign_id_1_metric_1_granularity_1_bucket_1",
+        ),
+    ],
+    "campaign_timeseries": [
+        IndexModel([("campaign_id", ASCENDING), ("hour", ASCENDING)], name="campaign_id_1_hour_1"),
+    ],
+    "dynamic_segments": [
+        IndexModel([("created_at", DESCENDING)], name="created_at_-1"),
+    ],
+    "suppressions": [
+        # _id is the email (exact confirmation); updated_at drives the per-process filter refresh
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1"),
+    ],
+    "import_jobs": [
+        IndexModel([("created_at", DESCENDING)], name="created_at_-1"),
+    ],
+}
+
+# registered indexes whose options changed since they were first deployed, by collection
+REDEFINED: Dict[str, Set[str]] = {
+    # was unique over every log (v7 and earlier)
+    "email_logs": {"tracking_id_1"},
+}
+
+
+def _options_differ(existing: Dict[str, Any], model: IndexModel) -> bool:
+    return any(
+        existing.get(option) != model.document.get(option)
+        for option in ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+    )
+
+
+async def ensure_indexes(database, force: bool = False) -> Dict[str, Any]:
+    """Create every registered index that doesn't exist yet.
+
+    Skipped when the recorded version is already current (unless `force`).
+    An index listed in `REDEFINED` that exists with other options is dropped and
+    recreated first. Any other index whose name or key already exists with
+    different options is logged and left alone; it has to be migrated by hand.
+    """
+    meta = database.get_collection(META_COLLECTION)
+    if not force:
+        current = await meta.find_one({"_id": META_ID})
+        if current and current.get("version", 0) >= INDEX_VERSION:
+            return {"version": current["version"], "skipped": True, "conflicts": []}
+
+    conflicts = []
+    for collection, models in INDEXES.items():
+        coll = database.get_collection(collection)
+        redefined = REDEFINED.get(collection, set())
+        existing = await coll.index_information() if redefined else {}
+        for model in models:
+            name = model.document["name"]
+            try:
+                if name in redefined and name in existing and _options_differ(existing[name], model):
+                    await coll.drop_index(name)
+                    logger.info("Index %s.%s dropped to recreate it with its new definition", collection, name)
+                await coll.create_indexes([model])
+            except OperationFailure as e:
+                conflicts.append({"collection": collection, "index": name, "error": str(e)})
+                logger.warning("Index %s.%s not created: %s", collection, name, e)
+
+    if not conflicts:
+        await meta.update_one(
+            {"_id": META_ID},
+            {"$set": {"version": INDEX_VERSION, "applied_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    logger.info("Index registry v%s applied (%s conflicts)", INDEX_VERSION, len(conflicts))
+    return {"version": INDEX_VERSION, "skipped": False, "conflicts": conflicts}
+
+
+async def index_report(database) -> Dict[str, Any]:
+    """Per collection: registered indexes that are missing, unregistered extras, and
+    indexes with no recorded use since the server started ($indexStats)."""
+    report: Dict[str, Any] = {}
+    for collection, models in INDEXES.items():
+        coll = database.get_collection(collection)
+        existing = await coll.index_information()
+        registered = {m.document["name"] for m in models}
+
+        unused = []
+        try:
+            async for stat in coll.aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and int(stat.get("accesses", {}).get("ops", 0)) == 0:
+                    unused.append({"name": stat["name"], "since": stat.get("accesses", {}).get("since")})
+        except OperationFailure as e:
+            logger.warning("$indexStats unavailable for %s: %s", collection, e)
+
+        report[collection] = {
+            "missing": sorted(registered - set(existing)),
+            "unregistered": sorted(set(existing) - registered - {"_id_"}),
+            "unused": unused,
+        }
+    return report
@@ -14,6 +14,7 @@ from app.contacts import routes as contacts_routes
 # import templates & campaigns routers lazily after deps exist
 from app.templates import routes as templates_routes
 from app.campaigns import routes as campaigns_routes
+from app.segments import routes as segments_routes
 
 # CORRECT import: import the APIRouter instance from the module
 from app.storage.router import router as storage_router
@@ -22,6 +23,14 @@ from app.routes import send_bulk_test
 from app.routes import analytics
 from app.routes import sendgrid_webhook
 from app.routes import unsubscribe as unsubscribe_routes
+from app import tracking_routes
+from app.services import sendgrid_stats_cache
+from app.db.client import db
+from app.db.indexes import ensure_indexes
+from app.services.suppression_service import SUPPRESSIONS_COLLECTION, suppression_filter
+from app.contacts import validation as contact_validation
+from app.contacts import segment_counts
+from app.services.campaign_stats_service import ensure_campaign_stats
 
 
 
@@ -56,10 +65,60 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def apply_index_registry():
+    # idempotent; a no-op round trip once the current registry version is recorded
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        print(f"⚠️ Could not apply index registry: {e}")
+
+@app.on_event("startup")
+async def prepare_contact_segments():
+    # contacts from before the `segments` array are backfilled (audience and list filters
+    # match on it) and the segment counts built, once per database
+    try:
+        await segment_counts.ensure_segment_counts(db.get_collection("contacts"))
+    except Exception as e:
+        print(f"⚠️ Could not prepare contact segments: {e}")
+
+@app.on_event("startup")
+async def prepare_campaign_stats():
+    # rollups of campaigns sent before the rollup existed are rebuilt from email_logs
+    # once per database; increments alone would only hold events since the upgrade
+    try:
+        await ensure_campaign_stats(db)
+    except Exception as e:
+        print(f"⚠️ Could not prepare campaign stats: {e}")
+
+@app.on_event("startup")
+async def load_suppression_filter():
+    # /send-bulk sends from the API process; the filter would otherwise load on first send
+    try:
+        await suppression_filter.load(db.get_collection(SUPPRESSIONS_COLLECTION))
+    except Exception as e:
+        print(f"⚠️ Could not load suppression filter: {e}")
+
+@app.on_event("startup")
+async def start_tracking_buffer():
+    tracking_routes.BUFFER.start()
+
+@app.on_event("shutdown")
+async def close_shared_clients():
+    # write out buffered open/click hits before the process goes away
+    await tracking_routes.BUFFER.stop()
+    await sendgrid_stats_cache.close()
+    contact_validation.shutdown_pool()
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok", "message": "Backend is reachable"}
 
+@app.get("/health/tracking")
+async def tracking_buffer_health():
+    # per-process: accepted/dropped/flushed hits, pending depth, last flush size and time
+    return tracking_routes.BUFFER.stats()
+
 # add middleware
 app.add_middleware(RequestLoggerMiddleware)
 
@@ -73,10 +132,12 @@ app.include_router(auth.router)
 app.include_router(contacts_routes.router)
 app.include_router(templates_routes.router)
 app.include_router(campaigns_routes.router)
+app.include_router(segments_routes.router)
 app.include_router(analytics.router)
 print("DEBUG: Including sendgrid_webhook router")
 app.include_router(sendgrid_webhook.router)
 app.include_router(unsubscribe_routes.router)
+app.include_router(tracking_routes.router)
 from app.routes import dashboard_routes
 app.include_router(dashboard_routes.router)
 app.include_router(storage_router)
@@ -0,0 +1,50 @@
+"""
+Migration script to move contacts from a single `segment` to the `segments` array.
+
+- sets `segments: [segment]` on contacts that don't have the array yet
+- (re)builds the segment_counts collection from the contacts
+- applies the index registry (multikey `segments` indexes)
+
+The API and the worker also do the first two steps at startup when the counts
+have never been built. Safe to re-run; use it again whenever the counts are
+suspected to have drifted.
+"""
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+from app.contacts.segment_counts import backfill_segments, rebuild_segment_counts
+from app.db.indexes import ensure_indexes
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+async def add_contact_segments():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    contacts = db.get_collection("contacts")
+
+    print("Starting migration: Adding segments array to contacts...")
+    backfilled = await backfill_segments(contacts)
+    print(f"Backfilled segments on {backfilled} contacts")
+
+    segments = await rebuild_segment_counts(contacts)
+    print(f"Rebuilt counts for {segments} segments")
+
+    applied = await ensure_indexes(db, force=True)
+    for conflict in applied["conflicts"]:
+        print(f"⚠️ {conflict['collection']}.{conflict['index']}: {conflict['error']}")
+
+    print(f"✅ Migration complete!")
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Contact Segments Migration - segments array + counts")
+    print("=" * 60)
+    asyncio.run(add_contact_segments())
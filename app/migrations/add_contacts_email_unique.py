@@ -0,0 +1,77 @@
+"""
+Migration script to make contacts unique by normalized email.
+
+- lower-cases/trims stored emails that aren't normalized yet
+- reports emails that occur more than once; with --drop-duplicates the oldest
+  contact is kept and the newer copies are deleted
+- replaces any plain index on email with a unique one
+
+Usage:
+    python -m app.migrations.add_contacts_email_unique [--drop-duplicates]
+"""
+import os
+import sys
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from dotenv import load_dotenv
+
+from app.contacts.utils import normalize_email
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+def migrate_contacts_email(drop_duplicates: bool = False):
+    client = MongoClient(MONGO_URI)
+    contacts = client.get_default_database().get_collection("contacts")
+
+    print("Starting migration: Normalizing contact emails...")
+    ops = []
+    normalized = 0
+    cursor = contacts.find(
+        {"$expr": {"$ne": ["$email", {"$toLower": {"$trim": {"input": "$email"}}}]}},
+        projection={"email": 1},
+    )
+    for doc in cursor:
+        ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"email": normalize_email(doc.get("email") or "")}}))
+        if len(ops) >= 1000:
+            normalized += contacts.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        normalized += contacts.bulk_write(ops, ordered=False).modified_count
+    print(f"   - Emails normalized: {normalized}")
+
+    duplicates = list(contacts.aggregate([
+        {"$sort": {"created_at": 1, "_id": 1}},
+        {"$group": {"_id": "$email", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True))
+
+    if duplicates:
+        print(f"Found {len(duplicates)} emails used by more than one contact")
+        for dup in duplicates[:20]:
+            print(f"   - {dup['_id']}: {dup['count']} contacts")
+        if not drop_duplicates:
+            print("❌ Resolve duplicates (or re-run with --drop-duplicates) before creating the unique index")
+            client.close()
+            return
+        extra_ids = [oid for dup in duplicates for oid in dup["ids"][1:]]
+        res = contacts.delete_many({"_id": {"$in": extra_ids}})
+        print(f"   - Duplicate contacts deleted (oldest kept): {res.deleted_count}")
+
+    for name, spec in contacts.index_information().items():
+        if spec.get("key") == [("email", ASCENDING)] and not spec.get("unique"):
+            contacts.drop_index(name)
+            print(f"   - Dropped non-unique index {name}")
+    contacts.create_index([("email", ASCENDING)], unique=True)
+
+    print("✅ Migration complete! contacts.email is unique")
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Contacts Migration - Unique Normalized Email")
+    print("=" * 60)
+    migrate_contacts_email(drop_duplicates="--drop-duplicates" in sys.argv[1:])
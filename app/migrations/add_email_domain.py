@@ -0,0 +1,45 @@
+"""
+Migration script to add `email_domain` to existing contacts.
+
+Dynamic segment rules filter on the stored (indexed) domain instead of a regex
+over `email`. New and updated contacts get it on write; this backfills the rest
+and applies the index registry. Safe to re-run.
+"""
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+from app.db.indexes import ensure_indexes
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+async def add_email_domain():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    contacts = db.get_collection("contacts")
+
+    print("Starting migration: Adding email_domain to contacts...")
+    result = await contacts.update_many(
+        {"email_domain": {"$exists": False}, "email": {"$type": "string", "$regex": "@"}},
+        [{"$set": {"email_domain": {"$toLower": {"$arrayElemAt": [{"$split": ["$email", "@"]}, -1]}}}}],
+    )
+    print(f"Backfilled email_domain on {result.modified_count} contacts")
+
+    applied = await ensure_indexes(db, force=True)
+    for conflict in applied["conflicts"]:
+        print(f"⚠️ {conflict['collection']}.{conflict['index']}: {conflict['error']}")
+
+    print(f"✅ Migration complete!")
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Contact Email Domain Migration")
+    print("=" * 60)
+    asyncio.run(add_email_domain())
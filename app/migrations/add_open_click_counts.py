@@ -1,6 +1,7 @@
 """
 Migration script to add open_count and click_count fields to email_logs collection.
 This ensures all existing email log documents have these tracking fields initialized.
+Event history is no longer kept on the log (see move_events_to_buckets.py).
 """
 import os
 import asyncio
@@ -15,8 +16,7 @@ MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
 
 async def migrate_email_logs():
     """
-    Add open_count, click_count, open_events, and click_events fields to all email_logs
-    that don't have them.
+    Add open_count and click_count fields to all email_logs that don't have them.
     """
     client = AsyncIOMotorClient(MONGO_URI)
     db = client.get_default_database()
@@ -28,9 +28,7 @@ async def migrate_email_logs():
     query = {
         "$or": [
             {"open_count": {"$exists": False}},
-            {"click_count": {"$exists": False}},
-            {"open_events": {"$exists": False}},
-            {"click_events": {"$exists": False}}
+            {"click_count": {"$exists": False}}
         ]
     }
 
@@ -49,9 +47,7 @@ async def migrate_email_logs():
         },
         "$setOnInsert": {
             "open_count": 0,
-            "click_count": 0,
-            "open_events": [],
-            "click_events": []
+            "click_count": 0
         }
     }
 
@@ -63,8 +59,6 @@ async def migrate_email_logs():
                 "$set": {
                     "open_count": {"$ifNull": ["$open_count", 0]},
                     "click_count": {"$ifNull": ["$click_count", 0]},
-                    "open_events": {"$ifNull": ["$open_events", []]},
-                    "click_events": {"$ifNull": ["$click_events", []]},
                     "updated_at": "$$NOW"
                 }
             }
@@ -88,8 +82,6 @@ async def migrate_email_logs():
         print(f"   - status: {sample.get('status')}")
         print(f"   - open_count: {sample.get('open_count')}")
         print(f"   - click_count: {sample.get('click_count')}")
-        print(f"   - open_events: {len(sample.get('open_events', []))} events")
-        print(f"   - click_events: {len(sample.get('click_events', []))} events")
 
     client.close()
 
@@ -1,16 +1,17 @@
 # migrations/add_tracking_fields.py
 import os
 from uuid import uuid4
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient
 from datetime import datetime
 
+from app.db.indexes import INDEXES
+
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = os.getenv("DB_NAME", "mailmate_db")
 
 client = MongoClient(MONGO_URI)
 db = client[DB_NAME]
 email_logs = db["email_logs"]
-events = db["events"]
 
 def add_fields():
     cursor = email_logs.find({"tracking_id": {"$exists": False}})
@@ -23,23 +24,20 @@ def add_fields():
                 "tracking_id": tracking_id,
                 "click_map": {},
                 "clicks": {},
-                "opens_count": doc.get("opens_count", 0),
-                "unique_open_keys": []
+                "opens_count": doc.get("opens_count", 0)
             }}
         )
         count += 1
     print(f"Updated {count} documents with tracking fields")
 
 def create_indexes():
-    # Create indexes
-    try:
-        email_logs.create_index([("tracking_id", ASCENDING)], unique=True)
-    except Exception as e:
-        print("Warning creating unique index on tracking_id:", e)
-    email_logs.create_index([("campaign_id", ASCENDING)])
-    events.create_index([("tracking_id", ASCENDING)])
-    events.create_index([("click_id", ASCENDING)])
-    events.create_index([("timestamp", ASCENDING)])
+    # Indexes are declared in app/db/indexes.py (also applied at app/worker startup)
+    for name, models in INDEXES.items():
+        for model in models:
+            try:
+                db[name].create_indexes([model])
+            except Exception as e:
+                print(f"Warning creating index {name}.{model.document['name']}:", e)
     print("Indexes created/ensured")
 
 if __name__ == "__main__":
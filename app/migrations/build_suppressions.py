@@ -0,0 +1,69 @@
+"""
+Migration script to seed the suppressions collection from existing data.
+
+- unsubscribed contacts                -> reason "unsubscribe"
+- email_logs with status "bounced"     -> reason "bounce"
+- email_logs with status "spamreport"  -> reason "spamreport"
+
+New entries arrive from the unsubscribe route and the SendGrid webhook. Safe
+to re-run (entries are upserted by email).
+"""
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+from app.db.indexes import ensure_indexes
+from app.services.suppression_service import (
+    REASON_BOUNCE,
+    REASON_SPAM,
+    REASON_UNSUBSCRIBE,
+    SUPPRESSIONS_COLLECTION,
+    suppress_many,
+)
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+BATCH_SIZE = 5000
+
+
+async def build_suppressions():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    suppressions = db.get_collection(SUPPRESSIONS_COLLECTION)
+
+    print("Starting migration: Building suppression list...")
+    sources = [
+        (db.get_collection("contacts"), {"unsubscribed": True}, REASON_UNSUBSCRIBE),
+        (db.get_collection("email_logs"), {"status": "bounced"}, REASON_BOUNCE),
+        (db.get_collection("email_logs"), {"status": "spamreport"}, REASON_SPAM),
+    ]
+    for collection, query, reason in sources:
+        written = 0
+        batch = []
+        async for doc in collection.find(query, projection={"email": 1}):
+            if doc.get("email"):
+                batch.append((doc["email"], reason))
+            if len(batch) >= BATCH_SIZE:
+                written += await suppress_many(suppressions, batch)
+                batch = []
+        written += await suppress_many(suppressions, batch)
+        print(f"   - {reason}: {written} entries written")
+
+    applied = await ensure_indexes(db, force=True)
+    for conflict in applied["conflicts"]:
+        print(f"⚠️ {conflict['collection']}.{conflict['index']}: {conflict['error']}")
+
+    total = await suppressions.count_documents({})
+    print(f"✅ Migration complete! {total} suppressed addresses")
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Suppression List Migration")
+    print("=" * 60)
+    asyncio.run(build_suppressions())
@@ -0,0 +1,75 @@
+"""
+Migration script to build the tracking_links table from legacy click maps.
+
+Legacy click redirects (`/track/click/{click_id}?sig=...`) used to find their
+email_logs document with `{"click_map.<click_id>": {"$exists": true}}`, which no
+index can serve. Every click_map entry becomes a tracking_links document keyed
+by the click id, pointing back at its log, with the clicks already counted on
+the log carried over. Safe to re-run (links are upserted by click id).
+"""
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+
+from app.db.indexes import ensure_indexes
+from app.services.link_service import LINKS_COLLECTION
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+BATCH_SIZE = 5000
+
+
+async def build_tracking_links():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    email_logs = db.get_collection("email_logs")
+    links = db.get_collection(LINKS_COLLECTION)
+
+    print("Starting migration: Building tracking links from click maps...")
+    written = 0
+    ops = []
+    cursor = email_logs.find(
+        {"click_map": {"$type": "object", "$ne": {}}},
+        projection={"campaign_id": 1, "click_map": 1, "clicks": 1, "last_clicked_at": 1},
+    )
+    async for log in cursor:
+        clicks = log.get("clicks") or {}
+        for click_id, url in log["click_map"].items():
+            count = int(clicks.get(click_id) or 0)
+            link = {
+                "log_id": log["_id"],
+                "campaign_id": str(log.get("campaign_id")),
+                "url": url,
+                "clicks": count,
+            }
+            if count and log.get("last_clicked_at"):
+                link["last_clicked_at"] = log["last_clicked_at"]
+            ops.append(UpdateOne({"_id": click_id}, {"$set": link}, upsert=True))
+        if len(ops) >= BATCH_SIZE:
+            await links.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await links.bulk_write(ops, ordered=False)
+        written += len(ops)
+    print(f"   - {written} links written")
+
+    applied = await ensure_indexes(db, force=True)
+    for conflict in applied["conflicts"]:
+        print(f"⚠️ {conflict['collection']}.{conflict['index']}: {conflict['error']}")
+
+    total = await links.count_documents({})
+    print(f"✅ Migration complete! {total} tracked links")
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Tracking Links Migration")
+    print("=" * 60)
+    asyncio.run(build_tracking_links())
@@ -0,0 +1,109 @@
+"""
+Migration script to move legacy open_events/click_events arrays out of email_logs
+into the bucketed email_events collection.
+
+Each log keeps its open_count/click_count and gets first/last opened/clicked
+timestamps; the arrays are then removed from the log document. Logs without a
+campaign_id can't be bucketed and are left as they are (reported at the end).
+"""
+import os
+import asyncio
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+from app.services.event_store import EventStore
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+def _event_time(raw):
+    # webhook stored {"timestamp": dt}, tracking routes stored the bare datetime
+    if isinstance(raw, dict):
+        raw = raw.get("timestamp")
+    return raw if isinstance(raw, datetime) else None
+
+
+async def migrate_event_arrays():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    email_logs = db.get_collection("email_logs")
+    event_store = EventStore(db)
+
+    print("Starting migration: Moving open/click event arrays to email_events...")
+
+    query = {
+        "$or": [
+            {"open_events": {"$exists": True}},
+            {"click_events": {"$exists": True}}
+        ]
+    }
+
+    count = await email_logs.count_documents(query)
+    print(f"Found {count} documents to update")
+
+    if count == 0:
+        print("✅ No email logs carry event arrays!")
+        client.close()
+        return
+
+    moved_logs = 0
+    moved_events = 0
+    skipped_logs = 0
+    cursor = email_logs.find(
+        query,
+        projection={"campaign_id": 1, "email": 1, "open_events": 1, "click_events": 1},
+    )
+    async for doc in cursor:
+        # buckets are per campaign: without one the arrays are the only copy, so keep them
+        if doc.get("campaign_id") is None:
+            skipped_logs += 1
+            continue
+
+        events = []
+        timestamps = {}
+        for event_type, field in (("open", "open_events"), ("click", "click_events")):
+            times = [t for t in (_event_time(e) for e in doc.get(field) or []) if t]
+            timestamps[event_type] = times
+            for ts in times:
+                events.append({
+                    "campaign_id": str(doc.get("campaign_id")),
+                    "email": doc.get("email"),
+                    "type": event_type,
+                    "timestamp": ts,
+                })
+
+        moved_events += await event_store.record_many(events)
+
+        update = {"$unset": {"open_events": "", "click_events": ""}}
+        bounds = {}
+        for event_type, prefix in (("open", "opened"), ("click", "clicked")):
+            times = timestamps[event_type]
+            if times:
+                bounds.setdefault("$min", {})[f"first_{prefix}_at"] = min(times)
+                bounds.setdefault("$max", {})[f"last_{prefix}_at"] = max(times)
+        update.update(bounds)
+
+        await email_logs.update_one({"_id": doc["_id"]}, update)
+        moved_logs += 1
+
+    print(f"✅ Migration complete!")
+    print(f"   - Logs updated: {moved_logs}")
+    print(f"   - Events moved: {moved_events}")
+    if skipped_logs:
+        print(f"⚠️ Logs without campaign_id left untouched (arrays kept): {skipped_logs}")
+
+    remaining = await email_logs.count_documents(query)
+    print(f"   - Remaining documents with event arrays: {remaining}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Email Logs Migration - Move Event Arrays To Buckets")
+    print("=" * 60)
+    asyncio.run(migrate_event_arrays())
@@ -0,0 +1,69 @@
+"""
+Migration script to (re)build the campaign_timeseries counters from existing data.
+
+Opens/clicks are replayed from the email_events buckets, deliveries and bounces
+from delivered_at/bounced_at on email_logs. The collection is cleared first so
+the script can be re-run safely.
+"""
+import os
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+
+from app.services.event_store import EVENTS_COLLECTION
+from app.services.timeseries_service import TimeseriesService, TIMESERIES_COLLECTION
+
+# Load environment variables
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+BATCH_SIZE = 5000
+
+
+async def rebuild_timeseries():
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    email_logs = db.get_collection("email_logs")
+    timeseries = TimeseriesService(db.get_collection(TIMESERIES_COLLECTION))
+
+    print("Starting migration: Rebuilding campaign_timeseries counters...")
+    result = await timeseries.series_coll.delete_many({})
+    print(f"Cleared {result.deleted_count} existing counter documents")
+
+    counted = 0
+    batch = []
+
+    async def flush():
+        nonlocal counted, batch
+        counted += await timeseries.record_many(batch)
+        batch = []
+
+    cursor = db.get_collection(EVENTS_COLLECTION).find({}, projection={"campaign_id": 1, "events": 1})
+    async for bucket in cursor:
+        for ev in bucket.get("events") or []:
+            batch.append({"campaign_id": bucket["campaign_id"], "type": ev.get("type"), "timestamp": ev.get("ts")})
+        if len(batch) >= BATCH_SIZE:
+            await flush()
+
+    for event_type, field in (("delivered", "delivered_at"), ("bounce", "bounced_at")):
+        cursor = email_logs.find({field: {"$ne": None}}, projection={"campaign_id": 1, field: 1})
+        async for doc in cursor:
+            if doc.get("campaign_id") is None:
+                continue
+            batch.append({"campaign_id": str(doc["campaign_id"]), "type": event_type, "timestamp": doc[field]})
+            if len(batch) >= BATCH_SIZE:
+                await flush()
+    await flush()
+
+    print(f"✅ Migration complete!")
+    print(f"   - Events counted: {counted}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("Campaign Timeseries Migration - Rebuild Counters")
+    print("=" * 60)
+    asyncio.run(rebuild_timeseries())
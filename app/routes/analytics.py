@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
-from typing import Any, Dict
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
+from datetime import datetime
 from bson import ObjectId
 
 from app.db.client import campaigns, email_logs, contacts
-from app.services.analytics_service import AnalyticsService
-from app.services.sendgrid_client import SendGridClient
-from app.config import settings
+from app.contacts.segment_counts import counts_collection, get_counts
+from app.services.analytics_service import AnalyticsService, LOG_DEFAULT_FIELDS, LOG_EXPORT_FIELDS
+from app.utils.export import EXPORT_FORMATS, csv_chunks, ndjson_chunks, gzip_chunks
+from app.services import sendgrid_stats_cache
 from app.deps import require_role
 
 # Ensure this router is included in your main.py!
@@ -34,60 +37,66 @@ async def analytics_summary(id: str):
 
     # 2) Compute unsubscribe stats
     segment = campaign_obj.get("segment")
-    unsubscribed_count = 0
-    total_contacts = 0
-    unsubscribe_rate = 0.0
-
-    if segment:
-        total_contacts = await contacts.count_documents({"segment": segment})
-        unsubscribed_count = await contacts.count_documents(
-            {"segment": segment, "unsubscribed": True}
-        )
-        if total_contacts > 0:
-            unsubscribe_rate = unsubscribed_count / total_contacts
-
-    # 3) Try SendGrid stats
-    try:
-        sg = SendGridClient(api_key=settings.SENDGRID_API_KEY)
-        stats = await sg.get_category_stats_all_time(str(campaign_id))
-        await sg.close()
-
-        if stats.get("success"):
-            m = stats.get("metrics") or {}
-            delivered = int(m.get("delivered", 0) or 0)
-            opened = int(m.get("unique_opens", 0) or 0)
-            clicked = int(m.get("unique_clicks", 0) or 0)
-            requests = int(m.get("requests", 0) or 0)
-            
-            open_rate = (opened / delivered) if delivered > 0 else 0.0
-            click_rate = (clicked / delivered) if delivered > 0 else 0.0
-
-            return {
-                "total": requests,
-                "delivered_count": delivered,
-                "open_rate": round(open_rate, 4),
-                "click_rate": round(click_rate, 4),
-                "opens": int(m.get("opens", 0) or 0),
-                "unique_opens": opened,
-                "clicks": int(m.get("clicks", 0) or 0),
-                "unique_clicks": clicked,
-                "bounces": int(m.get("bounces", 0) or 0),
-                "spam_reports": int(m.get("spam_reports", 0) or 0),
-                "unsubscribed_count": unsubscribed_count,
-                "unsubscribe_rate": round(unsubscribe_rate, 4),
-                "unsubscribe_percentage": round(unsubscribe_rate * 100, 2),
-            }
-    except Exception:
-        pass
+    unsub = (await _unsubscribe_stats([segment])).get(segment) or _unsubscribe_fields(0, 0)
+
+    # 3) Try SendGrid stats (cached; bounded wait before falling back to the rollup)
+    stats = await sendgrid_stats_cache.get_category_stats(str(campaign_id))
+    if stats:
+        m = stats.get("metrics") or {}
+        delivered = int(m.get("delivered", 0) or 0)
+        opened = int(m.get("unique_opens", 0) or 0)
+        clicked = int(m.get("unique_clicks", 0) or 0)
+        requests = int(m.get("requests", 0) or 0)
+
+        open_rate = (opened / delivered) if delivered > 0 else 0.0
+        click_rate = (clicked / delivered) if delivered > 0 else 0.0
+
+        return {
+            "total": requests,
+            "delivered_count": delivered,
+            "open_rate": round(open_rate, 4),
+            "click_rate": round(click_rate, 4),
+            "opens": int(m.get("opens", 0) or 0),
+            "unique_opens": opened,
+            "clicks": int(m.get("clicks", 0) or 0),
+            "unique_clicks": clicked,
+            "bounces": int(m.get("bounces", 0) or 0),
+            "spam_reports": int(m.get("spam_reports", 0) or 0),
+            **unsub,
+        }
 
     # 4) MongoDB Fallback
     service = AnalyticsService(email_logs_collection=email_logs)
     summary = await service.get_summary(str(campaign_id))
+    return _rollup_response(summary, unsub)
+
+
+def _unsubscribe_fields(total_contacts: int, unsubscribed_count: int) -> Dict[str, Any]:
+    unsubscribe_rate = (unsubscribed_count / total_contacts) if total_contacts > 0 else 0.0
+    return {
+        "unsubscribed_count": unsubscribed_count,
+        "unsubscribe_rate": round(unsubscribe_rate, 4),
+        "unsubscribe_percentage": round(unsubscribe_rate * 100, 2),
+    }
+
+
+async def _unsubscribe_stats(segments: List[Optional[str]]) -> Dict[str, Dict[str, Any]]:
+    """Contact and unsubscribe counts for several segments, from the precomputed segment counts."""
+    wanted = [s for s in set(segments) if s]
+    if not wanted:
+        return {}
+    counts = await get_counts(counts_collection(contacts), wanted)
+    return {
+        segment: _unsubscribe_fields(c["total"], c["total"] - c["subscribed"])
+        for segment, c in counts.items()
+    }
+
 
+def _rollup_response(summary: Dict[str, Any], unsub: Dict[str, Any]) -> Dict[str, Any]:
     delivered = summary.get("delivered_count", 0)
     unique_opens = summary.get("unique_opens", 0)
     unique_clicks = summary.get("unique_clicks", 0)
-    
+
     open_rate = (unique_opens / delivered) if delivered > 0 else 0.0
     click_rate = (unique_clicks / delivered) if delivered > 0 else 0.0
 
@@ -96,19 +105,127 @@ async def analytics_summary(id: str):
         "click_rate": round(click_rate, 4),
         "opens": summary.get("total_opens", 0),
         "clicks": summary.get("total_clicks", 0),
-        "bounces": 0,
-        "spam_reports": 0,
         **summary,
-        "unsubscribed_count": unsubscribed_count,
-        "unsubscribe_rate": round(unsubscribe_rate, 4),
-        "unsubscribe_percentage": round(unsubscribe_rate * 100, 2),
+        **unsub,
+    }
+
+
+# Compare several campaigns in one request: /analytics/compare?ids=a&ids=b
+# One campaigns lookup, one rollup read ($in) and one unsubscribe aggregation for all
+# segments. Served from the Mongo rollups only; SendGrid is not called per campaign.
+@router.get("/analytics/compare")
+async def analytics_compare(ids: List[str] = Query(..., min_length=1, max_length=100)):
+    campaign_ids = list(dict.fromkeys(ids))
+    oids = [ObjectId(c) for c in campaign_ids if ObjectId.is_valid(c)]
+    found = {
+        str(c["_id"]): c
+        async for c in campaigns.find({"_id": {"$in": oids}}, projection={"segment": 1, "name": 1})
     }
+    known = [c for c in campaign_ids if c in found]
+
+    service = AnalyticsService(email_logs_collection=email_logs)
+    summaries = await service.get_summaries(known) if known else {}
+    unsub_by_segment = await _unsubscribe_stats([found[c].get("segment") for c in known])
+
+    items = []
+    for campaign_id in known:
+        campaign_obj = found[campaign_id]
+        segment = campaign_obj.get("segment")
+        items.append({
+            "campaign_id": campaign_id,
+            "name": campaign_obj.get("name"),
+            "segment": segment,
+            **_rollup_response(summaries[campaign_id], unsub_by_segment.get(segment) or _unsubscribe_fields(0, 0)),
+        })
+    return {"items": items, "not_found": [c for c in campaign_ids if c not in found]}
 
 # Also fix the logs route if needed
+# Keyset pagination: pass the previous page's `next_cursor` as `cursor`.
+# `expand` is a comma-separated list of heavy fields to include (e.g. attempt_details,sendgrid_body).
 @router.get("/analytics/logs")
-async def analytics_logs(id: str, limit: int = 50):
+async def analytics_logs(id: str, limit: int = 50, cursor: Optional[str] = None, expand: Optional[str] = None):
+    expand_fields = [f.strip() for f in expand.split(",") if f.strip()] if expand else None
     try:
         service = AnalyticsService(email_logs_collection=email_logs)
-        return await service.get_logs(id, limit=limit)
+        return await service.get_logs(id, limit=limit, cursor=cursor, expand=expand_fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Engagement timeline from counters bucketed at ingest: constant-time for any campaign size
+@router.get("/analytics/{campaign_id}/timeseries")
+async def analytics_timeseries(
+    campaign_id: str,
+    granularity: str = Query("hour", pattern="^(minute|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    service = AnalyticsService(email_logs_collection=email_logs)
+    return await service.get_timeseries(campaign_id, granularity=granularity, start=start, end=end)
+
+
+@router.get("/analytics/{campaign_id}/links")
+async def analytics_links(campaign_id: str):
+    service = AnalyticsService(email_logs_collection=email_logs)
+    return await service.get_link_stats(campaign_id)
+
+
+# Full export of a campaign's recipient logs in one streamed response.
+# /analytics/{id}/export?format=ndjson&fields=email,status,open_count&start=...&gzip=true
+@router.get("/analytics/{campaign_id}/export")
+async def analytics_export(
+    campaign_id: str,
+    format: str = Query("csv", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    fields: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    gzip: bool = False,
+):
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(LOG_DEFAULT_FIELDS)
+    unknown = set(selected) - set(LOG_EXPORT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(sorted(unknown))}")
+
+    service = AnalyticsService(email_logs_collection=email_logs)
+    docs = service.iter_logs(campaign_id, selected, start=start, end=end)
+    if format == "csv":
+        body = csv_chunks(docs, selected)
+        media_type = "text/csv"
+    else:
+        body = ndjson_chunks(docs, selected)
+        media_type = "application/x-ndjson"
+
+    filename = f"campaign_{campaign_id}_logs.{format}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+
+# Unique opens/clicks from the HyperLogLog sketches. Several ids are merged into one
+# deduplicated count: /analytics/uniques?ids=a&ids=b&metric=open&granularity=day
+@router.get("/analytics/uniques")
+async def analytics_uniques(
+    ids: List[str] = Query(..., min_length=1),
+    metric: str = Query("open", pattern="^(open|click)$"),
+    granularity: str = Query("all", pattern="^(all|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    service = AnalyticsService(email_logs_collection=email_logs)
+    return await service.get_unique_counts(ids, metric=metric, granularity=granularity, start=start, end=end)
+
+
+@router.get("/analytics/{campaign_id}/uniques")
+async def analytics_campaign_uniques(
+    campaign_id: str,
+    metric: str = Query("open", pattern="^(open|click)$"),
+    granularity: str = Query("hour", pattern="^(all|hour|day)$"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    service = AnalyticsService(email_logs_collection=email_logs)
+    return await service.get_unique_counts([campaign_id], metric=metric, granularity=granularity, start=start, end=end)
@@ -1,34 +1,25 @@
+import asyncio
+import logging
+
 from fastapi import APIRouter, Depends
+from app.config import settings
 from app.db.client import db, contacts, campaigns
 from app.deps import get_current_user
+from app.utils.cache import AsyncTTLCache
 from typing import List, Dict, Any
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/dashboard", tags=["dashboard"])
 
-@router.get("/stats")
-async def get_dashboard_stats(current_user = Depends(get_current_user)):
-    """
-    Get dashboard statistics:
-    - Total Contacts
-    - Active Contacts
-    - Total Campaigns
-    - Recent Campaigns (limit 5)
-    """
-    
-    # 1. Total Contacts
-    total_contacts = await contacts.count_documents({})
-    print(f"DEBUG: Connected to DB: {db.name}, Found {total_contacts} contacts")
-    
-    # 2. Active Contacts
-
-    active_contacts = await contacts.count_documents({"unsubscribed": {"$ne": True}})
-    
-    # 3. Total Campaigns
-    total_campaigns = await campaigns.count_documents({})
-    print(f"DEBUG: Found {total_campaigns} campaigns")
-    
-    # 4. Recent Campaigns
-    cursor = campaigns.find().sort("created_at", -1).limit(5)
+# Same numbers for every user, so one entry per process is enough
+_stats_cache = AsyncTTLCache(ttl=settings.DASHBOARD_STATS_CACHE_TTL_SECONDS, max_entries=1)
+
+
+async def _recent_campaigns() -> List[Dict[str, Any]]:
+    cursor = campaigns.find(
+        projection={"title": 1, "name": 1, "status": 1, "created_at": 1}
+    ).sort("created_at", -1).limit(5)
     recent_campaigns = []
     async for campaign in cursor:
         recent_campaigns.append({
@@ -37,10 +28,37 @@ async def get_dashboard_stats(current_user = Depends(get_current_user)):
             "status": campaign.get("status", "Draft"),
             "created_at": campaign.get("created_at")
         })
-        
+    return recent_campaigns
+
+
+async def _load_stats() -> Dict[str, Any]:
+    # Totals come from collection metadata (no scan); only unsubscribed contacts are counted,
+    # which the partial index on unsubscribed=true answers without touching active contacts.
+    total_contacts, unsubscribed, total_campaigns, recent_campaigns = await asyncio.gather(
+        contacts.estimated_document_count(),
+        contacts.count_documents({"unsubscribed": True}),
+        campaigns.estimated_document_count(),
+        _recent_campaigns(),
+    )
+    logger.debug("Dashboard stats from %s: %s contacts, %s campaigns", db.name, total_contacts, total_campaigns)
+
     return {
         "total_contacts": total_contacts,
-        "active_contacts": active_contacts,
+        "active_contacts": max(total_contacts - unsubscribed, 0),
         "total_campaigns": total_campaigns,
         "recent_campaigns": recent_campaigns
     }
+
+
+@router.get("/stats")
+async def get_dashboard_stats(current_user = Depends(get_current_user)):
+    """
+    Get dashboard statistics:
+    - Total Contacts
+    - Active Contacts
+    - Total Campaigns
+    - Recent Campaigns (limit 5)
+
+    Served from a short per-process cache (settings.DASHBOARD_STATS_CACHE_TTL_SECONDS).
+    """
+    return await _stats_cache.get_or_load("stats", _load_stats)
@@ -5,6 +5,8 @@ from bson import ObjectId
 from app.db.client import campaigns, contacts, templates, email_logs
 from app.services.send_bulk_service import BulkEmailService
 from app.config import settings
+from app.campaigns.audience import campaign_audience_query
+from app.utils.tracking_utils import make_unsubscribe_url
 
 router = APIRouter()
 
@@ -28,7 +30,7 @@ async def send_bulk(campaign_id: str):
     html_template = template.get("html", "")
 
     # 3. Fetch contacts for the segment (exclude unsubscribed)
-    contacts_cursor = contacts.find({"segment": segment, "unsubscribed": {"$ne": True}})
+    contacts_cursor = contacts.find(campaign_audience_query(campaign))
     contact_list = await contacts_cursor.to_list(length=None)
 
     if not contact_list:
@@ -38,7 +40,9 @@ async def send_bulk(campaign_id: str):
     messages = []
     for c in contact_list:
         # build unsubscribe link — keep consistent with your app domain
-        unsubscribe_link = f"{getattr(settings, 'BACKEND_PUBLIC_URL', 'http://localhost:8000')}/unsubscribe/{str(c['_id'])}"
+        unsubscribe_link = make_unsubscribe_url(
+            str(c["_id"]), campaign_id, base_url=getattr(settings, "BACKEND_PUBLIC_URL", "http://localhost:8000")
+        )
         html = html_template.replace("{{name}}", c.get("name", "")).replace("{{unsubscribe_link}}", unsubscribe_link)
 
         messages.append({
@@ -46,7 +50,8 @@ async def send_bulk(campaign_id: str):
             "name": c.get("name"),
             "subject": subject,
             "html": html,
-            "unsubscribe_link": unsubscribe_link
+            "unsubscribe_link": unsubscribe_link,
+            "contact_id": str(c["_id"]),
         })
 
     campaign_payload = {
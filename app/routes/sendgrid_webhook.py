@@ -4,6 +4,11 @@ from typing import List, Dict, Any
 from datetime import datetime
 from app.db.client import db
 from app.config import settings
+from app.services.event_store import EventStore, log_counter_update
+from app.services.campaign_stats_service import CampaignStatsService, STATS_COLLECTION
+from app.services.timeseries_service import TimeseriesService, TIMESERIES_COLLECTION
+from app.services.suppression_service import SUPPRESSIONS_COLLECTION, suppress, suppression_reason
+from pymongo import ReturnDocument
 import logging
 import base64
 from cryptography.hazmat.primitives import hashes, serialization
@@ -75,6 +80,10 @@ async def sendgrid_event_webhook(request: Request):
 
     coll = db.get_collection("email_logs")
     campaigns_coll = db.get_collection("campaigns")
+    event_store = EventStore(db)
+    campaign_stats = CampaignStatsService(db.get_collection(STATS_COLLECTION))
+    timeseries = TimeseriesService(db.get_collection(TIMESERIES_COLLECTION))
+    suppressions = db.get_collection(SUPPRESSIONS_COLLECTION)
     from bson import ObjectId
 
     for event in events:
@@ -107,6 +116,11 @@ async def sendgrid_event_webhook(request: Request):
 
             event_datetime = datetime.utcfromtimestamp(timestamp)
 
+            # hard bounces, spam reports and unsubscribes are never mailed again
+            reason = suppression_reason(event)
+            if reason:
+                await suppress(suppressions, email, reason, campaign_id=campaign_id_raw, at=event_datetime)
+
             # --- 1. Robust Campaign Lookup ---
             campaign_doc = None
             
@@ -142,27 +156,24 @@ async def sendgrid_event_webhook(request: Request):
                     "email": email,
                     "open_count": 0,
                     "click_count": 0,
-                    "open_events": [],
-                    "click_events": [],
                     "created_at": event_datetime,
                     "updated_at": event_datetime,
                 }
                 await coll.insert_one(new_log)
                 existing_log = new_log
+                await campaign_stats.record_log_created(str(campaign_id_raw))
             
             # Prepare updates
             log_update = {"$set": {"updated_at": event_datetime}}
             campaign_update = {}
 
             if event_type == "open":
-                log_update["$inc"] = {"open_count": 1}
-                log_update["$push"] = {"open_events": {"timestamp": event_datetime}}
+                log_update.update(log_counter_update("open", event_datetime))
                 campaign_update = {"$inc": {"stats.opens": 1}}
                 logger.info(f"Recording open event for {email}")
                 
             elif event_type == "click":
-                log_update["$inc"] = {"click_count": 1}
-                log_update["$push"] = {"click_events": {"timestamp": event_datetime}}
+                log_update.update(log_counter_update("click", event_datetime))
                 campaign_update = {"$inc": {"stats.clicks": 1}}
                 logger.info(f"Recording click event for {email}")
                 
@@ -181,8 +192,36 @@ async def sendgrid_event_webhook(request: Request):
                 log_update["$set"]["delivered_at"] = event_datetime
                 # campaign_update = {"$inc": {"stats.delivered": 1}} # Optional
 
-            # Execute Log Update
-            await coll.update_one({"_id": existing_log["_id"]}, log_update)
+            # Execute Log Update (the pre-update document tells the rollup about first opens/clicks
+            # and status transitions)
+            previous_log = await coll.find_one_and_update(
+                {"_id": existing_log["_id"]},
+                log_update,
+                projection={"open_count": 1, "click_count": 1, "status": 1, "sendgrid_status": 1},
+                return_document=ReturnDocument.BEFORE,
+            ) or existing_log
+
+            await campaign_stats.record_event(
+                str(existing_log["campaign_id"]),
+                event_type,
+                previous_log,
+                new_status=log_update["$set"].get("status"),
+            )
+
+            # Raw open/click history goes to the bucketed events store, not the log document
+            if event_type in ("open", "click"):
+                await event_store.record(
+                    str(existing_log["campaign_id"]),
+                    email,
+                    event_type,
+                    event_datetime,
+                    url=event.get("url"),
+                    ip=event.get("ip"),
+                    ua=event.get("useragent"),
+                )
+            # opens/clicks reach the timeline through the event store; deliveries/bounces are counted here
+            elif event_type in ("delivered", "bounce"):
+                await timeseries.record(str(existing_log["campaign_id"]), event_type, event_datetime)
             
             # Execute Campaign Update (if campaign found and update exists)
             if campaign_doc and campaign_update:
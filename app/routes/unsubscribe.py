@@ -3,26 +3,56 @@ from fastapi import APIRouter, HTTPException
 from fastapi.responses import HTMLResponse
 from bson import ObjectId
 
-from app.db.client import campaigns, contacts, templates, email_logs, scheduled_jobs
+from app.db.client import campaigns, contacts, templates, email_logs
+from app.contacts.segment_counts import PROJECTION, counts_collection, get_counts, record_change
+from app.db.client import db
+from app.services.suppression_service import REASON_UNSUBSCRIBE, SUPPRESSIONS_COLLECTION, suppress
+from app.config import settings
+from app.utils.tracking_utils import TOKEN_UNSUBSCRIBE, read_token
 router = APIRouter()
 
-@router.get("/unsubscribe/{contact_id}", response_class=HTMLResponse)
-async def unsubscribe(contact_id: str):
-    try:
-        oid = ObjectId(contact_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid unsubscribe link")
+def _contact_oid(ref: str) -> ObjectId:
+    """Contact id from a signed unsubscribe token (or, while allowed, a raw contact id).
+    Forged or malformed links are rejected here, before any database access."""
+    token = read_token(ref, TOKEN_UNSUBSCRIBE)
+    if token:
+        return ObjectId(token.contact_id)
+    if settings.TRACKING_ACCEPT_LEGACY_IDS and ObjectId.is_valid(ref):
+        return ObjectId(ref)
+    raise HTTPException(status_code=400, detail="Invalid unsubscribe link")
+
+
+async def _unsubscribe_contact(ref: str) -> None:
+    """Mark the contact unsubscribed and add it to the suppression list.
+
+    Constant cost: one update by _id and one upsert by email. Pending scheduled jobs
+    keep the recipient in their payload; the send-time suppression check drops it.
+    """
+    oid = _contact_oid(ref)
 
-    result = await contacts.update_one(
+    before = await contacts.find_one_and_update(
         {"_id": oid},
-        {"$set": {"unsubscribed": True}}
+        {"$set": {"unsubscribed": True}},
+        projection={**PROJECTION, "email": 1},
     )
+    if before is None:
+        raise HTTPException(status_code=404, detail="Contact not found")
+    await record_change(contacts, before, {**before, "unsubscribed": True})
+    if before.get("email"):
+        await suppress(db.get_collection(SUPPRESSIONS_COLLECTION), before["email"], REASON_UNSUBSCRIBE)
 
-    # optional: remove already-scheduled jobs for this contact
-    await scheduled_jobs.delete_many({"contact_id": oid})
 
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Contact not found")
+# RFC 8058 one-click unsubscribe: mail clients POST "List-Unsubscribe=One-Click" to the
+# List-Unsubscribe URL (see BulkEmailService headers). No auth, no cookies, no redirect.
+@router.post("/unsubscribe/{ref}")
+async def unsubscribe_one_click(ref: str):
+    await _unsubscribe_contact(ref)
+    return {"ok": True}
+
+
+@router.get("/unsubscribe/{ref}", response_class=HTMLResponse)
+async def unsubscribe(ref: str):
+    await _unsubscribe_contact(ref)
 
     # simple confirmation page
     return """
@@ -52,11 +82,9 @@ async def unsubscribed_count_for_campaign(campaign_id: str):
             detail="Campaign does not have a segment field"
         )
 
-    # 2) Count unsubscribed contacts in that segment
-    count = await contacts.count_documents({
-        "segment": segment,
-        "unsubscribed": True
-    })
+    # 2) Unsubscribed contacts in that segment (precomputed segment counts)
+    c = (await get_counts(counts_collection(contacts), [segment])).get(segment)
+    count = c["total"] - c["subscribed"] if c else 0
 
     return {
         "campaign_id": str(campaign_id),
@@ -0,0 +1,2 @@
+# app/segments/__init__.py
+# package marker for dynamic (rule-based) segments
@@ -0,0 +1,104 @@
+# app/segments/routes.py
+from typing import Any, Dict, List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+
+from app.deps import get_current_user, require_role
+from app.segments import services
+from app.segments.schemas import (
+    DynamicSegmentCreate,
+    DynamicSegmentOut,
+    DynamicSegmentUpdate,
+    SegmentPreview,
+)
+
+router = APIRouter(prefix="/segments", tags=["segments"])
+
+
+def _out(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(doc["_id"]),
+        "name": doc["name"],
+        "match": doc.get("match", "all"),
+        "rules": doc.get("rules", []),
+        "index_warnings": doc.get("index_warnings", []),
+        "audience_count": doc.get("audience_count"),
+        "counted_at": doc.get("counted_at"),
+        "created_by": doc.get("created_by"),
+        "created_at": doc["created_at"],
+        "updated_at": doc.get("updated_at"),
+    }
+
+
+# Create a dynamic segment; the response carries index warnings (COLLSCAN) if any
+@router.post("/", response_model=DynamicSegmentOut, status_code=status.HTTP_201_CREATED)
+async def create_segment(payload: DynamicSegmentCreate, user=Depends(require_role("marketing"))):
+    try:
+        doc = await services.create_segment(payload.model_dump(), created_by=str(user["_id"]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    doc["audience_count"] = await services.audience_count(doc)
+    return _out(doc)
+
+
+@router.get("/", response_model=List[DynamicSegmentOut])
+async def list_segments(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=200),
+    user=Depends(get_current_user),
+):
+    # audience_count here is the last stored count; GET /segments/{id} refreshes it
+    return [_out(d) for d in await services.list_segments(skip=skip, limit=limit)]
+
+
+# Preview rules before saving them (same compiled query as the send path)
+@router.post("/preview", response_model=SegmentPreview)
+async def preview_rules(
+    payload: DynamicSegmentCreate,
+    limit: int = Query(20, ge=0, le=100),
+    user=Depends(get_current_user),
+):
+    try:
+        return await services.preview(payload.model_dump(), limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{segment_id}", response_model=DynamicSegmentOut)
+async def get_segment(segment_id: str, user=Depends(get_current_user)):
+    doc = await services.get_segment(segment_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    doc["audience_count"] = await services.audience_count(doc)
+    return _out(doc)
+
+
+@router.get("/{segment_id}/preview", response_model=SegmentPreview)
+async def preview_segment(
+    segment_id: str,
+    limit: int = Query(20, ge=0, le=100),
+    user=Depends(get_current_user),
+):
+    doc = await services.get_segment(segment_id)
+    if not doc:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return await services.preview(doc, limit=limit)
+
+
+@router.put("/{segment_id}", response_model=DynamicSegmentOut)
+async def update_segment(segment_id: str, payload: DynamicSegmentUpdate, user=Depends(require_role("marketing"))):
+    try:
+        doc = await services.update_segment(segment_id, payload.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not doc:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    doc["audience_count"] = await services.audience_count(doc)
+    return _out(doc)
+
+
+@router.delete("/{segment_id}")
+async def delete_segment(segment_id: str, user=Depends(require_role("marketing"))):
+    if not await services.delete_segment(segment_id):
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return {"ok": True, "deleted_id": segment_id}
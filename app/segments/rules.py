@@ -0,0 +1,99 @@
+# app/segments/rules.py
+"""Compile dynamic segment rules into a Mongo filter on contacts.
+
+A definition is a list of rules combined with `match` "all" (AND) or "any" (OR):
+
+    {"match": "all", "rules": [
+        {"field": "segment", "op": "in", "value": ["vip", "newsletter"]},
+        {"field": "email_domain", "op": "eq", "value": "gmail.com"},
+        {"field": "engagement_score", "op": "gte", "value": 40},
+        {"field": "created_at", "op": "within_days", "value": 90},
+    ]}
+
+Only the fields and operators in RULE_FIELDS are accepted; each maps onto a
+stored (and, except `name`, indexed) contact field. Relative date operators are
+resolved against `now` at compile time, so a definition is compiled again for
+every preview and send rather than stored compiled.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+_STRING_OPS = {"eq", "ne", "in", "nin"}
+_NUMBER_OPS = {"eq", "ne", "gt", "gte", "lt", "lte", "between", "exists"}
+_DATE_OPS = {"gt", "gte", "lt", "lte", "between", "within_days", "older_than_days"}
+
+# rule field -> (contact field, value type, allowed ops)
+RULE_FIELDS: Dict[str, tuple] = {
+    "segment": ("segments", "string", _STRING_OPS | {"all"}),
+    "email_domain": ("email_domain", "string", _STRING_OPS),
+    "name": ("name", "string", _STRING_OPS),
+    "engagement_score": ("engagement_score", "number", _NUMBER_OPS),
+    "preferred_send_hour": ("preferred_send_hour", "number", _NUMBER_OPS),
+    "created_at": ("created_at", "date", _DATE_OPS),
+}
+
+
+def _scalar(kind: str, field: str, value: Any) -> Any:
+    if kind == "number":
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Rule on '{field}' needs a number, got {value!r}")
+        return value
+    if kind == "date":
+        if isinstance(value, datetime):
+            return value
+        try:
+            return datetime.fromisoformat(str(value))
+        except ValueError:
+            raise ValueError(f"Rule on '{field}' needs an ISO date, got {value!r}")
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"Rule on '{field}' needs a non-empty string, got {value!r}")
+    value = value.strip()
+    return value.lower() if field == "email_domain" else value
+
+
+def _list(kind: str, field: str, value: Any) -> List[Any]:
+    if not isinstance(value, (list, tuple)) or not value:
+        raise ValueError(f"Operator on '{field}' needs a non-empty list")
+    return [_scalar(kind, field, v) for v in value]
+
+
+def compile_rule(rule: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    field, op, value = rule.get("field"), rule.get("op"), rule.get("value")
+    if field not in RULE_FIELDS:
+        raise ValueError(f"Unknown rule field '{field}' (allowed: {', '.join(sorted(RULE_FIELDS))})")
+    target, kind, ops = RULE_FIELDS[field]
+    if op not in ops:
+        raise ValueError(f"Operator '{op}' is not allowed on '{field}' (allowed: {', '.join(sorted(ops))})")
+
+    if op in ("eq", "ne", "gt", "gte", "lt", "lte"):
+        scalar = _scalar(kind, field, value)
+        return {target: scalar if op == "eq" else {f"${op}": scalar}}
+    if op in ("in", "nin", "all"):
+        return {target: {f"${op}": _list(kind, field, value)}}
+    if op == "between":
+        bounds = _list(kind, field, value)
+        if len(bounds) != 2:
+            raise ValueError(f"'between' on '{field}' needs [low, high]")
+        return {target: {"$gte": bounds[0], "$lte": bounds[1]}}
+    if op == "exists":
+        return {target: {"$exists": bool(value)}}
+    # within_days / older_than_days
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"'{op}' on '{field}' needs a number of days")
+    cutoff = now - timedelta(days=value)
+    return {target: {"$gte" if op == "within_days" else "$lt": cutoff}}
+
+
+def compile_rules(definition: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Mongo filter for a {"match", "rules"} definition. Raises ValueError on invalid rules."""
+    rules = definition.get("rules") or []
+    if not rules:
+        raise ValueError("A segment needs at least one rule")
+    match = definition.get("match") or "all"
+    if match not in ("all", "any"):
+        raise ValueError("match must be 'all' or 'any'")
+    now = now or datetime.utcnow()
+    clauses = [compile_rule(rule, now) for rule in rules]
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and" if match == "all" else "$or": clauses}
@@ -0,0 +1,43 @@
+# app/segments/schemas.py
+from datetime import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class SegmentRule(BaseModel):
+    # see app.segments.rules.RULE_FIELDS for the allowed fields and operators
+    field: str
+    op: str
+    value: Any = None
+
+
+class DynamicSegmentCreate(BaseModel):
+    name: str = Field(..., min_length=1)
+    match: str = Field(default="all", pattern="^(all|any)$")
+    rules: List[SegmentRule] = Field(..., min_length=1)
+
+
+class DynamicSegmentUpdate(BaseModel):
+    name: Optional[str] = None
+    match: Optional[str] = Field(default=None, pattern="^(all|any)$")
+    rules: Optional[List[SegmentRule]] = None
+
+
+class DynamicSegmentOut(BaseModel):
+    id: str
+    name: str
+    match: str
+    rules: List[SegmentRule]
+    index_warnings: List[str] = []
+    audience_count: Optional[int] = None
+    counted_at: Optional[datetime] = None
+    created_by: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class SegmentPreview(BaseModel):
+    count: int
+    sample: List[dict]
+    index_warnings: List[str] = []
@@ -0,0 +1,144 @@
+# app/segments/services.py
+"""Dynamic segment definitions and their audiences.
+
+A definition's audience is `audience_query(None, rules=definition)`, the same
+compiled filter the send paths use for a campaign created from the segment.
+On save, the query is run through `explain()`; if the winning plan contains a
+COLLSCAN the definition is stored with a warning (the rules hit fields that no
+index covers, so every preview and send scans all contacts).
+
+Audience counts are cached per process with stale-while-revalidate: a stale
+count is served immediately and recounted in the background. The last count is
+also stored on the definition for listings.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from bson import ObjectId
+
+from app.campaigns.audience import audience_query
+from app.config import settings
+from app.contacts.services import CONTACT_LIST_FIELDS
+from app.db.client import db
+from app.utils.cache import AsyncTTLCache
+from app.utils.pagination import KEYSET_SORT
+
+logger = logging.getLogger(__name__)
+
+DYNAMIC_SEGMENTS = "dynamic_segments"
+
+COL = db.get_collection(DYNAMIC_SEGMENTS)
+CONTACTS = db.get_collection("contacts")
+
+_count_cache = AsyncTTLCache(
+    ttl=settings.SEGMENT_COUNT_CACHE_TTL_SECONDS,
+    stale_ttl=settings.SEGMENT_COUNT_STALE_TTL_SECONDS,
+)
+
+COLLSCAN_WARNING = (
+    "These rules are not served by an index (COLLSCAN): previews and sends will scan every contact"
+)
+
+
+def segment_audience_query(definition: Dict[str, Any]) -> Dict[str, Any]:
+    """Compiled audience filter for a definition; raises ValueError on invalid rules."""
+    return audience_query(None, rules={"match": definition.get("match"), "rules": definition.get("rules")})
+
+
+def _stages(plan: Any) -> Iterator[str]:
+    # classic and slot-based explain output nest stages differently; walk everything
+    if isinstance(plan, dict):
+        if isinstance(plan.get("stage"), str):
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _stages(value)
+
+
+async def index_warnings(query: Dict[str, Any]) -> List[str]:
+    plan = await CONTACTS.find(query).explain()
+    winning = (plan.get("queryPlanner") or {}).get("winningPlan") or {}
+    if "COLLSCAN" in set(_stages(winning)):
+        logger.warning("Dynamic segment query without index: %s", query)
+        return [COLLSCAN_WARNING]
+    return []
+
+
+def _definition(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": data["name"], "match": data.get("match") or "all", "rules": data["rules"]}
+
+
+async def create_segment(data: Dict[str, Any], created_by: Optional[str] = None) -> Dict[str, Any]:
+    doc = _definition(data)
+    query = segment_audience_query(doc)  # validates before anything is stored
+    now = datetime.utcnow()
+    doc.update({
+        "index_warnings": await index_warnings(query),
+        "created_by": created_by,
+        "created_at": now,
+        "updated_at": now,
+    })
+    res = await COL.insert_one(doc)
+    doc["_id"] = res.inserted_id
+    return doc
+
+
+async def get_segment(segment_id: str) -> Optional[Dict[str, Any]]:
+    if not ObjectId.is_valid(segment_id):
+        return None
+    return await COL.find_one({"_id": ObjectId(segment_id)})
+
+
+async def list_segments(skip: int = 0, limit: int = 50) -> List[Dict[str, Any]]:
+    return await COL.find().sort("created_at", -1).skip(skip).limit(limit).to_list(length=limit)
+
+
+async def update_segment(segment_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    current = await get_segment(segment_id)
+    if not current:
+        return None
+    doc = _definition({**current, **{k: v for k, v in data.items() if v is not None}})
+    query = segment_audience_query(doc)
+    doc.update({"index_warnings": await index_warnings(query), "updated_at": datetime.utcnow()})
+    await COL.update_one({"_id": current["_id"]}, {"$set": doc, "$unset": {"audience_count": "", "counted_at": ""}})
+    _count_cache.invalidate((segment_id, current.get("updated_at")))
+    return await get_segment(segment_id)
+
+
+async def delete_segment(segment_id: str) -> bool:
+    if not ObjectId.is_valid(segment_id):
+        return False
+    res = await COL.delete_one({"_id": ObjectId(segment_id)})
+    return res.deleted_count == 1
+
+
+async def audience_count(segment: Dict[str, Any]) -> int:
+    """Cached audience size of a stored definition (recounted in the background when stale)."""
+    async def load() -> int:
+        count = await CONTACTS.count_documents(segment_audience_query(segment))
+        await COL.update_one(
+            {"_id": segment["_id"]},
+            {"$set": {"audience_count": count, "counted_at": datetime.utcnow()}},
+        )
+        return count
+
+    # keyed on updated_at so an edited definition never reuses the old count
+    return await _count_cache.get_or_load((str(segment["_id"]), segment.get("updated_at")), load)
+
+
+async def preview(definition: Dict[str, Any], limit: int = 20) -> Dict[str, Any]:
+    """Audience size and the newest `limit` matching contacts for a stored or unsaved definition."""
+    query = segment_audience_query(definition)
+    if definition.get("_id"):
+        count = await audience_count(definition)
+        warnings = definition.get("index_warnings") or []
+    else:
+        count = await CONTACTS.count_documents(query)
+        warnings = await index_warnings(query)
+    sample = await CONTACTS.find(query, projection=CONTACT_LIST_FIELDS).sort(KEYSET_SORT).limit(limit).to_list(length=limit)
+    for doc in sample:
+        doc["id"] = str(doc.pop("_id"))
+    return {"count": count, "sample": sample, "index_warnings": warnings}
@@ -1,9 +1,41 @@
 """Analytics service: computes campaign-level summary, logs, and detailed metrics."""
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 import importlib
 from datetime import datetime
 
+from app.services.link_service import LINKS_COLLECTION, LinkTracker
+from app.services.campaign_stats_service import CampaignStatsService, STATS_COLLECTION, histogram_percentiles
+from app.services.timeseries_service import TimeseriesService, TIMESERIES_COLLECTION
+from app.services.unique_counter_service import UniqueCounterService, SKETCH_COLLECTION
+from app.utils.pagination import KEYSET_SORT, keyset_filter, next_cursor as pagination_next_cursor
+
+# Fields returned on every log row; heavier ones must be requested via `expand`
+LOG_DEFAULT_FIELDS = (
+    "campaign_id",
+    "email",
+    "name",
+    "subject",
+    "status",
+    "sendgrid_status",
+    "attempts",
+    "send_latency_ms",
+    "error",
+    "open_count",
+    "click_count",
+    "first_opened_at",
+    "last_opened_at",
+    "first_clicked_at",
+    "last_clicked_at",
+    "delivered_at",
+    "bounced_at",
+    "spam_report_at",
+    "created_at",
+    "updated_at",
+)
+LOG_EXPANDABLE_FIELDS = ("attempt_details", "sendgrid_body", "clicks", "tracking_id")
+LOG_EXPORT_FIELDS = ("_id",) + LOG_DEFAULT_FIELDS + LOG_EXPANDABLE_FIELDS
+
 
 class AnalyticsService:
     def __init__(
@@ -23,210 +55,93 @@ class AnalyticsService:
                     raise RuntimeError("No mongo_client provided and failed to load settings.MONGO_URI")
             self.email_logs = mongo_client.get_default_database().get_collection("email_logs")
 
+        # summary/details are served from the campaign_stats rollup kept next to email_logs
+        self.campaign_stats = CampaignStatsService(
+            self.email_logs.database.get_collection(STATS_COLLECTION),
+            self.email_logs,
+        )
+        self.unique_counter = UniqueCounterService(self.email_logs.database.get_collection(SKETCH_COLLECTION))
+        self.timeseries = TimeseriesService(self.email_logs.database.get_collection(TIMESERIES_COLLECTION))
+        self.links = LinkTracker(self.email_logs.database.get_collection(LINKS_COLLECTION))
+
     async def get_summary(self, campaign_id: str) -> Dict[str, Any]:
-        """Return aggregated summary for a campaign with both total and unique counts"""
-        pipeline = [
-            {"$match": {"campaign_id": campaign_id}},
-            {
-                "$group": {
-                    "_id": None,
-                    "total": {"$sum": 1},
-                    "delivered": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$or": [
-                                        {"$in": ["$status", ["sent", "delivered", "accepted"]]},
-                                        {"$and": [{"$gte": ["$sendgrid_status", 200]}, {"$lt": ["$sendgrid_status", 300]}]}
-                                    ]
-                                },
-                                1,
-                                0,
-                            ]
-                        }
-                    },
-                    # Total opens (sum of all open_count)
-                    "total_opens": {
-                        "$sum": {"$toInt": {"$ifNull": ["$open_count", 0]}}
-                    },
-                    # Unique opens (count of recipients who opened at least once)
-                    "unique_opens": {
-                        "$sum": {
-                            "$cond": [
-                                {"$gt": [{"$toInt": {"$ifNull": ["$open_count", 0]}}, 0]},
-                                1,
-                                0
-                            ]
-                        }
-                    },
-                    # Total clicks (sum of all click_count)
-                    "total_clicks": {
-                        "$sum": {"$toInt": {"$ifNull": ["$click_count", 0]}}
-                    },
-                    # Unique clicks (count of recipients who clicked at least once)
-                    "unique_clicks": {
-                        "$sum": {
-                            "$cond": [
-                                {"$gt": [{"$toInt": {"$ifNull": ["$click_count", 0]}}, 0]},
-                                1,
-                                0
-                            ]
-                        }
-                    }
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "total": 1,
-                    "delivered": 1,
-                    "total_opens": 1,
-                    "unique_opens": 1,
-                    "total_clicks": 1,
-                    "unique_clicks": 1
-                }
-            }
-        ]
-
-        cursor = self.email_logs.aggregate(pipeline, allowDiskUse=False)
-        result = await cursor.to_list(length=1)
-        if not result:
-            return {
-                "total": 0,
-                "delivered_count": 0,
-                "total_opens": 0,
-                "unique_opens": 0,
-                "total_clicks": 0,
-                "unique_clicks": 0
-            }
-
-        row = result[0]
+        """Return summary for a campaign with both total and unique counts, read from the rollup"""
+        row = await self.campaign_stats.get(campaign_id)
+        return self._summary_from_rollup(row)
+
+    async def get_summaries(self, campaign_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Summaries for several campaigns from one rollup read, keyed by campaign id"""
+        rows = await self.campaign_stats.get_many(campaign_ids)
+        return {campaign_id: self._summary_from_rollup(row) for campaign_id, row in rows.items()}
+
+    @staticmethod
+    def _summary_from_rollup(row: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "total": int(row.get("total", 0)),
             "delivered_count": int(row.get("delivered", 0)),
-            "total_opens": int(row.get("total_opens", 0)),
+            "total_opens": int(row.get("opens", 0)),
             "unique_opens": int(row.get("unique_opens", 0)),
-            "total_clicks": int(row.get("total_clicks", 0)),
-            "unique_clicks": int(row.get("unique_clicks", 0))
+            "total_clicks": int(row.get("clicks", 0)),
+            "unique_clicks": int(row.get("unique_clicks", 0)),
+            "bounces": int(row.get("bounces", 0)),
+            "spam_reports": int(row.get("spam_reports", 0)),
         }
 
-    async def get_logs(self, campaign_id: str, limit: int = 50, after: Optional[str] = None) -> Dict[str, Any]:
-        """Return logs for a campaign. Pagination supports `after` ISO timestamp or cursor (created_at).
+    async def get_logs(
+        self,
+        campaign_id: str,
+        limit: int = 50,
+        after: Optional[str] = None,
+        cursor: Optional[str] = None,
+        expand: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Return logs for a campaign, newest first, with keyset pagination.
 
         - `limit` controls page size (max clamp to 500)
-        - `after` if provided should be an ISO timestamp; returns documents with created_at < after (for reverse pagination)
+        - `cursor` is the opaque `next_cursor` of the previous page ((created_at, _id) keyset)
+        - `after` (legacy) ISO timestamp; returns documents with created_at < after
+        - `expand` opts into heavy fields left out of the default projection (see LOG_EXPANDABLE_FIELDS)
         """
         limit = max(1, min(limit, 500))
-        filter_q = {"campaign_id": campaign_id}
-        if after:
+        filter_q: Dict[str, Any] = {"campaign_id": campaign_id}
+        if cursor:
+            filter_q.update(keyset_filter(cursor))
+        elif after:
             try:
                 after_dt = datetime.fromisoformat(after)
                 filter_q["created_at"] = {"$lt": after_dt}
             except Exception:
                 pass
 
-        projection = {"sendgrid_body": 0}
-        # Ensure we fetch event arrays if they exist
-        # projection is inclusive or exclusive. If we exclude one field, others are included by default.
-        # But here we are excluding sendgrid_body.
-        # So open_events and click_events will be included by default.
-        # No change needed here actually, unless we want to be explicit.
-        # Let's just leave it as is, since excluding one field includes all others.
-        
-        cursor = self.email_logs.find(filter_q, projection=projection).sort("created_at", -1).limit(limit)
-        items = await cursor.to_list(length=limit)
+        unknown = set(expand or []) - set(LOG_EXPANDABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown expand field(s): {', '.join(sorted(unknown))}")
+        projection = {f: 1 for f in LOG_DEFAULT_FIELDS + tuple(expand or [])}
+
+        # served by the (campaign_id, created_at, _id) index: no in-memory sort, no skipped rows
+        find_cursor = self.email_logs.find(filter_q, projection=projection).sort(KEYSET_SORT).limit(limit)
+        items = await find_cursor.to_list(length=limit)
+
+        cursor_out = pagination_next_cursor(items, limit)
 
         # Convert ObjectId to string for JSON serialization
         for item in items:
             if "_id" in item:
                 item["_id"] = str(item["_id"])
 
-        next_cursor = None
-        if items:
-            last = items[-1]
-            ca = last.get("created_at")
-            if isinstance(ca, datetime):
-                next_cursor = ca.isoformat()
-
-        return {"items": items, "limit": limit, "next_cursor": next_cursor}
+        return {"items": items, "limit": limit, "next_cursor": cursor_out}
 
     async def get_details(self, campaign_id: str) -> Dict[str, Any]:
         """Return a detailed summary for the campaign including delivered/failed counts,
-        first/last send timestamps, average attempts and basic status breakdown.
+        first/last send timestamps, average attempts, status breakdown, attempt
+        percentiles and the send-latency distribution (percentiles are bucket lower bounds).
         """
-        pipeline = [
-            {"$match": {"campaign_id": campaign_id}},
-            {
-                "$group": {
-                    "_id": None,
-                    "total": {"$sum": 1},
-                    "delivered": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$or": [
-                                        {"$in": ["$status", ["sent", "delivered", "accepted"]]},
-                                        {"$and": [{"$gte": ["$sendgrid_status", 200]}, {"$lt": ["$sendgrid_status", 300]}]}
-                                    ]
-                                },
-                                1,
-                                0,
-                            ]
-                        }
-                    },
-                    "failed": {
-                        "$sum": {
-                            "$cond": [
-                                {
-                                    "$or": [
-                                        {"$in": ["$status", ["failed", "bounced", "rejected"]]},
-                                        {"$and": [{"$gte": ["$sendgrid_status", 400]}, {"$lt": ["$sendgrid_status", 600]}]}
-                                    ]
-                                },
-                                1,
-                                0
-                            ]
-                        }
-                    },
-                    "first_sent": {"$min": "$created_at"},
-                    "last_sent": {"$max": "$created_at"},
-                    "avg_attempts": {"$avg": {"$ifNull": ["$attempts", 0]}},
-                    "status_list": {"$push": "$status"}
-                }
-            },
-            {
-                "$project": {
-                    "_id": 0,
-                    "total": 1,
-                    "delivered": 1,
-                    "failed": 1,
-                    "first_sent": 1,
-                    "last_sent": 1,
-                    "avg_attempts": 1,
-                    "status_list": 1
-                }
-            }
-        ]
-
-        cursor = self.email_logs.aggregate(pipeline, allowDiskUse=False)
-        rows = await cursor.to_list(length=1)
-        if not rows:
-            return {
-                "total": 0,
-                "delivered_count": 0,
-                "failed_delivery": 0,
-                "first_sent": None,
-                "last_sent": None,
-                "avg_attempts": 0.0,
-                "status_breakdown": {}
-            }
-
-        row = rows[0]
-
-        # build a simple status breakdown map
-        status_map: Dict[str, int] = {}
-        for s in row.get("status_list", []):
-            status_map[s] = status_map.get(s, 0) + 1
+        row = await self.campaign_stats.get(campaign_id)
+
+        total = int(row.get("total", 0))
+        status_map: Dict[str, int] = {
+            s: int(n) for s, n in (row.get("status_counts") or {}).items() if n
+        }
 
         first_sent = row.get("first_sent")
         last_sent = row.get("last_sent")
@@ -236,11 +151,73 @@ class AnalyticsService:
             last_sent = last_sent.isoformat()
 
         return {
-            "total": int(row.get("total", 0)),
+            "total": total,
             "delivered_count": int(row.get("delivered", 0)),
             "failed_delivery": int(row.get("failed", 0)),
             "first_sent": first_sent,
             "last_sent": last_sent,
-            "avg_attempts": float(row.get("avg_attempts", 0.0)),
-            "status_breakdown": status_map
-        }
\ No newline at end of file
+            "avg_attempts": (float(row.get("attempts_sum", 0)) / total) if total else 0.0,
+            "status_breakdown": status_map,
+            "attempts_percentiles": histogram_percentiles(row.get("attempts_hist")),
+            "send_latency_ms": {
+                "histogram": {k: int(v) for k, v in (row.get("latency_hist") or {}).items() if v},
+                **histogram_percentiles(row.get("latency_hist")),
+            },
+        }
+
+    async def get_unique_counts(
+        self,
+        campaign_ids: List[str],
+        metric: str = "open",
+        granularity: str = "all",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Unique opens/clicks from the HyperLogLog sketches, for the whole campaign(s) or per hour/day.
+        Several campaign ids are merged into one (deduplicated) count."""
+        if granularity == "all":
+            return await self.unique_counter.count(campaign_ids, metric)
+        series = await self.unique_counter.series(campaign_ids, metric, granularity, start=start, end=end)
+        return {"metric": metric, "granularity": granularity, "series": series}
+
+    async def get_timeseries(
+        self,
+        campaign_id: str,
+        granularity: str = "hour",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Dict[str, Any]:
+        """Opens, clicks, bounces and deliveries per minute/hour/day from the ingest-time counters."""
+        series = await self.timeseries.series(campaign_id, granularity, start=start, end=end)
+        return {"campaign_id": campaign_id, "granularity": granularity, "series": series}
+
+    async def get_link_stats(self, campaign_id: str) -> Dict[str, Any]:
+        """Clicks per destination URL, from the tracking_links counters."""
+        links = await self.links.link_stats(campaign_id)
+        return {"campaign_id": campaign_id, "total_clicks": sum(l["clicks"] for l in links), "links": links}
+
+    async def iter_logs(
+        self,
+        campaign_id: str,
+        fields: List[str],
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: int = 5000,
+    ):
+        """Yield every log row of a campaign (oldest first) with only `fields` projected.
+        Used by the streaming export; memory stays bounded by the cursor batch size."""
+        query: Dict[str, Any] = {"campaign_id": campaign_id}
+        if start or end:
+            query["created_at"] = {}
+            if start:
+                query["created_at"]["$gte"] = start
+            if end:
+                query["created_at"]["$lt"] = end
+
+        projection = {f: 1 for f in fields}
+        if "_id" not in fields:
+            projection["_id"] = 0
+        cursor = self.email_logs.find(query, projection=projection).sort([("created_at", 1), ("_id", 1)])
+        cursor = cursor.batch_size(batch_size)
+        async for doc in cursor:
+            yield doc
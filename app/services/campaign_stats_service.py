@@ -0,0 +1,374 @@
+# app/services/campaign_stats_service.py
+"""Incrementally maintained per-campaign analytics rollups (`campaign_stats`).
+
+The send path and the SendGrid webhook `$inc` one rollup document per campaign,
+so analytics endpoints read a single document instead of grouping every
+`email_logs` row. `rebuild` recomputes rollups from `email_logs` when needed.
+
+Increments are only correct on top of a rollup that already holds the history,
+so `ensure_campaign_stats` (API startup and worker_ready) rebuilds every campaign
+once per database and records that in `schema_meta`; campaigns created after
+that start from zero.
+"""
+import logging
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+STATS_COLLECTION = "campaign_stats"
+
+META_COLLECTION = "schema_meta"
+META_ID = "campaign_stats"
+
+# Same classification the analytics pipelines have always used
+DELIVERED_STATUSES = ("sent", "delivered", "accepted")
+FAILED_STATUSES = ("failed", "bounced", "rejected")
+
+# campaigns per rebuild aggregation: its single $facet result document holds a few
+# rows per campaign, so batching keeps it far below the 16 MB document limit
+REBUILD_BATCH_SIZE = 200
+
+# Send latency histogram bucket lower bounds (ms); the last bucket is open-ended
+LATENCY_BUCKETS_MS = (0, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+COUNTER_FIELDS = (
+    "total",
+    "delivered",
+    "failed",
+    "opens",
+    "unique_opens",
+    "clicks",
+    "unique_clicks",
+    "bounces",
+    "spam_reports",
+    "attempts_sum",
+)
+
+
+def _in_range(code: Any, low: int, high: int) -> bool:
+    return isinstance(code, int) and low <= code < high
+
+
+def is_delivered(status: Optional[str], sendgrid_status: Any) -> bool:
+    return status in DELIVERED_STATUSES or _in_range(sendgrid_status, 200, 300)
+
+
+def is_failed(status: Optional[str], sendgrid_status: Any) -> bool:
+    return status in FAILED_STATUSES or _in_range(sendgrid_status, 400, 600)
+
+
+def status_change_inc(old_status: Optional[str], new_status: Optional[str], sendgrid_status: Any = None) -> Dict[str, int]:
+    """Counter deltas for an existing log moving from `old_status` to `new_status`."""
+    inc: Dict[str, int] = {}
+    if old_status == new_status:
+        return inc
+    if old_status:
+        inc[f"status_counts.{old_status}"] = -1
+    if new_status:
+        inc[f"status_counts.{new_status}"] = 1
+
+    delivered_delta = int(is_delivered(new_status, sendgrid_status)) - int(is_delivered(old_status, sendgrid_status))
+    failed_delta = int(is_failed(new_status, sendgrid_status)) - int(is_failed(old_status, sendgrid_status))
+    if delivered_delta:
+        inc["delivered"] = delivered_delta
+    if failed_delta:
+        inc["failed"] = failed_delta
+    return inc
+
+
+def latency_bucket(ms: float) -> int:
+    return LATENCY_BUCKETS_MS[max(0, bisect_right(LATENCY_BUCKETS_MS, ms) - 1)]
+
+
+def histogram_percentiles(hist: Dict[str, int], percentiles=(50, 90, 99)) -> Dict[str, Optional[float]]:
+    """Percentiles from a {value: count} histogram. For bucketed histograms the
+    result is the lower bound of the bucket the percentile falls in."""
+    items = sorted((float(k), int(v)) for k, v in (hist or {}).items() if v)
+    total = sum(count for _, count in items)
+    out: Dict[str, Optional[float]] = {}
+    for p in percentiles:
+        out[f"p{p}"] = None
+        if not total:
+            continue
+        rank = p / 100.0 * total
+        seen = 0
+        for value, count in items:
+            seen += count
+            if seen >= rank:
+                out[f"p{p}"] = value
+                break
+    return out
+
+
+def _campaign_id_variants(campaign_ids: List[str]) -> List[Any]:
+    # email_logs normally stores the id as a string, but webhook-created rows may hold an ObjectId
+    out: List[Any] = list(campaign_ids)
+    out.extend(ObjectId(c) for c in campaign_ids if ObjectId.is_valid(c))
+    return out
+
+
+class CampaignStatsService:
+    def __init__(
+        self,
+        stats_collection: AsyncIOMotorCollection,
+        email_logs_collection: Optional[AsyncIOMotorCollection] = None,
+    ):
+        self.stats = stats_collection
+        self.email_logs = email_logs_collection
+
+    async def _apply(self, campaign_id: str, inc: Dict[str, int], extra: Optional[Dict[str, Any]] = None) -> None:
+        if not inc and not extra:
+            return
+        update: Dict[str, Any] = {"$set": {"updated_at": datetime.utcnow()}}
+        if inc:
+            update["$inc"] = inc
+        for op, fields in (extra or {}).items():
+            update.setdefault(op, {}).update(fields)
+        try:
+            await self.stats.update_one({"_id": str(campaign_id)}, update, upsert=True)
+        except Exception:
+            logger.exception("Failed to update campaign_stats for campaign=%s", campaign_id)
+
+    # -------------------------
+    # Incremental updates
+    # -------------------------
+
+    async def record_send(self, log_doc: Dict[str, Any]) -> None:
+        """Account for a freshly inserted email_logs row from the send path."""
+        status = log_doc.get("status")
+        sendgrid_status = log_doc.get("sendgrid_status")
+        inc = {
+            "total": 1,
+            "attempts_sum": int(log_doc.get("attempts") or 0),
+            "delivered": int(is_delivered(status, sendgrid_status)),
+            "failed": int(is_failed(status, sendgrid_status)),
+        }
+        if status:
+            inc[f"status_counts.{status}"] = 1
+        if log_doc.get("attempts") is not None:
+            inc[f"attempts_hist.{int(log_doc['attempts'])}"] = 1
+        if log_doc.get("send_latency_ms") is not None:
+            inc[f"latency_hist.{latency_bucket(log_doc['send_latency_ms'])}"] = 1
+        created_at = log_doc.get("created_at") or datetime.utcnow()
+        await self._apply(
+            log_doc["campaign_id"],
+            inc,
+            {"$min": {"first_sent": created_at}, "$max": {"last_sent": created_at}},
+        )
+
+    async def record_log_created(self, campaign_id: str) -> None:
+        """A webhook event arrived for a recipient we had no log for."""
+        await self._apply(campaign_id, {"total": 1})
+
+    async def record_event(
+        self,
+        campaign_id: str,
+        event_type: str,
+        previous_log: Dict[str, Any],
+        new_status: Optional[str] = None,
+    ) -> None:
+        """Apply a webhook event given the log document as it was *before* the event."""
+        inc: Dict[str, int] = {}
+        if event_type == "open":
+            inc["opens"] = 1
+            if not int(previous_log.get("open_count") or 0):
+                inc["unique_opens"] = 1
+        elif event_type == "click":
+            inc["clicks"] = 1
+            if not int(previous_log.get("click_count") or 0):
+                inc["unique_clicks"] = 1
+        elif event_type == "bounce":
+            inc["bounces"] = 1
+        elif event_type == "spamreport":
+            inc["spam_reports"] = 1
+
+        if new_status:
+            inc.update(status_change_inc(previous_log.get("status"), new_status, previous_log.get("sendgrid_status")))
+
+        await self._apply(campaign_id, inc)
+
+    async def record_engagement_many(self, deltas: Dict[str, Dict[str, int]]) -> None:
+        """Apply {campaign_id: {"opens", "unique_opens", "clicks", "unique_clicks"}} counter
+        deltas in one bulk write (batched open-pixel / click hits)."""
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne({"_id": str(campaign_id)}, {"$inc": inc, "$set": {"updated_at": now}}, upsert=True)
+            for campaign_id, inc in deltas.items()
+            if inc
+        ]
+        if ops:
+            await self.stats.bulk_write(ops, ordered=False)
+
+    # -------------------------
+    # Reads
+    # -------------------------
+
+    async def get(self, campaign_id: str, rebuild_missing: bool = True) -> Dict[str, Any]:
+        """Return the rollup for a campaign, rebuilding it from email_logs if it doesn't exist yet."""
+        doc = await self.stats.find_one({"_id": str(campaign_id)})
+        if doc is None and rebuild_missing and self.email_logs is not None:
+            await self.rebuild([str(campaign_id)])
+            doc = await self.stats.find_one({"_id": str(campaign_id)})
+        return doc or {"_id": str(campaign_id)}
+
+    async def get_many(self, campaign_ids: List[str], rebuild_missing: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Rollups for several campaigns in one `$in` read; missing ones are rebuilt in a single aggregation."""
+        ids = list(dict.fromkeys(str(c) for c in campaign_ids))
+        docs = {d["_id"]: d async for d in self.stats.find({"_id": {"$in": ids}})}
+        missing = [c for c in ids if c not in docs]
+        if missing and rebuild_missing and self.email_logs is not None:
+            await self.rebuild(missing)
+            async for d in self.stats.find({"_id": {"$in": missing}}):
+                docs[d["_id"]] = d
+        return {c: docs.get(c) or {"_id": c} for c in ids}
+
+    # -------------------------
+    # Rebuild
+    # -------------------------
+
+    def _rebuild_pipeline(self, campaign_ids: List[str]) -> List[Dict[str, Any]]:
+        """Single-pass $facet pipeline over a batch of campaigns. Every facet groups by
+        campaign (plus one small key), so the result size depends on the batch size,
+        not on the number of recipients."""
+        def _flag(cond):
+            return {"$sum": {"$cond": [cond, 1, 0]}}
+
+        campaign_key = {"$toString": "$campaign_id"}
+        sg_status = {"$ifNull": ["$sendgrid_status", 0]}
+        open_count = {"$toInt": {"$ifNull": ["$open_count", 0]}}
+        click_count = {"$toInt": {"$ifNull": ["$click_count", 0]}}
+        latency_bucket = {
+            "$switch": {
+                "branches": [
+                    {"case": {"$gte": ["$send_latency_ms", bound]}, "then": bound}
+                    for bound in reversed(LATENCY_BUCKETS_MS)
+                ],
+                "default": 0,
+            }
+        }
+
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"campaign_id": {"$in": _campaign_id_variants(campaign_ids)}}},
+        ]
+        pipeline.append({
+            "$facet": {
+                "totals": [
+                    {
+                        "$group": {
+                            "_id": campaign_key,
+                            "total": {"$sum": 1},
+                            "delivered": _flag({"$or": [
+                                {"$in": ["$status", list(DELIVERED_STATUSES)]},
+                                {"$and": [{"$gte": [sg_status, 200]}, {"$lt": [sg_status, 300]}]},
+                            ]}),
+                            "failed": _flag({"$or": [
+                                {"$in": ["$status", list(FAILED_STATUSES)]},
+                                {"$and": [{"$gte": [sg_status, 400]}, {"$lt": [sg_status, 600]}]},
+                            ]}),
+                            "opens": {"$sum": open_count},
+                            "unique_opens": _flag({"$gt": [open_count, 0]}),
+                            "clicks": {"$sum": click_count},
+                            "unique_clicks": _flag({"$gt": [click_count, 0]}),
+                            "bounces": _flag({"$gt": ["$bounced_at", None]}),
+                            "spam_reports": _flag({"$gt": ["$spam_report_at", None]}),
+                            "attempts_sum": {"$sum": {"$ifNull": ["$attempts", 0]}},
+                            "first_sent": {"$min": "$created_at"},
+                            "last_sent": {"$max": "$created_at"},
+                        }
+                    },
+                ],
+                "by_status": [
+                    {"$match": {"status": {"$ne": None}}},
+                    {"$group": {"_id": {"campaign_id": campaign_key, "key": "$status"}, "count": {"$sum": 1}}},
+                ],
+                "attempts": [
+                    {"$match": {"attempts": {"$ne": None}}},
+                    {"$group": {"_id": {"campaign_id": campaign_key, "key": "$attempts"}, "count": {"$sum": 1}}},
+                ],
+                "latency": [
+                    {"$match": {"send_latency_ms": {"$ne": None}}},
+                    {"$group": {"_id": {"campaign_id": campaign_key, "key": latency_bucket}, "count": {"$sum": 1}}},
+                ],
+            }
+        })
+        return pipeline
+
+    @staticmethod
+    def _empty_rollup() -> Dict[str, Any]:
+        doc: Dict[str, Any] = {f: 0 for f in COUNTER_FIELDS}
+        doc.update({
+            "status_counts": {},
+            "attempts_hist": {},
+            "latency_hist": {},
+            "first_sent": None,
+            "last_sent": None,
+        })
+        return doc
+
+    async def _campaigns_with_logs(self) -> List[str]:
+        cursor = self.email_logs.aggregate(
+            [{"$group": {"_id": {"$toString": "$campaign_id"}}}], allowDiskUse=True
+        )
+        return [row["_id"] async for row in cursor if row["_id"]]
+
+    async def rebuild(self, campaign_ids: Optional[List[str]] = None) -> int:
+        """Recompute rollups from email_logs, REBUILD_BATCH_SIZE campaigns per aggregation.
+        `None` rebuilds every campaign that has logs."""
+        if self.email_logs is None:
+            raise RuntimeError("rebuild requires the email_logs collection")
+
+        if campaign_ids is None:
+            ids = await self._campaigns_with_logs()
+        else:
+            ids = list(dict.fromkeys(str(c) for c in campaign_ids))
+        rebuilt = 0
+        for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+            rebuilt += await self._rebuild_batch(ids[start:start + REBUILD_BATCH_SIZE])
+        logger.info("Rebuilt campaign_stats for %s campaign(s)", rebuilt)
+        return rebuilt
+
+    async def _rebuild_batch(self, campaign_ids: List[str]) -> int:
+        cursor = self.email_logs.aggregate(self._rebuild_pipeline(campaign_ids), allowDiskUse=True)
+        rows = await cursor.to_list(length=1)
+        facets = rows[0] if rows else {}
+
+        docs: Dict[str, Dict[str, Any]] = {c: self._empty_rollup() for c in campaign_ids}
+        for row in facets.get("totals", []):
+            doc = docs.setdefault(row["_id"], self._empty_rollup())
+            doc.update({f: int(row.get(f) or 0) for f in COUNTER_FIELDS})
+            doc["first_sent"] = row.get("first_sent")
+            doc["last_sent"] = row.get("last_sent")
+        for facet, field in (("by_status", "status_counts"), ("attempts", "attempts_hist"), ("latency", "latency_hist")):
+            for row in facets.get(facet, []):
+                doc = docs.setdefault(row["_id"]["campaign_id"], self._empty_rollup())
+                doc[field][str(row["_id"]["key"])] = int(row["count"])
+
+        # campaigns without any logs still get an (empty) rollup so reads stay O(1)
+        now = datetime.utcnow()
+        for campaign_id, doc in docs.items():
+            doc["updated_at"] = now
+            doc["rebuilt_at"] = now
+            await self.stats.replace_one({"_id": campaign_id}, doc, upsert=True)
+        return len(docs)
+
+
+async def ensure_campaign_stats(database) -> bool:
+    """Rebuild all rollups unless the built marker exists; True if it ran."""
+    meta = database.get_collection(META_COLLECTION)
+    if await meta.find_one({"_id": META_ID}):
+        return False
+    service = CampaignStatsService(
+        database.get_collection(STATS_COLLECTION),
+        database.get_collection("email_logs"),
+    )
+    campaigns = await service.rebuild()
+    await meta.update_one(
+        {"_id": META_ID}, {"$set": {"built_at": datetime.utcnow(), "campaigns": campaigns}}, upsert=True
+    )
+    return True
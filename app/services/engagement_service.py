@@ -0,0 +1,157 @@
+# app/services/engagement_service.py
+"""Contact engagement scoring.
+
+A batch job streams `email_logs` (one row per send, carrying the open/click
+counters and last open/click timestamps folded in from the event history) into
+columnar NumPy arrays, then scores every recipient at once:
+
+- every send is weighted by how long ago it happened (exponential decay with
+  `half_life_days`), so old campaigns matter less than recent ones
+- open and click rates are the decayed opened/clicked sends over decayed sends,
+  smoothed with a small prior so a single send doesn't swing the score to 0 or 100
+- recency is the decayed age of the last open or click
+
+score = 100 * (OPEN_WEIGHT * open_rate + CLICK_WEIGHT * click_rate + RECENCY_WEIGHT * recency)
+
+Scores are written back to contacts (matched by email) with bulk updates.
+Contacts that were never mailed are left unscored.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateMany
+
+logger = logging.getLogger(__name__)
+
+SCORE_FIELD = "engagement_score"
+SCORED_AT_FIELD = "engagement_scored_at"
+
+DEFAULT_HALF_LIFE_DAYS = 30.0
+OPEN_WEIGHT = 0.5
+CLICK_WEIGHT = 0.3
+RECENCY_WEIGHT = 0.2
+# Laplace-style prior: a contact with no history scores like 0.5 opens / 0.1 clicks in 2 sends
+PRIOR_SENDS = 2.0
+PRIOR_OPENS = 0.5
+PRIOR_CLICKS = 0.1
+
+READ_BATCH_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+
+_MS_PER_DAY = 86_400_000.0
+
+
+def decay(age_days: np.ndarray, half_life_days: float) -> np.ndarray:
+    """0.5 ** (age / half_life); future timestamps count as age 0, NaN (never) as 0 weight."""
+    age = np.clip(age_days, 0.0, None)
+    return np.where(np.isnan(age), 0.0, np.power(0.5, age / half_life_days))
+
+
+def score_contacts(
+    contact_idx: np.ndarray,
+    sent_age_days: np.ndarray,
+    opened: np.ndarray,
+    clicked: np.ndarray,
+    engaged_age_days: np.ndarray,
+    n_contacts: int,
+    half_life_days: float = DEFAULT_HALF_LIFE_DAYS,
+) -> np.ndarray:
+    """Score `n_contacts` recipients from per-send arrays (all of equal length).
+
+    `contact_idx` maps each send to its recipient, `opened`/`clicked` are 0/1 flags and
+    `engaged_age_days` is the age of the send's last open/click (NaN if none).
+    Returns scores in [0, 100], rounded to one decimal.
+    """
+    weights = decay(sent_age_days, half_life_days)
+    sends = np.bincount(contact_idx, weights=weights, minlength=n_contacts)
+    opens = np.bincount(contact_idx, weights=weights * opened, minlength=n_contacts)
+    clicks = np.bincount(contact_idx, weights=weights * clicked, minlength=n_contacts)
+
+    # youngest engagement per contact; inf = never engaged
+    last_engaged = np.full(n_contacts, np.inf)
+    np.minimum.at(last_engaged, contact_idx, np.nan_to_num(engaged_age_days, nan=np.inf))
+    recency = decay(np.where(np.isinf(last_engaged), np.nan, last_engaged), half_life_days)
+
+    open_rate = (opens + PRIOR_OPENS) / (sends + PRIOR_SENDS)
+    click_rate = (clicks + PRIOR_CLICKS) / (sends + PRIOR_SENDS)
+    score = 100.0 * (OPEN_WEIGHT * open_rate + CLICK_WEIGHT * click_rate + RECENCY_WEIGHT * recency)
+    return np.round(np.clip(score, 0.0, 100.0), 1)
+
+
+def _age_days(values: List[Optional[datetime]], now: np.datetime64) -> np.ndarray:
+    # None becomes NaT, which must be mapped to NaN explicitly (NaT casts to int64 min)
+    stamps = np.array(values, dtype="datetime64[ms]")
+    age = (now - stamps).astype("timedelta64[ms]").astype(np.float64) / _MS_PER_DAY
+    age[np.isnat(stamps)] = np.nan
+    return age
+
+
+class EngagementScorer:
+    def __init__(self, database, half_life_days: float = DEFAULT_HALF_LIFE_DAYS):
+        self.email_logs = database.get_collection("email_logs")
+        self.contacts = database.get_collection("contacts")
+        self.half_life_days = half_life_days
+
+    async def _load_columns(self, now: np.datetime64) -> Dict[str, np.ndarray]:
+        """Stream every send into columnar arrays, one batch at a time."""
+        cursor = self.email_logs.find(
+            {"email": {"$type": "string"}, "created_at": {"$type": "date"}},
+            projection={
+                "_id": 0,
+                "email": 1,
+                "created_at": 1,
+                "open_count": 1,
+                "click_count": 1,
+                "last_opened_at": 1,
+                "last_clicked_at": 1,
+            },
+        ).batch_size(READ_BATCH_SIZE)
+
+        chunks: Dict[str, List[np.ndarray]] = {k: [] for k in ("email", "sent", "opened", "clicked", "engaged")}
+        while True:
+            batch = await cursor.to_list(length=READ_BATCH_SIZE)
+            if not batch:
+                break
+            chunks["email"].append(np.array([d["email"].strip().lower() for d in batch], dtype=object))
+            chunks["sent"].append(_age_days([d["created_at"] for d in batch], now))
+            chunks["opened"].append(np.array([d.get("open_count") or 0 for d in batch], dtype=np.float64) > 0)
+            chunks["clicked"].append(np.array([d.get("click_count") or 0 for d in batch], dtype=np.float64) > 0)
+            opened_age = _age_days([d.get("last_opened_at") for d in batch], now)
+            clicked_age = _age_days([d.get("last_clicked_at") for d in batch], now)
+            chunks["engaged"].append(np.fmin(opened_age, clicked_age))
+
+        if not chunks["email"]:
+            return {}
+        return {k: np.concatenate(v) for k, v in chunks.items()}
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Recompute and store engagement scores for every contact that has been mailed."""
+        now = now or datetime.utcnow()
+        cols = await self._load_columns(np.datetime64(now, "ms"))
+        if not cols:
+            return {"sends": 0, "contacts": 0, "updated": 0}
+
+        emails, contact_idx = np.unique(cols["email"], return_inverse=True)
+        scores = score_contacts(
+            contact_idx,
+            cols["sent"],
+            cols["opened"].astype(np.float64),
+            cols["clicked"].astype(np.float64),
+            cols["engaged"],
+            n_contacts=len(emails),
+            half_life_days=self.half_life_days,
+        )
+
+        updated = 0
+        for start in range(0, len(emails), WRITE_BATCH_SIZE):
+            ops = [
+                UpdateMany({"email": email}, {"$set": {SCORE_FIELD: float(score), SCORED_AT_FIELD: now}})
+                for email, score in zip(emails[start:start + WRITE_BATCH_SIZE], scores[start:start + WRITE_BATCH_SIZE])
+            ]
+            result = await self.contacts.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+
+        logger.info("Scored %s contacts from %s sends", len(emails), len(contact_idx))
+        return {"sends": int(len(contact_idx)), "contacts": int(len(emails)), "updated": updated}
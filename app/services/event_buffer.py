@@ -0,0 +1,318 @@
+# app/services/event_buffer.py
+"""Write-behind buffer for open-pixel and click hits.
+
+The tracking endpoints only verify the reference and append a hit here, then
+return the pixel/redirect straight away. A background task drains the buffer
+every `flush_interval_ms` (or as soon as `batch_size` hits are waiting) and
+writes the whole batch at once:
+
+- email_logs: one UpdateOne per recipient log, with every hit on that log in the
+  batch folded into the same $inc/$min/$max (a hot log is written once per flush)
+- tracking_links: one counter update per link, legacy click ids resolved with a
+  single `_id: {$in}` read
+- campaign_stats: opens/clicks per campaign, plus unique opens/clicks for logs
+  whose counter was still 0 (read once per flush, before the write)
+- the raw event history via `EventStore.record_many`
+
+The buffer is bounded (`max_pending`); hits arriving while it is full are
+dropped and counted, never blocked on. `stats()` reports drops, flush sizes and
+failures. Everything pending is flushed on shutdown; a crash loses at most the
+unflushed hits of this process.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.services.campaign_stats_service import CampaignStatsService, STATS_COLLECTION
+from app.services.event_store import EventStore, LOG_COUNTER_FIELDS
+from app.services.link_service import LINKS_COLLECTION, click_op
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_PENDING = 100_000
+DEFAULT_BATCH_SIZE = 2000
+DEFAULT_FLUSH_INTERVAL_MS = 50
+
+
+def _log_key(log_filter: Dict[str, Any]) -> Tuple:
+    return tuple(log_filter.items())
+
+
+class _LogUpdate:
+    """All hits of one batch on one email_logs document, folded into a single update."""
+
+    __slots__ = ("inc", "first", "last")
+
+    def __init__(self):
+        self.inc: Dict[str, int] = defaultdict(int)
+        self.first: Dict[str, datetime] = {}
+        self.last: Dict[str, datetime] = {}
+
+    def add(self, event_type: str, ts: datetime, click_field: Optional[str] = None) -> None:
+        count_field, first_field, last_field = LOG_COUNTER_FIELDS[event_type]
+        self.inc[count_field] += 1
+        if click_field:
+            self.inc[click_field] += 1
+        if first_field not in self.first or ts < self.first[first_field]:
+            self.first[first_field] = ts
+        if last_field not in self.last or ts > self.last[last_field]:
+            self.last[last_field] = ts
+
+    def op(self, log_filter: Dict[str, Any]) -> UpdateOne:
+        return UpdateOne(log_filter, {"$inc": dict(self.inc), "$min": self.first, "$max": self.last})
+
+
+class TrackingBuffer:
+    def __init__(
+        self,
+        database,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+    ):
+        self.email_logs = database.get_collection("email_logs")
+        self.links = database.get_collection(LINKS_COLLECTION)
+        self.event_store = EventStore(database)
+        self.campaign_stats = CampaignStatsService(database.get_collection(STATS_COLLECTION))
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+
+        self._pending: deque = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._counters = {
+            "accepted": 0,
+            "dropped": 0,
+            "flushed": 0,
+            "failed": 0,
+            "unmatched": 0,
+            "flushes": 0,
+            "max_pending": 0,
+            "last_flush_size": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    # ---- producers (request handlers) ----
+
+    def _submit(self, hit: Dict[str, Any]) -> bool:
+        if len(self._pending) >= self.max_pending:
+            self._counters["dropped"] += 1
+            return False
+        self._pending.append(hit)
+        self._counters["accepted"] += 1
+        if len(self._pending) > self._counters["max_pending"]:
+            self._counters["max_pending"] = len(self._pending)
+        if self._task is None and not self._stopping:
+            self.start()
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def add_open(self, log_filter: Dict[str, Any], ts: datetime, **extra: Any) -> bool:
+        """Queue an open on the email_logs document matched by `log_filter`; False if dropped."""
+        return self._submit({"type": "open", "log": log_filter, "ts": ts, "extra": extra})
+
+    def add_click(
+        self,
+        log_filter: Dict[str, Any],
+        ts: datetime,
+        campaign_id: str,
+        link_index: int,
+        url: str,
+        **extra: Any,
+    ) -> bool:
+        """Queue a signed-token click (per-link counter keyed by campaign and link index)."""
+        return self._submit({
+            "type": "click", "log": log_filter, "ts": ts, "link": (campaign_id, link_index),
+            "url": url, "extra": {"click_id": str(link_index), "url": url, **extra},
+        })
+
+    def add_legacy_click(self, click_id: str, ts: datetime, url: str, **extra: Any) -> bool:
+        """Queue a click on a legacy click id; its log is resolved through tracking_links at flush."""
+        return self._submit({
+            "type": "click", "log": None, "ts": ts, "legacy_click_id": click_id,
+            "url": url, "extra": {"click_id": click_id, "url": url, **extra},
+        })
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write out everything still pending."""
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._pending:
+            await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._pending:
+                await self.flush()
+                if len(self._pending) < self.batch_size:
+                    break
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, "pending": len(self._pending), "running": self._task is not None}
+
+    # ---- consumer ----
+
+    async def flush(self) -> int:
+        """Write up to `batch_size` pending hits; returns how many were written."""
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        if not batch:
+            return 0
+        started = time.perf_counter()
+        try:
+            written = await self._write(batch)
+            self._counters["flushed"] += written
+            self._counters["unmatched"] += len(batch) - written
+        except Exception as e:
+            # the batch is lost rather than retried (a partial write would double count)
+            self._counters["failed"] += len(batch)
+            logger.warning("Tracking flush of %s hits failed: %s", len(batch), e)
+            written = 0
+        self._counters["flushes"] += 1
+        self._counters["last_flush_size"] = len(batch)
+        self._counters["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return written
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> int:
+        await self._resolve_legacy_clicks(batch)
+
+        log_updates: Dict[Tuple, _LogUpdate] = defaultdict(_LogUpdate)
+        link_hits: Dict[Tuple[str, int], List[Dict[str, Any]]] = defaultdict(list)
+        for hit in batch:
+            if hit["log"] is None:
+                continue
+            click_field = None
+            if hit["type"] == "click":
+                click_field = f"clicks.{hit['extra']['click_id']}"
+                if "link" in hit:
+                    link_hits[hit["link"]].append(hit)
+            log_updates[_log_key(hit["log"])].add(hit["type"], hit["ts"], click_field)
+
+        # logs as they were before this batch: owner (campaign/email) and the counters that
+        # decide unique opens/clicks. A log hit by another writer (e.g. the webhook) between
+        # this read and the write can be counted as unique twice; `rebuild` recounts exactly.
+        owners = await self._log_owners(list(log_updates))
+
+        writes = []
+        rollup = self._rollup_deltas(log_updates, owners)
+        if rollup:
+            writes.append(self.campaign_stats.record_engagement_many(rollup))
+        if log_updates:
+            writes.append(self.email_logs.bulk_write(
+                [update.op(dict(key)) for key, update in log_updates.items()], ordered=False
+            ))
+        if link_hits:
+            ops = [
+                click_op(
+                    campaign_id, link_index, hits[0]["url"],
+                    max(h["ts"] for h in hits), count=len(hits), first_ts=min(h["ts"] for h in hits),
+                )
+                for (campaign_id, link_index), hits in link_hits.items()
+            ]
+            writes.append(self.links.bulk_write(ops, ordered=False))
+        if writes:
+            await asyncio.gather(*writes)
+
+        # raw history, only for hits whose log exists (same as the unbuffered endpoints)
+        events = []
+        for hit in batch:
+            owner = hit["log"] is not None and owners.get(_log_key(hit["log"]))
+            if owner:
+                events.append({
+                    "campaign_id": str(owner["campaign_id"]),
+                    "email": owner.get("email"),
+                    "type": hit["type"],
+                    "timestamp": hit["ts"],
+                    **hit["extra"],
+                })
+        if events:
+            await self.event_store.record_many(events)
+        return len(events)
+
+    @staticmethod
+    def _rollup_deltas(
+        log_updates: Dict[Tuple, _LogUpdate], owners: Dict[Tuple, Dict[str, Any]]
+    ) -> Dict[str, Dict[str, int]]:
+        deltas: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for key, update in log_updates.items():
+            owner = owners.get(key)
+            if not owner:
+                continue
+            delta = deltas[str(owner["campaign_id"])]
+            for count_field, total, unique in (("open_count", "opens", "unique_opens"), ("click_count", "clicks", "unique_clicks")):
+                hits = update.inc.get(count_field, 0)
+                if hits:
+                    delta[total] += hits
+                    if not int(owner.get(count_field) or 0):
+                        delta[unique] += 1
+        return {campaign_id: dict(delta) for campaign_id, delta in deltas.items()}
+
+    async def _resolve_legacy_clicks(self, batch: List[Dict[str, Any]]) -> None:
+        """Point legacy click hits at their log (by _id) and count them on tracking_links."""
+        legacy = [h for h in batch if h.get("legacy_click_id")]
+        if not legacy:
+            return
+        by_click: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for hit in legacy:
+            by_click[hit["legacy_click_id"]].append(hit)
+
+        links = {}
+        async for link in self.links.find({"_id": {"$in": list(by_click)}}, projection={"log_id": 1}):
+            links[link["_id"]] = link
+        ops = []
+        for click_id, hits in by_click.items():
+            link = links.get(click_id)
+            if not link:
+                continue
+            ts = [h["ts"] for h in hits]
+            ops.append(UpdateOne(
+                {"_id": click_id},
+                {"$inc": {"clicks": len(hits)}, "$min": {"first_clicked_at": min(ts)}, "$max": {"last_clicked_at": max(ts)}},
+            ))
+            if link.get("log_id") is not None:
+                for hit in hits:
+                    hit["log"] = {"_id": link["log_id"]}
+        if ops:
+            await self.links.bulk_write(ops, ordered=False)
+
+    async def _log_owners(self, keys: List[Tuple]) -> Dict[Tuple, Dict[str, Any]]:
+        """campaign_id/email/open and click counts of each log, one `$in` read per filter
+        shape (per campaign for token filters), served by the same indexes as the updates."""
+        groups: Dict[Tuple, List[Any]] = defaultdict(list)
+        for key in keys:
+            *prefix, (field, value) = key
+            groups[(tuple(prefix), field)].append(value)
+
+        owners: Dict[Tuple, Dict[str, Any]] = {}
+        for (prefix, field), values in groups.items():
+            query = {**dict(prefix), field: {"$in": values}}
+            projection = {"campaign_id": 1, "email": 1, "open_count": 1, "click_count": 1, field: 1}
+            async for log in self.email_logs.find(query, projection=projection):
+                owners[prefix + ((field, log.get(field)),)] = log
+        return owners
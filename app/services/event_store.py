@@ -0,0 +1,121 @@
+# app/services/event_store.py
+"""Append-only store for raw open/click events.
+
+Events are grouped into bucket documents per campaign and hour (bucket pattern),
+so `email_logs` only has to keep counters and first/last timestamps instead of
+an ever-growing `open_events` / `click_events` array per recipient.
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from app.services.timeseries_service import TimeseriesService, TIMESERIES_COLLECTION
+from app.services.unique_counter_service import UniqueCounterService, SKETCH_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+EVENTS_COLLECTION = "email_events"
+
+# Max events per bucket document. Once a bucket is full the next upsert
+# no longer matches it and a fresh bucket for the same hour is created.
+DEFAULT_BUCKET_SIZE = 500
+
+# event type -> (counter, first timestamp, last timestamp) fields on email_logs
+LOG_COUNTER_FIELDS = {
+    "open": ("open_count", "first_opened_at", "last_opened_at"),
+    "click": ("click_count", "first_clicked_at", "last_clicked_at"),
+}
+
+# optional event attributes copied into the bucket entry when present
+EXTRA_EVENT_FIELDS = ("ip", "ua", "url", "click_id")
+
+
+def bucket_hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def log_counter_update(event_type: str, ts: datetime) -> Dict[str, Any]:
+    """Build the email_logs update for an open/click: counter plus first/last timestamps."""
+    count_field, first_field, last_field = LOG_COUNTER_FIELDS[event_type]
+    return {
+        "$inc": {count_field: 1},
+        "$min": {first_field: ts},
+        "$max": {last_field: ts},
+    }
+
+
+class EventStore:
+    def __init__(self, database, bucket_size: int = DEFAULT_BUCKET_SIZE):
+        self.buckets = database.get_collection(EVENTS_COLLECTION)
+        self.bucket_size = bucket_size
+        self.unique_counter = UniqueCounterService(database.get_collection(SKETCH_COLLECTION))
+        self.timeseries = TimeseriesService(database.get_collection(TIMESERIES_COLLECTION))
+
+    def _bucket_op(self, event: Dict[str, Any]) -> UpdateOne:
+        ts: datetime = event["timestamp"]
+        event_type = event["type"]
+        entry = {"type": event_type, "email": event.get("email"), "ts": ts}
+        for key in EXTRA_EVENT_FIELDS:
+            if event.get(key) is not None:
+                entry[key] = event[key]
+
+        return UpdateOne(
+            {
+                "campaign_id": event["campaign_id"],
+                "hour": bucket_hour(ts),
+                "count": {"$lt": self.bucket_size},
+            },
+            {
+                "$push": {"events": entry},
+                "$inc": {"count": 1, f"counts.{event_type}": 1},
+                "$min": {"first_ts": ts},
+                "$max": {"last_ts": ts},
+            },
+            upsert=True,
+        )
+
+    async def record_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Append events in one unordered bulk write and fold them into the unique-count sketches
+        and the per-minute timeseries counters. Events without a campaign are skipped."""
+        accepted: List[Dict[str, Any]] = []
+        for event in events:
+            if not event.get("campaign_id") or not event.get("timestamp"):
+                logger.warning("Skipping event without campaign_id/timestamp: %s", event)
+                continue
+            accepted.append(event)
+
+        if not accepted:
+            return 0
+        await self.buckets.bulk_write([self._bucket_op(e) for e in accepted], ordered=False)
+        await self.unique_counter.record_many(accepted)
+        await self.timeseries.record_many(accepted)
+        return len(accepted)
+
+    async def record(self, campaign_id: str, email: str, event_type: str, timestamp: datetime, **extra: Any) -> int:
+        event = {"campaign_id": campaign_id, "email": email, "type": event_type, "timestamp": timestamp}
+        event.update(extra)
+        return await self.record_many([event])
+
+    async def iter_events(
+        self,
+        campaign_id: str,
+        event_type: Optional[str] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ):
+        """Yield raw events for a campaign in bucket order (hour granularity on the range bounds)."""
+        query: Dict[str, Any] = {"campaign_id": campaign_id}
+        if start or end:
+            query["hour"] = {}
+            if start:
+                query["hour"]["$gte"] = bucket_hour(start)
+            if end:
+                query["hour"]["$lte"] = end
+        cursor = self.buckets.find(query, projection={"events": 1}).sort("hour", 1)
+        async for bucket in cursor:
+            for ev in bucket.get("events", []):
+                if event_type and ev.get("type") != event_type:
+                    continue
+                yield ev
@@ -0,0 +1,71 @@
+# app/services/link_service.py
+"""Link table for click tracking.
+
+`tracking_links` has one document per tracked link, looked up by `_id` only:
+
+- signed click tokens: `_id` = "<campaign_id>:<link_index>", one per link of a campaign
+- legacy uuid click ids: `_id` = click_id, plus `log_id` naming the email_logs document
+  (backfilled from `email_logs.click_map` by app/migrations/build_tracking_links.py)
+
+Both carry `campaign_id`, `url` and a `clicks` counter, so link-level reports are
+a `$match` on campaign_id (indexed) grouped by URL.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+LINKS_COLLECTION = "tracking_links"
+
+
+def link_key(campaign_id: str, link_index: int) -> str:
+    return f"{campaign_id}:{link_index}"
+
+
+def click_op(
+    campaign_id: str,
+    link_index: int,
+    url: str,
+    ts: datetime,
+    count: int = 1,
+    first_ts: Optional[datetime] = None,
+) -> UpdateOne:
+    """Counter update for `count` clicks on a token link, the last one at `ts` (usable in bulk writes)."""
+    return UpdateOne(
+        {"_id": link_key(campaign_id, link_index)},
+        {
+            "$inc": {"clicks": count},
+            "$max": {"last_clicked_at": ts},
+            "$min": {"first_clicked_at": first_ts or ts},
+            "$setOnInsert": {"campaign_id": campaign_id, "link_index": link_index, "url": url},
+        },
+        upsert=True,
+    )
+
+
+class LinkTracker:
+    def __init__(self, collection):
+        self.links = collection
+
+    async def link_stats(self, campaign_id: str) -> List[Dict[str, Any]]:
+        """Clicks per destination URL for a campaign, most clicked first."""
+        pipeline = [
+            {"$match": {"campaign_id": campaign_id}},
+            {"$group": {
+                "_id": "$url",
+                "clicks": {"$sum": "$clicks"},
+                "first_clicked_at": {"$min": "$first_clicked_at"},
+                "last_clicked_at": {"$max": "$last_clicked_at"},
+            }},
+            {"$sort": {"clicks": -1}},
+        ]
+        rows = await self.links.aggregate(pipeline).to_list(length=None)
+        return [
+            {
+                "url": r["_id"],
+                "clicks": r["clicks"],
+                "first_clicked_at": r.get("first_clicked_at"),
+                "last_clicked_at": r.get("last_clicked_at"),
+            }
+            for r in rows
+        ]
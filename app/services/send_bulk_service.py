@@ -1,12 +1,15 @@
 # app/services/send_bulk_service.py
 import asyncio
 import logging
+import time
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
 
 from app.services.sendgrid_client import SendGridClient
+from app.services.campaign_stats_service import CampaignStatsService, STATS_COLLECTION
+from app.services.suppression_service import SUPPRESSIONS_COLLECTION, suppression_filter
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -40,6 +43,13 @@ class BulkEmailService:
                 mongo_client = AsyncIOMotorClient(getattr(settings, "MONGO_URI"))
             self.email_logs = mongo_client.get_default_database().get_collection("email_logs")
 
+        # rollup lives in the same database as the logs
+        self.campaign_stats = CampaignStatsService(
+            self.email_logs.database.get_collection(STATS_COLLECTION),
+            self.email_logs,
+        )
+        self.suppressions = self.email_logs.database.get_collection(SUPPRESSIONS_COLLECTION)
+
         self._semaphore = asyncio.Semaphore(self.concurrency)
         self._per_message_delay = 1.0 / max(1, self.rate_limit_per_sec)
 
@@ -48,11 +58,13 @@ class BulkEmailService:
             await self.email_logs.insert_one(record)
         except Exception:
             logger.exception("Failed to insert email log into DB: %s", record)
+            return
+        await self.campaign_stats.record_send(record)
 
-    def _build_sendgrid_payload(self, from_email: str, to_email: str, subject: str, html: str, campaign_id: str, reply_to: Optional[str] = None) -> Dict:
+    def _build_sendgrid_payload(self, from_email: str, to_email: str, subject: str, html: str, campaign_id: str, reply_to: Optional[str] = None, unsubscribe_link: Optional[str] = None) -> Dict:
         from sendgrid.helpers.mail import (
             Mail, Email, To, Content, TrackingSettings, ClickTracking, 
-            OpenTracking, CustomArg, Category
+            OpenTracking, CustomArg, Category, Header
         )
 
         # 1. Create Mail object
@@ -67,6 +79,11 @@ class BulkEmailService:
         if reply_to:
             message.reply_to = Email(reply_to)
 
+        # 2b. RFC 8058 one-click unsubscribe (mail clients POST to the same URL)
+        if unsubscribe_link and unsubscribe_link.startswith("https://"):
+            message.add_header(Header("List-Unsubscribe", f"<{unsubscribe_link}>"))
+            message.add_header(Header("List-Unsubscribe-Post", "List-Unsubscribe=One-Click"))
+
         # 3. Add Custom Args & Categories
         message.add_category(Category(campaign_id))
         message.add_custom_arg(CustomArg("campaign_id", campaign_id))
@@ -89,12 +106,22 @@ class BulkEmailService:
         subject = message.get("subject") or ""
         html = message.get("html") or ""
 
-        payload = self._build_sendgrid_payload(from_email=from_email, to_email=to_email, subject=subject, html=html, campaign_id=campaign_id, reply_to=reply_to)
+        payload = self._build_sendgrid_payload(
+            from_email=from_email,
+            to_email=to_email,
+            subject=subject,
+            html=html,
+            campaign_id=campaign_id,
+            reply_to=reply_to,
+            unsubscribe_link=message.get("unsubscribe_link"),
+        )
 
         async with self._semaphore:
             await asyncio.sleep(self._per_message_delay)
 
+            started = time.perf_counter()
             attempt_meta = await self.sg_client.send(payload)
+            send_latency_ms = round((time.perf_counter() - started) * 1000, 1)
 
             # Log each underlying attempt detail
             for det in attempt_meta.get("attempt_details", []):
@@ -111,6 +138,8 @@ class BulkEmailService:
             log_doc = {
                 "campaign_id": campaign_id,
                 "email": to_email,
+                # signed tracking/unsubscribe tokens resolve the log by (campaign_id, contact_id)
+                "contact_id": message.get("contact_id"),
                 "name": message.get("name"),
                 "subject": subject,
                 "status": status_text,   # initial status: accepted by sendgrid => 'sent'
@@ -118,11 +147,10 @@ class BulkEmailService:
                 "sendgrid_body": attempt_meta.get("body"),
                 "attempts": attempt_meta.get("attempts"),
                 "attempt_details": attempt_meta.get("attempt_details"),
+                "send_latency_ms": send_latency_ms,   # wall time incl. retries/backoff
                 "error": attempt_meta.get("error"),
                 "open_count": 0,
                 "click_count": 0,
-                "open_events": [],
-                "click_events": [],
                 "created_at": datetime.utcnow(),
                 "updated_at": datetime.utcnow()
             }
@@ -144,6 +172,11 @@ class BulkEmailService:
         if not from_email:
             raise ValueError("No from_email provided in payload or settings.SENDER_EMAIL")
 
+        # drop suppressed recipients (bounced, spam-reporting, unsubscribed) before anything is sent
+        messages, suppressed = await suppression_filter.partition(self.suppressions, messages)
+        if suppressed:
+            logger.info("Suppressed %s recipients for campaign=%s", len(suppressed), campaign_id)
+
         total = len(messages)
         logger.info("SendBulk started campaign=%s total=%s", campaign_id, total)
 
@@ -161,7 +194,14 @@ class BulkEmailService:
 
         logger.info("SendBulk finished campaign=%s sent=%s failed=%s total=%s", campaign_id, sent, failed, total)
 
-        return {"campaign_id": campaign_id, "total": total, "sent": sent, "failed": failed, "details": results}
+        return {
+            "campaign_id": campaign_id,
+            "total": total,
+            "sent": sent,
+            "failed": failed,
+            "suppressed": len(suppressed),
+            "details": results,
+        }
 
     async def close(self):
         await self.sg_client.close()
@@ -0,0 +1,117 @@
+# app/services/send_time_service.py
+"""Send-time optimization.
+
+A batch job derives each contact's preferred open hour (UTC, 0-23) from the raw
+open events in the email_events buckets: opens are binned into a contacts x 24
+histogram in one `np.bincount` (recent opens weigh more, see engagement decay)
+and the busiest hour wins. Contacts with fewer than `min_opens` opens get no
+preference. The scheduler uses the stored hour to split a campaign into hourly
+waves (see `wave_run_at`).
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateMany
+
+from app.services.event_store import EVENTS_COLLECTION
+from app.services.engagement_service import DEFAULT_HALF_LIFE_DAYS, decay
+
+logger = logging.getLogger(__name__)
+
+PREFERRED_HOUR_FIELD = "preferred_send_hour"
+DEFAULT_MIN_OPENS = 2
+
+WRITE_BATCH_SIZE = 1000
+
+_MS_PER_DAY = 86_400_000.0
+
+
+def preferred_hours(
+    contact_idx: np.ndarray,
+    open_hours: np.ndarray,
+    weights: np.ndarray,
+    n_contacts: int,
+    open_counts: np.ndarray,
+    min_opens: int = DEFAULT_MIN_OPENS,
+) -> np.ndarray:
+    """Busiest (weighted) open hour per contact, or -1 where the contact has fewer than `min_opens` opens."""
+    hist = np.bincount(contact_idx * 24 + open_hours, weights=weights, minlength=n_contacts * 24)
+    best = hist.reshape(n_contacts, 24).argmax(axis=1)
+    return np.where(open_counts >= min_opens, best, -1)
+
+
+def wave_run_at(send_at: datetime, preferred_hour: Optional[int]) -> datetime:
+    """First time at or after `send_at` that falls in `preferred_hour` (UTC, within the next 24h).
+    Contacts without a preference, or whose hour is the current one, go at `send_at`.
+    An offset-aware `send_at` is worked out in UTC (the result is UTC); naive ones are taken as UTC."""
+    if preferred_hour is None:
+        return send_at
+    utc = send_at.astimezone(timezone.utc) if send_at.tzinfo is not None else send_at
+    if preferred_hour == utc.hour:
+        return send_at
+    top_of_hour = utc.replace(minute=0, second=0, microsecond=0)
+    return top_of_hour + timedelta(hours=(preferred_hour - utc.hour) % 24)
+
+
+class SendTimeOptimizer:
+    def __init__(
+        self,
+        database,
+        half_life_days: float = DEFAULT_HALF_LIFE_DAYS,
+        min_opens: int = DEFAULT_MIN_OPENS,
+    ):
+        self.buckets = database.get_collection(EVENTS_COLLECTION)
+        self.contacts = database.get_collection("contacts")
+        self.half_life_days = half_life_days
+        self.min_opens = min_opens
+
+    async def _load_opens(self):
+        """Stream open events out of the buckets as (emails, timestamps) arrays."""
+        emails: List[np.ndarray] = []
+        stamps: List[np.ndarray] = []
+        cursor = self.buckets.find(
+            {"counts.open": {"$gt": 0}},
+            projection={"_id": 0, "events.type": 1, "events.email": 1, "events.ts": 1},
+        )
+        async for bucket in cursor:
+            opens = [e for e in bucket.get("events") or [] if e.get("type") == "open" and e.get("email")]
+            if not opens:
+                continue
+            emails.append(np.array([e["email"].strip().lower() for e in opens], dtype=object))
+            stamps.append(np.array([e["ts"] for e in opens], dtype="datetime64[ms]"))
+        if not emails:
+            return None, None
+        return np.concatenate(emails), np.concatenate(stamps)
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Recompute and store preferred_send_hour for every contact with enough opens."""
+        now = now or datetime.utcnow()
+        emails, stamps = await self._load_opens()
+        if emails is None:
+            return {"opens": 0, "contacts": 0, "updated": 0}
+
+        contacts, contact_idx = np.unique(emails, return_inverse=True)
+        open_hours = (stamps.astype("datetime64[h]").astype(np.int64) % 24).astype(np.int64)
+        age_days = (np.datetime64(now, "ms") - stamps).astype(np.float64) / _MS_PER_DAY
+        weights = decay(age_days, self.half_life_days)
+        open_counts = np.bincount(contact_idx, minlength=len(contacts))
+
+        hours = preferred_hours(
+            contact_idx, open_hours, weights, len(contacts), open_counts, min_opens=self.min_opens
+        )
+
+        with_pref = np.nonzero(hours >= 0)[0]
+        updated = 0
+        for start in range(0, len(with_pref), WRITE_BATCH_SIZE):
+            chunk = with_pref[start:start + WRITE_BATCH_SIZE]
+            ops = [
+                UpdateMany({"email": contacts[i]}, {"$set": {PREFERRED_HOUR_FIELD: int(hours[i])}})
+                for i in chunk
+            ]
+            result = await self.contacts.bulk_write(ops, ordered=False)
+            updated += result.modified_count
+
+        logger.info("Preferred send hours for %s of %s contacts from %s opens", len(with_pref), len(contacts), len(emails))
+        return {"opens": int(len(emails)), "contacts": int(len(with_pref)), "updated": updated}
@@ -0,0 +1,62 @@
+# app/services/sendgrid_stats_cache.py
+"""Cached SendGrid category stats for the analytics endpoints.
+
+One shared SendGridClient per process, a TTL cache with single-flight loading and
+stale-while-revalidate, and a bound on how long a request waits for SendGrid
+before the caller falls back to the Mongo rollup.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.sendgrid_client import SendGridClient
+from app.utils.cache import AsyncTTLCache
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[SendGridClient] = None
+_cache = AsyncTTLCache(
+    ttl=settings.SENDGRID_STATS_CACHE_TTL_SECONDS,
+    stale_ttl=settings.SENDGRID_STATS_STALE_TTL_SECONDS,
+)
+
+
+class SendGridStatsUnavailable(Exception):
+    pass
+
+
+def _get_client() -> SendGridClient:
+    global _client
+    if _client is None:
+        _client = SendGridClient(api_key=settings.SENDGRID_API_KEY)
+    return _client
+
+
+async def _load(category: str) -> Dict[str, Any]:
+    stats = await _get_client().get_category_stats_all_time(category)
+    if not stats.get("success"):
+        # not cached: the next request tries again
+        raise SendGridStatsUnavailable(stats.get("error") or stats.get("status_code"))
+    return stats
+
+
+async def get_category_stats(category: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Return SendGrid all-time stats for a category, or None if they are not available
+    within `timeout` seconds (defaults to settings.SENDGRID_STATS_TIMEOUT_SECONDS)."""
+    if timeout is None:
+        timeout = settings.SENDGRID_STATS_TIMEOUT_SECONDS
+    try:
+        return await asyncio.wait_for(_cache.get_or_load(category, lambda: _load(category)), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.info("SendGrid stats for %s not ready within %ss, serving rollup", category, timeout)
+    except Exception as e:
+        logger.warning("SendGrid stats lookup failed for %s: %s", category, e)
+    return None
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,181 @@
+# app/services/suppression_service.py
+"""Global suppression list.
+
+`suppressions` holds one document per address that must never be mailed again,
+keyed by the normalized email:
+
+    {"_id": "<email>", "reasons": ["bounce", ...], "reason": "<latest>",
+     "campaign_id": "<latest source campaign>", "created_at", "updated_at"}
+
+It is fed by unsubscribes, hard bounces and spam reports. At send time every
+process checks recipients against an in-memory Bloom filter of the list; only
+positives (suppressed addresses plus ~0.1% false positives) are confirmed with
+one `$in` query on `_id`, so there's no per-recipient lookup. The filter is
+loaded once per process (Celery workers load it on `worker_init`, before the
+pool forks) and brought up to date before each send by reading only the
+entries changed since the last refresh (`updated_at` index).
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+from app.config import settings
+from app.contacts.utils import normalize_email
+from app.utils.bloom import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+SUPPRESSIONS_COLLECTION = "suppressions"
+
+REASON_UNSUBSCRIBE = "unsubscribe"
+REASON_BOUNCE = "bounce"
+REASON_SPAM = "spamreport"
+
+# SendGrid webhook event -> suppression reason
+SUPPRESSING_EVENTS = {
+    "bounce": REASON_BOUNCE,
+    "spamreport": REASON_SPAM,
+    "unsubscribe": REASON_UNSUBSCRIBE,
+    "group_unsubscribe": REASON_UNSUBSCRIBE,
+}
+
+# writers on other hosts may stamp updated_at slightly behind our watermark;
+# re-reading a few minutes of entries is cheap (adding twice is harmless)
+REFRESH_OVERLAP = timedelta(minutes=5)
+LOAD_BATCH_SIZE = 10000
+CONFIRM_BATCH_SIZE = 1000
+
+
+def suppression_reason(event: Dict[str, Any]) -> Optional[str]:
+    """Reason to suppress for a SendGrid event, or None. Blocked (soft) bounces don't suppress."""
+    reason = SUPPRESSING_EVENTS.get(event.get("event"))
+    if reason == REASON_BOUNCE and event.get("type") == "blocked":
+        return None
+    return reason
+
+
+def _update(email: str, reason: str, campaign_id: Optional[str], at: Optional[datetime]) -> UpdateOne:
+    now = datetime.utcnow()
+    fields = {"reason": reason, "updated_at": now}
+    if campaign_id:
+        fields["campaign_id"] = str(campaign_id)
+    return UpdateOne(
+        {"_id": email},
+        {"$set": fields, "$addToSet": {"reasons": reason}, "$setOnInsert": {"created_at": at or now}},
+        upsert=True,
+    )
+
+
+async def suppress(
+    collection,
+    email: str,
+    reason: str,
+    campaign_id: Optional[str] = None,
+    at: Optional[datetime] = None,
+) -> None:
+    email = normalize_email(email)
+    if email:
+        await collection.bulk_write([_update(email, reason, campaign_id, at)])
+
+
+async def unsuppress(collection, email: str, reason: str) -> bool:
+    """Withdraw one reason (e.g. a contact resubscribed); the entry is deleted once no
+    reason is left. True if the address is no longer suppressed. Filters that still
+    hold the address only cost an extra exact check at send time."""
+    email = normalize_email(email)
+    if not email:
+        return False
+    doc = await collection.find_one_and_update(
+        {"_id": email},
+        {"$pull": {"reasons": reason}, "$set": {"updated_at": datetime.utcnow()}},
+        projection={"reasons": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if doc is None:
+        return True
+    if doc.get("reasons"):
+        await collection.update_one({"_id": email}, {"$set": {"reason": doc["reasons"][-1]}})
+        return False
+    await collection.delete_one({"_id": email, "reasons": {"$size": 0}})
+    return True
+
+
+async def suppress_many(collection, entries: List[Tuple[str, str]]) -> int:
+    """Bulk-suppress (email, reason) pairs (migrations/backfills)."""
+    ops = [_update(normalize_email(e), r, None, None) for e, r in entries if normalize_email(e)]
+    if not ops:
+        return 0
+    result = await collection.bulk_write(ops, ordered=False)
+    return result.upserted_count + result.modified_count
+
+
+class SuppressionFilter:
+    """Per-process Bloom filter over the suppressions collection.
+
+    Holds no database handle: callers pass the collection of their own client /
+    event loop (Celery tasks each run their own loop).
+    """
+
+    def __init__(self, capacity: Optional[int] = None, error_rate: Optional[float] = None):
+        self.capacity = capacity or settings.SUPPRESSION_BLOOM_CAPACITY
+        self.error_rate = error_rate or settings.SUPPRESSION_BLOOM_ERROR_RATE
+        self.bloom: Optional[BloomFilter] = None
+        self.watermark: Optional[datetime] = None
+
+    async def load(self, collection) -> int:
+        """(Re)build the filter from the whole collection; sized for growth."""
+        total = await collection.estimated_document_count()
+        capacity = max(self.capacity, total * 2)
+        bloom = BloomFilter(capacity, self.error_rate)
+        watermark = None
+        cursor = collection.find({}, projection={"updated_at": 1}).batch_size(LOAD_BATCH_SIZE)
+        async for doc in cursor:
+            bloom.add(doc["_id"])
+            if doc.get("updated_at") and (watermark is None or doc["updated_at"] > watermark):
+                watermark = doc["updated_at"]
+        self.bloom, self.watermark, self.capacity = bloom, watermark or datetime.utcnow(), capacity
+        logger.info("Suppression filter loaded: %s entries (%s KiB)", bloom.count, len(bloom.bits) // 1024)
+        return bloom.count
+
+    async def refresh(self, collection) -> int:
+        """Add entries changed since the last load/refresh; reloads when never loaded or saturated."""
+        if self.bloom is None or self.bloom.saturated:
+            return await self.load(collection)
+        added = 0
+        cursor = collection.find(
+            {"updated_at": {"$gte": self.watermark - REFRESH_OVERLAP}},
+            projection={"updated_at": 1},
+        )
+        async for doc in cursor:
+            self.bloom.add(doc["_id"])
+            if doc["updated_at"] > self.watermark:
+                self.watermark = doc["updated_at"]
+            added += 1
+        return added
+
+    async def partition(
+        self, collection, messages: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Split send messages into (to send, suppressed emails)."""
+        await self.refresh(collection)
+        candidates = {normalize_email(m.get("email") or "") for m in messages}
+        candidates = [e for e in candidates if e and e in self.bloom]
+        if not candidates:
+            return messages, []
+
+        suppressed = set()
+        for start in range(0, len(candidates), CONFIRM_BATCH_SIZE):
+            chunk = candidates[start:start + CONFIRM_BATCH_SIZE]
+            async for doc in collection.find({"_id": {"$in": chunk}}, projection={"_id": 1}):
+                suppressed.add(doc["_id"])
+        logger.debug("Suppression filter: %s positives, %s confirmed", len(candidates), len(suppressed))
+        if not suppressed:
+            return messages, []
+        kept = [m for m in messages if normalize_email(m.get("email") or "") not in suppressed]
+        return kept, sorted(suppressed)
+
+
+# one filter per process
+suppression_filter = SuppressionFilter()
@@ -0,0 +1,129 @@
+# app/services/timeseries_service.py
+"""Per-campaign engagement counters bucketed by time at ingest.
+
+One document per campaign and hour holds per-minute counters (`m.<minute>.<type>`)
+and hourly totals (`total.<type>`). A timeline for any campaign size is then a
+range read over at most one document per hour, with minute and day views derived
+from the same documents.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+TIMESERIES_COLLECTION = "campaign_timeseries"
+
+# event type -> series name in the API response
+SERIES_EVENTS = {
+    "open": "opens",
+    "click": "clicks",
+    "bounce": "bounces",
+    "delivered": "deliveries",
+}
+GRANULARITIES = ("minute", "hour", "day")
+
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _naive_utc(ts: Optional[datetime]) -> Optional[datetime]:
+    # stored hours are naive UTC; query-string bounds may carry an offset
+    if ts is not None and ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _empty_point(bucket: datetime) -> Dict[str, Any]:
+    point: Dict[str, Any] = {"bucket": bucket.isoformat()}
+    for name in SERIES_EVENTS.values():
+        point[name] = 0
+    return point
+
+
+class TimeseriesService:
+    def __init__(self, collection):
+        self.series_coll = collection
+
+    # -------------------------
+    # Ingest
+    # -------------------------
+
+    def op_for(self, campaign_id: str, event_type: str, ts: datetime) -> UpdateOne:
+        hour = _hour(ts)
+        return UpdateOne(
+            {"_id": f"{campaign_id}:{hour.isoformat()}"},
+            {
+                "$inc": {f"m.{ts.minute}.{event_type}": 1, f"total.{event_type}": 1},
+                "$setOnInsert": {"campaign_id": campaign_id, "hour": hour},
+            },
+            upsert=True,
+        )
+
+    async def record_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Count events ({campaign_id, type, timestamp}) into their hour documents.
+        Event types without a series are ignored."""
+        ops = [
+            self.op_for(str(e["campaign_id"]), e["type"], e["timestamp"])
+            for e in events
+            if e.get("type") in SERIES_EVENTS and e.get("campaign_id") and e.get("timestamp")
+        ]
+        if not ops:
+            return 0
+        await self.series_coll.bulk_write(ops, ordered=False)
+        return len(ops)
+
+    async def record(self, campaign_id: str, event_type: str, timestamp: datetime) -> int:
+        return await self.record_many([{"campaign_id": campaign_id, "type": event_type, "timestamp": timestamp}])
+
+    # -------------------------
+    # Reads
+    # -------------------------
+
+    async def series(
+        self,
+        campaign_id: str,
+        granularity: str = "hour",
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Opens/clicks/bounces/deliveries per minute, hour or day, oldest first.
+        Buckets without any event are omitted."""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        start, end = _naive_utc(start), _naive_utc(end)
+
+        query: Dict[str, Any] = {"campaign_id": campaign_id}
+        if start or end:
+            query["hour"] = {}
+            if start:
+                query["hour"]["$gte"] = _hour(start)
+            if end:
+                query["hour"]["$lte"] = end
+        # minute counters are only needed for the minute view
+        projection = {"hour": 1, "total": 1}
+        if granularity == "minute":
+            projection["m"] = 1
+
+        points: Dict[datetime, Dict[str, Any]] = {}
+        async for doc in self.series_coll.find(query, projection=projection).sort("hour", 1):
+            hour: datetime = doc["hour"]
+            if granularity == "minute":
+                for minute, counts in (doc.get("m") or {}).items():
+                    bucket = hour + timedelta(minutes=int(minute))
+                    if (start and bucket < start) or (end and bucket > end):
+                        continue
+                    self._add(points, bucket, counts)
+            else:
+                bucket = hour if granularity == "hour" else hour.replace(hour=0)
+                self._add(points, bucket, doc.get("total") or {})
+
+        return [points[b] for b in sorted(points)]
+
+    @staticmethod
+    def _add(points: Dict[datetime, Dict[str, Any]], bucket: datetime, counts: Dict[str, int]) -> None:
+        point = points.get(bucket)
+        if point is None:
+            point = points[bucket] = _empty_point(bucket)
+        for event_type, name in SERIES_EVENTS.items():
+            point[name] += int(counts.get(event_type, 0) or 0)
@@ -0,0 +1,155 @@
+# app/services/unique_counter_service.py
+"""Unique open/click counting backed by mergeable HyperLogLog sketches.
+
+One sketch document per (campaign, metric, granularity, bucket) where granularity
+is the whole campaign ("all"), an hour or a day. Registers are updated at ingest
+with `$max`, so sketches stay constant-size and can be merged across buckets and
+campaigns. Each sketch also keeps an exact set of hashed members until it holds
+`exact_limit` of them, so small campaigns get exact numbers.
+"""
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.utils.hyperloglog import HyperLogLog, register_for
+
+logger = logging.getLogger(__name__)
+
+SKETCH_COLLECTION = "unique_sketches"
+METRICS = ("open", "click")
+GRANULARITIES = ("all", "hour", "day")
+DEFAULT_EXACT_LIMIT = 1000
+
+
+def bucket_start(ts: datetime, granularity: str) -> Optional[datetime]:
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return None
+
+
+def _sketch_id(campaign_id: str, metric: str, granularity: str, bucket: Optional[datetime]) -> str:
+    return f"{campaign_id}:{metric}:{granularity}:{bucket.isoformat() if bucket else '*'}"
+
+
+def _member_key(member: str) -> str:
+    return hashlib.blake2b(member.encode(), digest_size=8).hexdigest()
+
+
+class UniqueCounterService:
+    def __init__(self, collection, exact_limit: int = DEFAULT_EXACT_LIMIT):
+        self.sketches = collection
+        self.exact_limit = exact_limit
+
+    # -------------------------
+    # Ingest
+    # -------------------------
+
+    def ops_for(self, campaign_id: str, metric: str, member: str, ts: datetime) -> List[UpdateOne]:
+        member = member.strip().lower()
+        index, rank = register_for(member)
+        key = _member_key(member)
+
+        ops: List[UpdateOne] = []
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(ts, granularity)
+            sketch_id = _sketch_id(campaign_id, metric, granularity, bucket)
+            ops.append(UpdateOne(
+                {"_id": sketch_id},
+                {
+                    "$max": {f"r.{index}": rank},
+                    "$setOnInsert": {
+                        "campaign_id": campaign_id,
+                        "metric": metric,
+                        "granularity": granularity,
+                        "bucket": bucket,
+                    },
+                },
+                upsert=True,
+            ))
+            # exact member set only grows while it has fewer than exact_limit entries
+            ops.append(UpdateOne(
+                {"_id": sketch_id, f"exact.{self.exact_limit - 1}": {"$exists": False}},
+                {"$addToSet": {"exact": key}},
+            ))
+        return ops
+
+    async def record_many(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Fold open/click events ({campaign_id, type, email, timestamp}) into their sketches."""
+        ops: List[UpdateOne] = []
+        for event in events:
+            metric = event.get("type")
+            if metric not in METRICS or not event.get("email") or not event.get("campaign_id"):
+                continue
+            ops.extend(self.ops_for(str(event["campaign_id"]), metric, event["email"], event["timestamp"]))
+
+        if not ops:
+            return 0
+        # ordered: each exact-set update must run after the upsert that creates its sketch
+        await self.sketches.bulk_write(ops, ordered=True)
+        return len(ops)
+
+    # -------------------------
+    # Reads
+    # -------------------------
+
+    def _merge(self, docs: List[Dict[str, Any]]) -> Tuple[int, str]:
+        """Union of several sketches -> (unique count, "exact" | "approx")."""
+        if not docs:
+            return 0, "exact"
+
+        # every set still below the limit means each holds all of its members
+        if all(len(d.get("exact") or []) < self.exact_limit for d in docs):
+            members = set()
+            for d in docs:
+                members.update(d.get("exact") or [])
+            return len(members), "exact"
+
+        hll = HyperLogLog()
+        for d in docs:
+            hll.merge(HyperLogLog.from_sparse(d.get("r")))
+        return hll.count(), "approx"
+
+    async def count(self, campaign_ids: List[str], metric: str) -> Dict[str, Any]:
+        """Unique members across one or more whole campaigns."""
+        cursor = self.sketches.find({
+            "_id": {"$in": [_sketch_id(str(c), metric, "all", None) for c in campaign_ids]}
+        })
+        docs = await cursor.to_list(length=None)
+        unique, mode = self._merge(docs)
+        return {"metric": metric, "unique": unique, "mode": mode}
+
+    async def series(
+        self,
+        campaign_ids: List[str],
+        metric: str,
+        granularity: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """Unique members per hour/day bucket, merged across the given campaigns."""
+        query: Dict[str, Any] = {
+            "campaign_id": {"$in": [str(c) for c in campaign_ids]},
+            "metric": metric,
+            "granularity": granularity,
+        }
+        if start or end:
+            query["bucket"] = {}
+            if start:
+                query["bucket"]["$gte"] = bucket_start(start, granularity)
+            if end:
+                query["bucket"]["$lte"] = end
+
+        by_bucket: Dict[datetime, List[Dict[str, Any]]] = {}
+        async for doc in self.sketches.find(query).sort("bucket", 1):
+            by_bucket.setdefault(doc["bucket"], []).append(doc)
+
+        out = []
+        for bucket in sorted(by_bucket):
+            unique, mode = self._merge(by_bucket[bucket])
+            out.append({"bucket": bucket.isoformat(), "unique": unique, "mode": mode})
+        return out
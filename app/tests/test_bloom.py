@@ -0,0 +1,25 @@
+from app.utils.bloom import BloomFilter
+
+
+def test_no_false_negatives():
+    bloom = BloomFilter(capacity=10000, error_rate=0.01)
+    emails = [f"user{i}@example.com" for i in range(10000)]
+    bloom.update(emails)
+    assert all(e in bloom for e in emails)
+
+
+def test_false_positive_rate_near_target():
+    bloom = BloomFilter(capacity=20000, error_rate=0.01)
+    bloom.update(f"in{i}@example.com" for i in range(20000))
+    probes = 20000
+    false_positives = sum(f"out{i}@example.com" in bloom for i in range(probes))
+    assert false_positives / probes < 0.02
+
+
+def test_saturation():
+    bloom = BloomFilter(capacity=2)
+    bloom.update(["a", "b", "a"])
+    assert bloom.count == 2
+    assert not bloom.saturated
+    bloom.add("c")
+    assert bloom.saturated
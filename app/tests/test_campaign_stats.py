@@ -0,0 +1,158 @@
+# app/tests/test_campaign_stats.py
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services import campaign_stats_service
+from app.services.campaign_stats_service import CampaignStatsService
+from app.services.event_store import log_counter_update
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+OID_CAMPAIGN = str(ObjectId())
+
+
+def _db():
+    return mongomock_motor.AsyncMongoMockClient()["mailmate_test"]
+
+
+def _log(campaign_id, email, **fields):
+    doc = {
+        "campaign_id": campaign_id,
+        "email": email,
+        "status": "sent",
+        "sendgrid_status": 202,
+        "attempts": 1,
+        "send_latency_ms": 120,
+        "open_count": 0,
+        "click_count": 0,
+        "created_at": datetime(2026, 1, 1),
+    }
+    doc.update(fields)
+    return doc
+
+
+async def _seed(db):
+    await db.email_logs.insert_many([
+        _log("c1", "a@example.com", open_count=2),
+        _log("c1", "b@example.com", status="failed", sendgrid_status=None, attempts=3, send_latency_ms=20),
+        _log("c2", "a@example.com", click_count=1),
+        # webhook-created rows may carry the campaign id as an ObjectId
+        _log(ObjectId(OID_CAMPAIGN), "c@example.com", open_count=1),
+    ])
+
+
+async def _rollups(db):
+    return {d["_id"]: d async for d in db.campaign_stats.find({}, projection={"updated_at": 0, "rebuilt_at": 0})}
+
+
+def test_batched_rebuild_matches_single_batch(monkeypatch):
+    async def run(batch_size):
+        db = _db()
+        await _seed(db)
+        monkeypatch.setattr(campaign_stats_service, "REBUILD_BATCH_SIZE", batch_size)
+        rebuilt = await CampaignStatsService(db.campaign_stats, db.email_logs).rebuild()
+        return rebuilt, await _rollups(db)
+
+    rebuilt_one, one_per_batch = asyncio.run(run(1))
+    rebuilt_all, single_batch = asyncio.run(run(1000))
+    assert rebuilt_one == rebuilt_all == 3
+    assert one_per_batch == single_batch
+    assert single_batch["c1"]["total"] == 2
+    assert single_batch["c1"]["status_counts"] == {"sent": 1, "failed": 1}
+    assert single_batch[OID_CAMPAIGN]["unique_opens"] == 1
+
+
+def test_rebuild_of_campaign_without_logs_writes_empty_rollup():
+    async def run():
+        db = _db()
+        await CampaignStatsService(db.campaign_stats, db.email_logs).rebuild(["nothing-sent"])
+        return await _rollups(db)
+
+    rollups = asyncio.run(run())
+    assert rollups["nothing-sent"]["total"] == 0
+
+
+# ---- incremental path vs rebuild ----
+
+COUNTERS = campaign_stats_service.COUNTER_FIELDS + ("status_counts", "attempts_hist", "latency_hist")
+
+
+async def _webhook_event(db, stats, log_id, event_type, ts, status=None):
+    # what the SendGrid webhook does: update the log, then feed the pre-update document to the rollup
+    update = {"$set": {"updated_at": ts}}
+    if event_type in ("open", "click"):
+        update.update(log_counter_update(event_type, ts))
+    if status:
+        update["$set"]["status"] = status
+    if event_type == "bounce":
+        update["$set"]["bounced_at"] = ts
+    before = await db.email_logs.find_one_and_update({"_id": log_id}, update)
+    await stats.record_event("c1", event_type, before, new_status=status)
+
+
+def _counters(rollup):
+    # increments leave untouched counters unset and emptied histogram keys at 0
+    out = {}
+    for field in COUNTERS:
+        value = rollup.get(field)
+        out[field] = {k: v for k, v in value.items() if v} if isinstance(value, dict) else value or 0
+    return out
+
+
+def test_incremental_rollup_matches_rebuild():
+    from app.services.event_buffer import TrackingBuffer
+
+    async def run():
+        db = _db()
+        stats = CampaignStatsService(db.campaign_stats, db.email_logs)
+        ts = datetime(2026, 1, 1, 12)
+        ids = []
+        for i, fields in enumerate([
+            {},
+            {"attempts": 2, "send_latency_ms": 700},
+            {"status": "failed", "sendgrid_status": 500, "attempts": 3, "send_latency_ms": 40},
+        ]):
+            log = _log("c1", f"r{i}@example.com", contact_id=f"k{i}", **fields)
+            ids.append((await db.email_logs.insert_one(log)).inserted_id)
+            await stats.record_send(log)
+
+        buffer = TrackingBuffer(db)
+        # pixel opens (twice on r0), then a webhook open on r0 must not be unique again
+        buffer.add_open({"campaign_id": "c1", "contact_id": "k0"}, ts)
+        buffer.add_open({"campaign_id": "c1", "contact_id": "k0"}, ts)
+        buffer.add_click({"campaign_id": "c1", "contact_id": "k1"}, ts, "c1", 0, "https://example.com")
+        await buffer.flush()
+        await _webhook_event(db, stats, ids[0], "open", ts)
+        await _webhook_event(db, stats, ids[1], "open", ts)
+        await _webhook_event(db, stats, ids[1], "click", ts)
+        await _webhook_event(db, stats, ids[0], "delivered", ts, status="delivered")
+        await _webhook_event(db, stats, ids[2], "bounce", ts, status="bounced")
+
+        incremental = (await _rollups(db))["c1"]
+        await stats.rebuild(["c1"])
+        rebuilt = (await _rollups(db))["c1"]
+        return incremental, rebuilt
+
+    incremental, rebuilt = asyncio.run(run())
+    assert _counters(incremental) == _counters(rebuilt)
+    assert rebuilt["opens"] == 4 and rebuilt["unique_opens"] == 2
+    assert rebuilt["clicks"] == 2 and rebuilt["unique_clicks"] == 1
+
+
+def test_ensure_campaign_stats_replaces_partial_rollups_once():
+    async def run():
+        db = _db()
+        await _seed(db)
+        # an event applied before the first rebuild leaves a partial rollup behind
+        await CampaignStatsService(db.campaign_stats).record_event("c1", "open", {"open_count": 0})
+        first = await campaign_stats_service.ensure_campaign_stats(db)
+        second = await campaign_stats_service.ensure_campaign_stats(db)
+        return first, second, await _rollups(db)
+
+    first, second, rollups = asyncio.run(run())
+    assert (first, second) == (True, False)
+    assert rollups["c1"]["total"] == 2
+    assert rollups["c1"]["opens"] == 2
@@ -0,0 +1,51 @@
+# app/tests/test_export.py
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.utils.export import csv_chunks, gzip_chunks, ndjson_chunks
+
+OID = ObjectId()
+DOCS = [
+    {"_id": OID, "email": "a@example.com", "open_count": 2, "created_at": datetime(2026, 1, 1, 9), "clicks": {"0": 1}},
+    {"_id": ObjectId(), "email": "b@example.com", "open_count": None, "created_at": datetime(2026, 1, 2)},
+    {"_id": ObjectId(), "email": "c,\"quoted\"@example.com", "open_count": 0},
+]
+FIELDS = ["_id", "email", "open_count", "created_at", "clicks"]
+
+
+async def _docs():
+    for doc in DOCS:
+        yield doc
+
+
+async def _collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+def test_csv_chunks_bound_rows_per_chunk_and_serialize_values():
+    chunks = asyncio.run(_collect(csv_chunks(_docs(), FIELDS, rows_per_chunk=2)))
+    assert len(chunks) == 2
+    rows = list(csv.reader(io.StringIO(b"".join(chunks).decode())))
+    assert rows[0] == FIELDS
+    assert rows[1] == [str(OID), "a@example.com", "2", "2026-01-01T09:00:00", '{"0":1}']
+    assert rows[2][2:4] == ["", "2026-01-02T00:00:00"]
+    assert rows[3][1] == 'c,"quoted"@example.com'
+
+
+def test_ndjson_chunks_one_object_per_line():
+    chunks = asyncio.run(_collect(ndjson_chunks(_docs(), ["_id", "email", "created_at"], rows_per_chunk=1)))
+    assert len(chunks) == 3
+    first = json.loads(chunks[0])
+    assert first == {"_id": str(OID), "email": "a@example.com", "created_at": "2026-01-01T09:00:00"}
+
+
+def test_gzip_chunks_round_trip():
+    plain = b"".join(asyncio.run(_collect(csv_chunks(_docs(), FIELDS, rows_per_chunk=1))))
+    compressed = b"".join(asyncio.run(_collect(gzip_chunks(csv_chunks(_docs(), FIELDS, rows_per_chunk=1)))))
+    assert gzip.decompress(compressed) == plain
@@ -0,0 +1,28 @@
+# app/tests/test_hyperloglog.py
+from app.utils.hyperloglog import HyperLogLog
+
+
+def _sketch(values):
+    hll = HyperLogLog()
+    hll.update(values)
+    return hll
+
+
+def test_estimate_within_error_bound():
+    n = 50000
+    hll = _sketch(f"user{i}@example.com" for i in range(n))
+    assert abs(hll.count() - n) / n < 0.05
+
+
+def test_small_cardinality_uses_linear_counting():
+    hll = _sketch(["a@example.com", "b@example.com", "a@example.com"])
+    assert hll.count() == 2
+
+
+def test_merge_matches_union_and_sparse_roundtrip():
+    left = _sketch(f"u{i}" for i in range(0, 6000))
+    right = _sketch(f"u{i}" for i in range(3000, 9000))
+    union = _sketch(f"u{i}" for i in range(0, 9000))
+
+    merged = HyperLogLog.from_sparse(left.to_sparse()).merge(right)
+    assert merged.registers == union.registers
@@ -0,0 +1,51 @@
+# app/tests/test_pagination.py
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.utils.pagination import decode_cursor, encode_cursor, keyset_filter, next_cursor
+
+
+def test_cursor_round_trip():
+    created_at, oid = datetime(2026, 1, 1, 12, 30, 15, 123000), ObjectId()
+    assert decode_cursor(encode_cursor(created_at, oid)) == (created_at, oid)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "eyJ0IjoieCJ9"])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        keyset_filter(cursor)
+
+
+def test_next_cursor_only_for_full_pages():
+    docs = [{"_id": ObjectId(), "created_at": datetime(2026, 1, 1)} for _ in range(3)]
+    assert next_cursor(docs, 4) is None
+    assert decode_cursor(next_cursor(docs, 3)) == (docs[-1]["created_at"], docs[-1]["_id"])
+
+
+def test_log_pages_neither_skip_nor_repeat_rows_with_equal_timestamps():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    from app.services.analytics_service import AnalyticsService
+
+    async def run():
+        email_logs = mongomock_motor.AsyncMongoMockClient()["mailmate_test"].email_logs
+        # 25 rows sharing 3 timestamps, plus another campaign's rows
+        await email_logs.insert_many(
+            [{"campaign_id": "c1", "email": f"r{i}@example.com", "created_at": datetime(2026, 1, 1, i % 3)} for i in range(25)]
+            + [{"campaign_id": "c2", "email": "other@example.com", "created_at": datetime(2026, 1, 1)}]
+        )
+        service = AnalyticsService(email_logs_collection=email_logs)
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = await service.get_logs("c1", limit=7, cursor=cursor)
+            seen.extend(row["email"] for row in page["items"])
+            pages += 1
+            cursor = page["next_cursor"]
+            if not cursor:
+                return seen, pages
+
+    seen, pages = asyncio.run(run())
+    assert sorted(seen) == sorted(f"r{i}@example.com" for i in range(25))
+    assert pages == 4
@@ -0,0 +1,47 @@
+# app/tests/test_send_time.py
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.services.send_time_service import preferred_hours, wave_run_at
+
+IST = timezone(timedelta(hours=5, minutes=30))
+PST = timezone(timedelta(hours=-8))
+
+
+def test_no_preference_or_current_hour_goes_at_send_at():
+    send_at = datetime(2026, 10, 19, 10, 15)
+    assert wave_run_at(send_at, None) == send_at
+    assert wave_run_at(send_at, 10) == send_at
+
+
+def test_naive_send_at_is_utc():
+    send_at = datetime(2026, 10, 19, 10, 15)
+    assert wave_run_at(send_at, 14) == datetime(2026, 10, 19, 14, 0)
+    assert wave_run_at(send_at, 9) == datetime(2026, 10, 20, 9, 0)
+
+
+def test_fractional_offset_uses_utc_hour():
+    # 10:00 IST is 04:30 UTC: the 09:00 UTC wave is later the same day, on the hour
+    run_at = wave_run_at(datetime(2026, 10, 19, 10, 0, tzinfo=IST), 9)
+    assert run_at == datetime(2026, 10, 19, 9, 0, tzinfo=timezone.utc)
+    assert run_at.astimezone(timezone.utc).minute == 0
+
+
+def test_preferred_hour_equal_to_utc_hour_of_offset_send_at():
+    send_at = datetime(2026, 10, 19, 10, 0, tzinfo=IST)  # 04:30 UTC
+    assert wave_run_at(send_at, 4) == send_at
+    # the local hour is not the preference
+    assert wave_run_at(send_at, 10) == datetime(2026, 10, 19, 10, 0, tzinfo=timezone.utc)
+
+
+def test_negative_offset_wraps_to_next_utc_day():
+    send_at = datetime(2026, 10, 19, 20, 0, tzinfo=PST)  # 04:00 UTC on the 20th
+    assert wave_run_at(send_at, 3) == datetime(2026, 10, 21, 3, 0, tzinfo=timezone.utc)
+
+
+def test_preferred_hours_requires_min_opens():
+    contact_idx = np.array([0, 0, 0, 1])
+    open_hours = np.array([9, 9, 14, 9])
+    hours = preferred_hours(contact_idx, open_hours, np.ones(4), 2, np.array([3, 1]), min_opens=2)
+    assert hours.tolist() == [9, -1]
@@ -0,0 +1,31 @@
+from bson import ObjectId
+
+from app.utils.tracking_utils import (
+    TOKEN_CLICK,
+    TOKEN_OPEN,
+    TOKEN_UNSUBSCRIBE,
+    encode_dest,
+    make_token,
+    read_token,
+)
+
+CONTACT = str(ObjectId())
+CAMPAIGN = str(ObjectId())
+
+
+def test_roundtrip():
+    token = make_token(TOKEN_CLICK, CONTACT, CAMPAIGN, link_index=5, extra=encode_dest("https://example.com"))
+    decoded = read_token(token, TOKEN_CLICK, extra=encode_dest("https://example.com"))
+    assert decoded == (TOKEN_CLICK, CONTACT, CAMPAIGN, 5)
+    assert len(token) == 52
+
+
+def test_rejects_tampering_wrong_kind_and_swapped_destination():
+    token = make_token(TOKEN_UNSUBSCRIBE, CONTACT, CAMPAIGN)
+    flipped = token[:10] + ("A" if token[10] != "A" else "B") + token[11:]
+    assert read_token(flipped, TOKEN_UNSUBSCRIBE) is None
+    assert read_token(token, TOKEN_OPEN) is None
+    assert read_token("not-a-token", TOKEN_UNSUBSCRIBE) is None
+
+    click = make_token(TOKEN_CLICK, CONTACT, CAMPAIGN, 0, extra=encode_dest("https://example.com"))
+    assert read_token(click, TOKEN_CLICK, extra=encode_dest("https://evil.example")) is None
@@ -6,27 +6,39 @@ import os
 from datetime import datetime
 from urllib.parse import unquote
 
+from typing import Optional
+
 from fastapi import APIRouter, Request, Response, HTTPException
 from fastapi.responses import RedirectResponse
-import motor.motor_asyncio
+
+from app.config import settings
+from app.db.client import db
+from app.services.event_buffer import TrackingBuffer
+from app.utils.tracking_utils import TOKEN_CLICK, TOKEN_OPEN, decode_dest, read_token
 
 router = APIRouter()
 
-MONGO_URI = os.getenv("MONGO_URI")
-DB_NAME = os.getenv("DB_NAME", "mailmate_db")
 SECRET = os.getenv("TRACKING_SECRET", "replace_with_strong_random")
 BASE_URL = os.getenv("BACKEND_PUBLIC_URL", "http://localhost:8000")
 
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URI)
-db = client[DB_NAME]
-EMAIL_LOGS = db["email_logs"]
-EVENTS = db["events"]
+# hits are written behind by a per-process buffer (started/stopped in app.main)
+BUFFER = TrackingBuffer(
+    db,
+    max_pending=settings.TRACKING_BUFFER_MAX_PENDING,
+    batch_size=settings.TRACKING_BUFFER_BATCH_SIZE,
+    flush_interval_ms=settings.TRACKING_BUFFER_FLUSH_MS,
+)
 
 # 1x1 PNG
 PIXEL_B64 = (
     "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR4nGNgYAAAAAMAASsJTYQAAAAASUVORK5CYII="
 )
 PIXEL_BYTES = base64.b64decode(PIXEL_B64)
+PIXEL_HEADERS = {
+    "Cache-Control": "no-cache, no-store, must-revalidate, private, max-age=0",
+    "Pragma": "no-cache",
+    "Expires": "0"
+}
 
 
 def sign(data: str) -> str:
@@ -37,46 +49,48 @@ def verify_signature(data: str, sig: str) -> bool:
     return hmac.compare_digest(sign(data), sig)
 
 
-@router.get("/track/open/{tracking_id}.png")
-async def track_open(tracking_id: str, request: Request):
+def _log_filter(ref: str, kind: int, extra: str = "") -> Optional[dict]:
+    """email_logs filter for a tracking reference, or None if it is forged/unknown.
+
+    Signed tokens (app.utils.tracking_utils) name the log by (campaign_id, contact_id),
+    which the campaign_id_1_contact_id_1 index serves; nothing is read to verify them.
+    """
+    token = read_token(ref, kind, extra)
+    if token:
+        return {"campaign_id": token.campaign_id, "contact_id": token.contact_id}
+    if settings.TRACKING_ACCEPT_LEGACY_IDS and kind == TOKEN_OPEN and len(ref) == 32:
+        return {"tracking_id": ref}  # uuid tracking ids from older mail
+    return None
+
+
+@router.get("/track/open/{ref}.png")
+async def track_open(ref: str, request: Request):
     ip = request.client.host if request.client else "unknown"
     ua = request.headers.get("user-agent", "")[:1000]
     ts = datetime.utcnow()
 
-    # Write lightweight event (audit)
-    await EVENTS.insert_one({
-        "type": "open",
-        "tracking_id": tracking_id,
-        "ip": ip,
-        "ua": ua,
-        "timestamp": ts
-    })
-
-    # update aggregates in email_logs
-    unique_key = hashlib.sha256(f"{ip}-{ua}".encode()).hexdigest()
-    await EMAIL_LOGS.update_one(
-        {"tracking_id": tracking_id},
-        {
-            "$inc": {"open_count": 1},  # FIXED: opens_count -> open_count
-            "$set": {"last_opened_at": ts},
-            "$addToSet": {"unique_open_keys": unique_key},
-            "$push": {"open_events": ts}  # NEW: store event history
-        }
-    )
+    # the buffer updates the email_logs counters and the events store (which feeds the
+    # unique sketches) in batches; the pixel goes out without waiting for Mongo.
+    # Forged references still get the pixel, but are never queued.
+    log_filter = _log_filter(ref, TOKEN_OPEN)
+    if log_filter:
+        BUFFER.add_open(log_filter, ts, ip=ip, ua=ua)
 
-    headers = {
-        "Cache-Control": "no-cache, no-store, must-revalidate, private, max-age=0",
-        "Pragma": "no-cache",
-        "Expires": "0"
-    }
-    return Response(content=PIXEL_BYTES, media_type="image/png", headers=headers)
+    return Response(content=PIXEL_BYTES, media_type="image/png", headers=PIXEL_HEADERS)
 
 
-@router.get("/track/click/{click_id}")
-async def track_click(click_id: str, sig: str, d: str, request: Request):
+@router.get("/track/click/{ref}")
+async def track_click(ref: str, d: str, request: Request, sig: Optional[str] = None):
     """
-    click endpoint: /track/click/{click_id}?sig={sig}&d={base64url(dest)}
+    click endpoint: /track/click/{token}?d={base64url(dest)}
+    legacy:         /track/click/{click_id}?sig={sig}&d={base64url(dest)}
     """
+    if sig is None:
+        return await _track_token_click(ref, d, request)
+    if not settings.TRACKING_ACCEPT_LEGACY_IDS:
+        raise HTTPException(403, "Invalid signature")
+    click_id = ref
+
     try:
         dest_b64 = unquote(d)
         dest = base64.urlsafe_b64decode(dest_b64.encode()).decode()
@@ -91,26 +105,27 @@ async def track_click(click_id: str, sig: str, d: str, request: Request):
     ua = request.headers.get("user-agent", "")[:1000]
     ts = datetime.utcnow()
 
-    # log event
-    await EVENTS.insert_one({
-        "type": "click",
-        "click_id": click_id,
-        "dest": dest,
-        "ip": ip,
-        "ua": ua,
-        "timestamp": ts
-    })
-
-    # increment click counter on the email_logs doc that has this click_id in click_map
-    await EMAIL_LOGS.update_one(
-        {f"click_map.{click_id}": {"$exists": True}},
-        {
-            "$inc": {
-                f"clicks.{click_id}": 1,
-                "click_count": 1  # NEW: increment total click count
-            },
-            "$push": {"click_events": ts}  # NEW: store event history
-        }
-    )
+    # the buffer resolves the click id to its email_logs document through tracking_links
+    BUFFER.add_legacy_click(click_id, ts, dest, ip=ip, ua=ua)
+    return RedirectResponse(dest)
 
+
+async def _track_token_click(ref: str, dest_b64: str, request: Request):
+    # the MAC covers the destination: a forged token or swapped target fails here, before Mongo
+    token = read_token(ref, TOKEN_CLICK, extra=dest_b64)
+    if not token:
+        raise HTTPException(403, "Invalid signature")
+    try:
+        dest = decode_dest(dest_b64)
+    except Exception:
+        raise HTTPException(400, "Bad destination")
+
+    ip = request.client.host if request.client else "unknown"
+    ua = request.headers.get("user-agent", "")[:1000]
+    ts = datetime.utcnow()
+
+    BUFFER.add_click(
+        {"campaign_id": token.campaign_id, "contact_id": token.contact_id}, ts,
+        token.campaign_id, token.link_index, dest, ip=ip, ua=ua,
+    )
     return RedirectResponse(dest)
@@ -0,0 +1,60 @@
+# app/utils/bloom.py
+"""Minimal Bloom filter for set-membership pre-checks (e.g. the suppression list).
+
+No false negatives; false positives at roughly `error_rate` while at most
+`capacity` items have been added. Positions come from one 128-bit blake2b
+digest split into two 64-bit halves (Kirsch-Mitzenmacher double hashing).
+Items can't be removed: callers confirm positives against the source of truth,
+which also covers entries deleted there.
+"""
+import hashlib
+import math
+from typing import Iterable, Iterator
+
+_LN2 = math.log(2)
+
+
+def _hashes(value: str):
+    digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be > 0 and error_rate in (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-capacity * math.log(error_rate) / (_LN2 * _LN2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * _LN2))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0  # distinct items added (an item whose bits were all set already isn't counted)
+
+    def _positions(self, value: str) -> Iterator[int]:
+        h1, h2 = _hashes(value)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, value: str) -> bool:
+        """Add an item; returns False if it was (probably) present already."""
+        new = False
+        for pos in self._positions(value):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+    @property
+    def saturated(self) -> bool:
+        """More items than it was sized for: the false-positive rate is above `error_rate`."""
+        return self.count > self.capacity
@@ -0,0 +1,76 @@
+# app/utils/cache.py
+"""Small per-process async cache with TTL, single-flight loading and stale-while-revalidate.
+
+- Concurrent misses for the same key share one in-flight load.
+- Entries older than `ttl` but younger than `ttl + stale_ttl` are returned
+  immediately while a background load refreshes them.
+- A caller that stops waiting (e.g. `asyncio.wait_for` timeout) does not cancel
+  the shared load; the result still lands in the cache for the next caller.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncTTLCache:
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await loader()
+            self._store(key, value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        # marks the exception as retrieved so background refreshes don't warn on GC
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Cache load failed: %r", task.exception())
+
+    def _start_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader))
+            task.add_done_callback(self._log_failure)
+            self._inflight[key] = task
+        return task
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (fresh or stale) without loading."""
+        entry = self._entries.get(key)
+        return entry[1] if entry else None
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, value = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self._start_load(key, loader)
+                return value
+        return await asyncio.shield(self._start_load(key, loader))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
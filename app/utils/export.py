@@ -0,0 +1,83 @@
+# app/utils/export.py
+"""Row serializers for streaming exports.
+
+Each function turns an async iterator of Mongo documents into an async iterator
+of bytes chunks, holding at most `rows_per_chunk` rows in memory at a time.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Sequence
+
+from bson import ObjectId
+
+EXPORT_FORMATS = ("csv", "ndjson")
+DEFAULT_ROWS_PER_CHUNK = 1000
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default, separators=(",", ":"))
+    return value
+
+
+async def csv_chunks(
+    docs: AsyncIterator[Dict[str, Any]],
+    fields: Sequence[str],
+    rows_per_chunk: int = DEFAULT_ROWS_PER_CHUNK,
+) -> AsyncIterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(fields)
+    rows = 0
+    async for doc in docs:
+        writer.writerow([_csv_value(doc.get(f)) for f in fields])
+        rows += 1
+        if rows >= rows_per_chunk:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+            rows = 0
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+async def ndjson_chunks(
+    docs: AsyncIterator[Dict[str, Any]],
+    fields: Sequence[str],
+    rows_per_chunk: int = DEFAULT_ROWS_PER_CHUNK,
+) -> AsyncIterator[bytes]:
+    lines: List[str] = []
+    async for doc in docs:
+        lines.append(json.dumps({f: doc.get(f) for f in fields}, default=_json_default, separators=(",", ":")))
+        if len(lines) >= rows_per_chunk:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a byte stream incrementally (wbits=31 writes the gzip header/trailer)."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
@@ -0,0 +1,86 @@
+# app/utils/hyperloglog.py
+"""Minimal HyperLogLog used for approximate unique open/click counts.
+
+Registers can be kept sparsely as {index: rank}, which maps directly onto a
+Mongo subdocument updated with `$max` -- so sketches are built atomically at
+ingest time and merged later by taking the per-register maximum.
+"""
+import hashlib
+import math
+from typing import Dict, Iterable, Mapping, Tuple
+
+# 2**11 registers -> ~2.3% standard error
+PRECISION = 11
+NUM_REGISTERS = 1 << PRECISION
+_HASH_BITS = 64
+_REMAINING_BITS = _HASH_BITS - PRECISION
+
+
+def hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+def register_for(value: str) -> Tuple[int, int]:
+    """Return (register index, rank) for a value."""
+    h = hash64(value)
+    index = h >> _REMAINING_BITS
+    rest = h & ((1 << _REMAINING_BITS) - 1)
+    rank = _REMAINING_BITS - rest.bit_length() + 1
+    return index, rank
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    def __init__(self):
+        self.registers = bytearray(NUM_REGISTERS)
+
+    @classmethod
+    def from_sparse(cls, registers: Mapping) -> "HyperLogLog":
+        """Build from a {index: rank} mapping (keys may be strings, as stored in Mongo)."""
+        hll = cls()
+        for idx, rank in (registers or {}).items():
+            i = int(idx)
+            hll.registers[i] = max(hll.registers[i], int(rank))
+        return hll
+
+    def add(self, value: str) -> None:
+        index, rank = register_for(value)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]) -> None:
+        for v in values:
+            self.add(v)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        regs = self.registers
+        for i, rank in enumerate(other.registers):
+            if rank > regs[i]:
+                regs[i] = rank
+        return self
+
+    def to_sparse(self) -> Dict[str, int]:
+        return {str(i): r for i, r in enumerate(self.registers) if r}
+
+    def count(self) -> int:
+        m = NUM_REGISTERS
+        inverse_sum = 0.0
+        zeros = 0
+        for rank in self.registers:
+            inverse_sum += 2.0 ** -rank
+            if rank == 0:
+                zeros += 1
+        estimate = _alpha(m) * m * m / inverse_sum
+        # small-range correction (linear counting)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
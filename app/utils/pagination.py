@@ -0,0 +1,52 @@
+# app/utils/pagination.py
+"""Opaque keyset cursors over (created_at, _id), newest first.
+
+Sorting on created_at alone skips/duplicates rows that share a timestamp;
+adding _id as a tie-breaker gives a total order, and filtering on the last
+seen pair makes page N cost the same as page 1 when backed by an index
+ending in (created_at, _id).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+from bson import ObjectId
+
+KEYSET_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(created_at: datetime, oid: Any) -> str:
+    raw = json.dumps({"t": created_at.isoformat(), "id": str(oid)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Raises ValueError for malformed or tampered cursors."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data["t"]), ObjectId(data["id"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_filter(cursor: str) -> Dict[str, Any]:
+    """Filter selecting rows strictly after `cursor` in KEYSET_SORT order."""
+    created_at, oid = decode_cursor(cursor)
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": oid}},
+        ]
+    }
+
+
+def next_cursor(items, limit: int):
+    """Cursor for the page after `items`, or None when this was the last page."""
+    if len(items) < limit:
+        return None
+    last = items[-1]
+    if not isinstance(last.get("created_at"), datetime):
+        return None
+    return encode_cursor(last["created_at"], last["_id"])
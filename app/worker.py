@@ -31,7 +31,7 @@ print("-------------------------------------------------------")
 celery_app = Celery(
     "mailmate",
     broker_connection_retry_on_startup=True,
-    include=["app.campaigns.tasks"] 
+    include=["app.campaigns.tasks", "app.contacts.tasks"]
 )
 
 celery_app.conf.update(
@@ -43,5 +43,71 @@ celery_app.conf.update(
     worker_concurrency=1,
 )
 
-# 4. Final Verification
+# 4. Apply the index registry once the worker is up (workers may start before the API)
+from celery.signals import worker_init, worker_ready
+
+
+def _run_with_db(coro_fn):
+    # short-lived client on a private loop; closed again before the pool forks
+    import asyncio
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from app.utils.config import settings
+
+    async def _run():
+        client = AsyncIOMotorClient(settings.MONGO_URI)
+        try:
+            return await coro_fn(client.get_default_database())
+        finally:
+            client.close()
+
+    return asyncio.run(_run())
+
+
+@worker_ready.connect
+def apply_index_registry(**kwargs):
+    from app.db.indexes import ensure_indexes
+
+    try:
+        print(f"🗂️ Index registry: {_run_with_db(ensure_indexes)}")
+    except Exception as e:
+        print(f"⚠️ Could not apply index registry: {e}")
+
+
+@worker_ready.connect
+def prepare_contact_segments(**kwargs):
+    # backfill `segments` on older contacts before campaigns are sent by segment
+    from app.contacts.segment_counts import ensure_segment_counts
+
+    try:
+        ran = _run_with_db(lambda db: ensure_segment_counts(db.get_collection("contacts")))
+        print(f"🏷️ Contact segments {'backfilled' if ran else 'up to date'}")
+    except Exception as e:
+        print(f"⚠️ Could not prepare contact segments: {e}")
+
+
+@worker_ready.connect
+def prepare_campaign_stats(**kwargs):
+    # sends $inc the rollups; they must hold the pre-upgrade history first
+    from app.services.campaign_stats_service import ensure_campaign_stats
+
+    try:
+        ran = _run_with_db(ensure_campaign_stats)
+        print(f"📊 Campaign stats {'rebuilt' if ran else 'up to date'}")
+    except Exception as e:
+        print(f"⚠️ Could not prepare campaign stats: {e}")
+
+
+# 5. Load the suppression Bloom filter before the pool starts, so every pool process
+#    inherits it (each then only fetches entries changed since, before every send)
+@worker_init.connect
+def load_suppression_filter(**kwargs):
+    from app.services.suppression_service import SUPPRESSIONS_COLLECTION, suppression_filter
+
+    try:
+        loaded = _run_with_db(lambda db: suppression_filter.load(db.get_collection(SUPPRESSIONS_COLLECTION)))
+        print(f"🚫 Suppression filter loaded: {loaded} addresses")
+    except Exception as e:
+        print(f"⚠️ Could not load suppression filter: {e}")
+
+# 6. Final Verification
 print(f"🔒 FINAL CONFIRMED BROKER: {celery_app.conf.broker_url}")
\ No newline at end of file
@@ -0,0 +1,43 @@
+"""
+Compare the index registry (app/db/indexes.py) with the database.
+
+Usage:
+    python -m scripts.index_report           # report missing / unregistered / unused indexes
+    python -m scripts.index_report --apply   # (re)apply the registry first, ignoring the stored version
+"""
+import os
+import sys
+import asyncio
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.db.indexes import INDEX_VERSION, ensure_indexes, index_report
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+async def report(apply: bool):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    try:
+        if apply:
+            result = await ensure_indexes(db, force=True)
+            for conflict in result["conflicts"]:
+                print(f"❌ {conflict['collection']}.{conflict['index']}: {conflict['error']}")
+        print(f"Index registry v{INDEX_VERSION}")
+        for collection, info in (await index_report(db)).items():
+            print(f"- {collection}")
+            for name in info["missing"]:
+                print(f"    missing:      {name}")
+            for name in info["unregistered"]:
+                print(f"    unregistered: {name}")
+            for stat in info["unused"]:
+                print(f"    unused:       {stat['name']} (no ops since {stat['since']})")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(report("--apply" in sys.argv[1:]))
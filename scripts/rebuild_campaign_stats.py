@@ -0,0 +1,33 @@
+"""
+Recompute campaign_stats rollups from email_logs.
+
+Usage:
+    python -m scripts.rebuild_campaign_stats              # every campaign with logs
+    python -m scripts.rebuild_campaign_stats <id> [<id>]  # specific campaigns
+"""
+import os
+import sys
+import asyncio
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.campaign_stats_service import CampaignStatsService, STATS_COLLECTION
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+async def rebuild(campaign_ids):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    service = CampaignStatsService(db.get_collection(STATS_COLLECTION), db.get_collection("email_logs"))
+    try:
+        count = await service.rebuild(campaign_ids or None)
+        print(f"✅ Rebuilt campaign_stats for {count} campaign(s)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild(sys.argv[1:]))
@@ -0,0 +1,31 @@
+"""
+Recompute contact engagement scores from email_logs.
+
+Usage:
+    python -m scripts.score_engagement [half_life_days]
+"""
+import os
+import sys
+import asyncio
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.services.engagement_service import EngagementScorer, DEFAULT_HALF_LIFE_DAYS
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/mailmate")
+
+
+async def score(half_life_days):
+    client = AsyncIOMotorClient(MONGO_URI)
+    db = client.get_default_database()
+    try:
+        result = await EngagementScorer(db, half_life_days=half_life_days).run()
+        print(f"✅ Scored {result['contacts']} contacts from {result['sends']} sends ({result['updated']} updated)")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(score(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_HALF_LIFE_DAYS))
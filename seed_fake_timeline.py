@@ -6,6 +6,8 @@ from bson import ObjectId
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 
+from app.services.event_store import EventStore
+
 # Load environment variables
 load_dotenv()
 
@@ -18,6 +20,7 @@ async def seed_timeline():
     db = client[DB_NAME]
     email_logs = db["email_logs"]
     campaigns = db["campaigns"]
+    event_store = EventStore(db)
 
     print("--- Seed Fake Timeline ---")
     
@@ -74,27 +77,24 @@ async def seed_timeline():
             "subject": "Fake Timeline Test",
             "created_at": event_time,
             "updated_at": event_time,
-            "open_count": 0,
+            "open_count": 1,
             "click_count": 0,
-            "open_events": [],
-            "click_events": []
+            "first_opened_at": event_time,
+            "last_opened_at": event_time,
         }
+        # A click usually implies an open too, so every fake recipient opens
+        events = [{"campaign_id": campaign_id, "email": log_entry["email"], "type": "open", "timestamp": event_time}]
+        new_opens += 1
 
-        if event_type == "open":
-            log_entry["open_count"] = 1
-            log_entry["open_events"] = [event_time] # Storing as datetime object (pymongo handles it)
-            new_opens += 1
-        else:
-            # A click usually implies an open too, but let's just do click for specific testing
+        if event_type == "click":
             log_entry["click_count"] = 1
-            log_entry["click_events"] = [event_time]
-            # Let's add an open too so it looks realistic
-            log_entry["open_count"] = 1
-            log_entry["open_events"] = [event_time]
+            log_entry["first_clicked_at"] = event_time
+            log_entry["last_clicked_at"] = event_time
+            events.append({"campaign_id": campaign_id, "email": log_entry["email"], "type": "click", "timestamp": event_time})
             new_clicks += 1
-            new_opens += 1
 
         await email_logs.insert_one(log_entry)
+        await event_store.record_many(events)
         print(f"[{i+1}/{events_count}] Inserted {event_type.upper()} at {event_time.strftime('%H:%M:%S')}")
 
     # 4. Update Campaign Stats